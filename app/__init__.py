@@ -2,15 +2,28 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
+from app import database
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': database.RoutingSession})
 login_manager = LoginManager()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
+    from app import log
+    log.init_app(app)
+
+    database.configure(app)
     db.init_app(app)
+    database.init_app(app, db)
+
+    # Registered before compression so the request timings include it
+    from app import compression, json_provider, metrics
+    metrics.init_app(app, db)
+    json_provider.init_app(app)
+    compression.init_app(app)
+
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
 
@@ -23,4 +36,20 @@ def create_app():
     from app.transactions import bp as transactions_bp
     app.register_blueprint(transactions_bp)
 
+    from app.jobs import import_queue
+    import_queue.init_app(app)
+
+    from app.cache import response_cache
+    response_cache.init_app(app)
+
+    from app import categorizer, identity
+    identity.init_app(app)
+    categorizer.init_app(app)
+
+    from app import fx
+    fx.init_app(app)
+
+    from app import cli
+    cli.register(app)
+
     return app 
\ No newline at end of file
@@ -0,0 +1,425 @@
+import heapq
+import logging
+import os
+import shutil
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db, rollups
+from app.cache import bump_data_version
+from app.categories import Replacement, resolved_category_id, resolved_category_name
+from app.fx import month_end, rates
+from app.metrics import metrics
+from app.models import Category, Transaction, TransactionArchive
+from app.money import default_currency, exponent, from_minor, to_minor
+
+# Transactions of calendar years that ended more than ARCHIVE_AFTER_DAYS ago can be moved out of
+# the transaction table into one column-file archive per user and year (app.archive.store), which
+# keeps the table and its indexes down to the recent years. Summaries, exports, listing, search
+# and deletes read the archives alongside the table; archived rows cannot be edited until
+# restore_year() moves their year back. numpy is only imported once an archive is actually read
+# or written.
+logger = logging.getLogger(__name__)
+
+# Hot rows are deleted and restored rows inserted in chunks this size (SQLite's variable limit)
+CHUNK_SIZE = 500
+
+# An archived row in the shape of readmodel.columns() rows
+ArchivedRow = namedtuple('ArchivedRow', (
+    'id', 'amount', 'currency', 'category', 'category_id', 'transaction_type', 'description', 'date', 'source',
+))
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def archive_root():
+    return current_app.config['ARCHIVE_PATH']
+
+
+def cutoff_year(after_days=None):
+    # Years before this one can be archived; the current year never can
+    if after_days is None:
+        after_days = current_app.config['ARCHIVE_AFTER_DAYS']
+    return (date.today() - timedelta(days=after_days)).year
+
+
+def user_archives(user_id, start=None, end=None):
+    # {year: directory} of the user's archives overlapping [start, end]
+    query = db.select(TransactionArchive.year, TransactionArchive.directory).where(TransactionArchive.user_id == user_id)
+    if start:
+        query = query.where(TransactionArchive.year >= start.year)
+    if end:
+        query = query.where(TransactionArchive.year <= end.year)
+    return dict(db.session.execute(query.order_by(TransactionArchive.year)).all())
+
+
+@lru_cache(maxsize=256)
+def load_archive(path):
+    # A rewritten archive gets a new directory, so a cached reader is never stale
+    from app.archive.store import Archive
+    return Archive(path)
+
+
+def open_archive(directory):
+    return load_archive(os.path.join(archive_root(), directory))
+
+
+def category_map(user_id):
+    # {category_id: (resolved id, resolved name)} including deleted categories, which archived
+    # rows keep pointing at just like rows in the table do
+    rows = db.session.execute(
+        db.select(Category.id, resolved_category_id, resolved_category_name)
+        .outerjoin(Replacement, Replacement.id == Category.replaced_by_id)
+        .where(Category.user_id == user_id)
+    )
+    return {id: (resolved_id, name) for id, resolved_id, name in rows}
+
+
+def archived_row(row, categories):
+    resolved_id, name = categories.get(row['category_id'], (None, None))
+    return ArchivedRow(
+        row['id'], from_minor(row['amount_minor'], row['currency']), row['currency'], name, resolved_id,
+        row['transaction_type'], row['description'], row['date'], row['source'],
+    )
+
+
+def remove_after_commit(session, path):
+    session.info.setdefault('archive_remove_on_commit', set()).add(path)
+
+
+def remove_after_rollback(session, path):
+    session.info.setdefault('archive_remove_on_rollback', set()).add(path)
+
+
+@event.listens_for(Session, 'after_commit')
+def remove_replaced_archives(session):
+    session.info.pop('archive_remove_on_rollback', None)
+    for path in session.info.pop('archive_remove_on_commit', ()):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def remove_unused_archives(session):
+    session.info.pop('archive_remove_on_commit', None)
+    for path in session.info.pop('archive_remove_on_rollback', ()):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def hot_rows(user_id, year):
+    table = Transaction.__table__
+    query = (
+        db.select(table.c.id, table.c.date, table.c.amount, table.c.amount_minor, table.c.currency, table.c.category_id,
+                  table.c.transaction_type, table.c.description, table.c.source, table.c.fingerprint)
+        .where(table.c.user_id == user_id, table.c.date >= datetime(year, 1, 1), table.c.date < datetime(year + 1, 1, 1))
+        .order_by(table.c.date, table.c.id)
+    )
+    rows = []
+    for row in db.session.execute(query).mappings():
+        row = dict(row, user_id=user_id, currency=row['currency'] or default_currency())
+        if row['amount_minor'] is None:
+            row['amount_minor'] = to_minor(row['amount'], row['currency'])
+        rows.append(row)
+    return rows
+
+
+def archive_year(user_id, year):
+    # Moves the user's transactions of one year from the table into the year's archive (merged
+    # with what it already holds) and takes them out of the rollups. The files are written and
+    # renamed into place before the rows are deleted; if the commit fails they are removed again.
+    # Returns the number of rows moved.
+    rows = hot_rows(user_id, year)
+    if not rows:
+        return 0
+    from app.archive import store
+
+    record = db.session.execute(
+        db.select(TransactionArchive).where(TransactionArchive.user_id == user_id, TransactionArchive.year == year)
+    ).scalar_one_or_none()
+    previous = record.directory if record else None
+    archived = list(open_archive(previous).rows()) if previous else []
+    directory = os.path.join(str(user_id), f'{year}-{uuid.uuid4().hex[:8]}')
+    path = os.path.join(archive_root(), directory)
+    staging = path + '.tmp'
+    try:
+        store.write(staging, user_id, year, archived + rows)
+        os.rename(staging, path)
+        if record is None:
+            db.session.add(TransactionArchive(user_id=user_id, year=year, directory=directory, rows=len(archived) + len(rows)))
+        else:
+            record.directory = directory
+            record.rows = len(archived) + len(rows)
+        table = Transaction.__table__
+        deleted = 0
+        for start in range(0, len(rows), CHUNK_SIZE):
+            ids = [row['id'] for row in rows[start:start + CHUNK_SIZE]]
+            deleted += db.session.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+        if deleted != len(rows):
+            raise ArchiveError(f'Transactions of user {user_id} in {year} changed while archiving, run it again')
+        rollups.record_deleted_rows(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    if previous:
+        shutil.rmtree(os.path.join(archive_root(), previous), ignore_errors=True)
+    metrics.inc('transactions_archived_total', (), len(rows))
+    logger.info('Archived %d transactions of user %d from %d', len(rows), user_id, year)
+    return len(rows)
+
+
+def archive_old_transactions(user_id=None, after_days=None):
+    # Archives every year before cutoff_year(); returns [(user_id, year, rows moved)]
+    cutoff = cutoff_year(after_days)
+    query = (
+        db.select(Transaction.user_id, db.func.min(Transaction.date))
+        .where(Transaction.date < datetime(cutoff, 1, 1))
+        .group_by(Transaction.user_id)
+        .order_by(Transaction.user_id)
+    )
+    if user_id is not None:
+        query = query.where(Transaction.user_id == user_id)
+    moved = []
+    for user, first in db.session.execute(query).all():
+        for year in range(first.year, cutoff):
+            count = archive_year(user, year)
+            if count:
+                moved.append((user, year, count))
+    return moved
+
+
+def restore_year(user_id, year):
+    # Moves an archived year back into the table. Rows keep their ids unless the id was taken in
+    # the meantime; rows whose fingerprint is in the table again are skipped. Returns the number
+    # of rows restored.
+    record = db.session.execute(
+        db.select(TransactionArchive).where(TransactionArchive.user_id == user_id, TransactionArchive.year == year)
+    ).scalar_one_or_none()
+    if record is None:
+        raise ArchiveError(f'User {user_id} has no archive for {year}')
+    directory = record.directory
+    rows = [
+        dict(row, user_id=user_id, amount=from_minor(row['amount_minor'], row['currency']))
+        for row in open_archive(directory).rows()
+    ]
+
+    table = Transaction.__table__
+    restored = []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[start:start + CHUNK_SIZE]
+        fingerprints = [row['fingerprint'] for row in chunk if row['fingerprint']]
+        present = set(db.session.execute(
+            db.select(table.c.fingerprint).where(table.c.fingerprint.in_(fingerprints))
+        ).scalars()) if fingerprints else set()
+        chunk = [row for row in chunk if row['fingerprint'] not in present]
+        taken = set(db.session.execute(
+            db.select(table.c.id).where(table.c.id.in_([row['id'] for row in chunk]))
+        ).scalars())
+        keep = [row for row in chunk if row['id'] not in taken]
+        renumber = [{key: value for key, value in row.items() if key != 'id'} for row in chunk if row['id'] in taken]
+        for batch in (keep, renumber):
+            if batch:
+                db.session.execute(table.insert(), batch)
+        restored.extend(chunk)
+
+    rollups.record_added_rows(restored)
+    db.session.delete(record)
+    db.session.commit()
+    shutil.rmtree(os.path.join(archive_root(), directory), ignore_errors=True)
+    logger.info('Restored %d of %d archived transactions of user %d from %d', len(restored), len(rows), user_id, year)
+    return len(restored)
+
+
+def currencies(archives):
+    # The currencies found in the given archives (user_archives() values)
+    return {currency for directory in archives.values() for currency in open_archive(directory).meta['currencies']}
+
+
+def summary_rows(user_id, archives, start, end, granularity, currency, aggregated):
+    # The archived part of a summary from the given archives (user_archives() for the range), as
+    # (bucket, category, transaction_type, currency, total) rows in currency plus the rows that
+    # had no rate, like rates.convert_rows() returns them. aggregated (month or year buckets over
+    # whole months) reads the monthly totals stored with each archive and converts other
+    # currencies per month like converted_rollup_rows() does; other summaries group the
+    # memory-mapped columns and convert per day like converted_rows().
+    if not archives:
+        return [], []
+    categories = category_map(user_id)
+    names = sorted({name for _, name in categories.values()}, key=str)
+    keys = {id: names.index(name) for id, (_, name) in categories.items()}
+
+    def name(category_id):
+        return categories.get(category_id, (None, None))[1]
+
+    first = start.strftime('%Y-%m') if start else None
+    last = end.strftime('%Y-%m') if end else None
+    rows = []
+    foreign = []
+    for directory in archives.values():
+        archive = open_archive(directory)
+        if aggregated:
+            # Summed per resolved name first, so months round the way the rollup query groups them
+            months = {}
+            for month, category_id, transaction_type, row_currency, total, _ in archive.meta['months']:
+                if (first is None or month >= first) and (last is None or month <= last):
+                    key = (month if granularity == 'month' else month[:4], name(category_id), transaction_type, row_currency, month)
+                    months[key] = months.get(key, 0) + total
+            for (bucket, category, transaction_type, row_currency, month), total in months.items():
+                if row_currency == currency:
+                    rows.append((bucket, category, transaction_type, currency, total))
+                else:
+                    foreign.append((bucket, category, transaction_type, row_currency, month_end(month), total))
+            continue
+        positions = archive.select(start, end, currency)
+        rows.extend((bucket, names[key] if key >= 0 else None, transaction_type, row_currency, total)
+                    for bucket, key, transaction_type, row_currency, total in archive.grouped(positions, granularity, keys))
+        if set(archive.meta['currencies']) - {currency}:
+            positions = archive.select(start, end, currency, other_currencies=True)
+            foreign.extend((bucket, names[key] if key >= 0 else None, transaction_type, row_currency, day, total)
+                           for bucket, key, transaction_type, row_currency, day, total in archive.grouped(positions, granularity, keys, by_day=True))
+    converted, unconverted = rates.convert_rows(foreign, currency)
+    return rows + converted, unconverted
+
+
+def transaction_dicts(user_id, start=None, end=None):
+    # Archived rows in [start, end] shaped like readmodel.row_to_dict(), newest first
+    from app.transactions.readmodel import row_to_dict
+
+    archives = user_archives(user_id, start, end)
+    if not archives:
+        return []
+    categories = category_map(user_id)
+    dicts = []
+    for directory in reversed(list(archives.values())):
+        archive = open_archive(directory)
+        for row in archive.rows(archive.select(start, end)[::-1]):
+            dicts.append(row_to_dict(archived_row(row, categories)))
+    return dicts
+
+
+def find_rows(user_id, archives, cursor=None, description=None, transaction_type=None, category_id=None,
+              source=None, min_amount=None, max_amount=None, start=None, end=None):
+    # Yields (archive, positions) of the rows matching the transaction listing filters in the given
+    # archives (user_archives()), newest first. cursor is a listing keyset cursor and description
+    # a predicate on the description text.
+    category_ids = None
+    if category_id:
+        # Like categories.category_filter(): the category and the ones folded into it
+        category_ids = {id for id, (resolved_id, _) in category_map(user_id).items() if category_id in (id, resolved_id)}
+    amount_range = None if min_amount is None and max_amount is None else (min_amount, max_amount)
+    for year in sorted(archives, reverse=True):
+        if cursor and year > cursor[0].year:
+            continue
+        archive = open_archive(archives[year])
+        scales = [10 ** exponent(currency) for currency in archive.meta['currencies']]
+        positions = archive.find(start, end, cursor, transaction_type, category_ids, source, amount_range, scales, description)
+        if len(positions):
+            yield archive, positions
+
+
+def listing_rows(user_id, found, count, skip=0):
+    # Up to count ArchivedRows from find_rows() after skipping the first skip of them
+    categories = None
+    rows = []
+    for archive, positions in found:
+        if skip >= len(positions):
+            skip -= len(positions)
+            continue
+        positions = positions[skip:skip + count - len(rows)]
+        skip = 0
+        if categories is None:
+            categories = category_map(user_id)
+        rows.extend(archived_row(row, categories) for row in archive.rows(positions))
+        if len(rows) >= count:
+            break
+    return rows
+
+
+def archived_ids(user_id, ids):
+    # {year: ids} of the given transaction ids that are archived
+    ids = set(ids)
+    found = {}
+    if not ids:
+        return found
+    for year, directory in user_archives(user_id).items():
+        hits = open_archive(directory).contains_ids(ids)
+        if hits:
+            found[year] = hits
+            ids -= hits
+    return found
+
+
+def delete_rows(user_id, ids):
+    # Deletes archived transactions in the caller's transaction by rewriting their years'
+    # archives without them. The new directories take over when the session commits and are
+    # removed again if it rolls back. Archived rows are not in the rollups, so only the data
+    # version changes. Returns the ids that were deleted.
+    from app.archive import store
+
+    deleted = set()
+    for year, hits in archived_ids(user_id, ids).items():
+        record = db.session.execute(
+            db.select(TransactionArchive).where(TransactionArchive.user_id == user_id, TransactionArchive.year == year)
+        ).scalar_one()
+        rows = [row for row in open_archive(record.directory).rows() if row['id'] not in hits]
+        remove_after_commit(db.session, os.path.join(archive_root(), record.directory))
+        if rows:
+            directory = os.path.join(str(user_id), f'{year}-{uuid.uuid4().hex[:8]}')
+            path = os.path.join(archive_root(), directory)
+            remove_after_rollback(db.session, path)
+            store.write(path + '.tmp', user_id, year, rows)
+            os.rename(path + '.tmp', path)
+            record.directory = directory
+            record.rows = len(rows)
+        else:
+            db.session.delete(record)
+        deleted |= hits
+    if deleted:
+        bump_data_version(user_id)
+    return deleted
+
+
+def with_archived_dicts(dicts, user_id, start=None, end=None):
+    # Merges the archived rows into a newest-first list of transaction dicts from the table
+    archived = transaction_dicts(user_id, start, end)
+    if not archived:
+        return dicts
+    return list(heapq.merge(dicts, archived, key=lambda t: (t['date'], t['id']), reverse=True))
+
+
+def export_rows(user_id, start=None, end=None):
+    # Archived rows as streaming.EXPORT_COLUMNS tuples, oldest first
+    archives = user_archives(user_id, start, end)
+    if not archives:
+        return
+    categories = category_map(user_id)
+    for directory in archives.values():
+        archive = open_archive(directory)
+        for row in archive.rows(archive.select(start, end)):
+            resolved_id, name = categories.get(row['category_id'], (None, None))
+            yield (
+                row['id'], row['date'], from_minor(row['amount_minor'], row['currency']), row['currency'], name,
+                resolved_id, row['transaction_type'], row['description'], row['source'],
+            )
+
+
+def archived_fingerprints(user_id, rows):
+    # The fingerprints among rows (dicts with date and fingerprint) that are already archived, so
+    # importing an old statement again does not bring archived rows back into the table
+    if all(row['date'].year >= date.today().year for row in rows):
+        return set()
+    years = {}
+    for row in rows:
+        years.setdefault(row['date'].year, []).append(row['fingerprint'])
+    found = set()
+    for year, directory in user_archives(user_id, date(min(years), 1, 1), date(max(years), 12, 31)).items():
+        if year in years:
+            found |= open_archive(directory).contains_fingerprints(years[year])
+    return found
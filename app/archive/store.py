@@ -0,0 +1,254 @@
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+import numpy as np
+
+# One archive is a directory with one .npy file per column, read back memory-mapped, plus
+# archive.json (dictionaries for the low-cardinality columns and the precomputed monthly and
+# yearly aggregates) and descriptions.json (the description dictionary, only needed to list rows).
+# Text columns are stored as integer codes into those dictionaries, which keep None as a value;
+# category_id is nullable, so it has a mask of the rows without one. A row reads back exactly as
+# it was written.
+META_FILE = 'archive.json'
+DESCRIPTIONS_FILE = 'descriptions.json'
+COLUMNS = {
+    'id': np.int64,
+    'date': 'datetime64[us]',
+    'amount_minor': np.int64,
+    'category_id': np.int64,
+    'category_null': np.bool_,
+    'transaction_type': np.uint16,
+    'currency': np.uint16,
+    'source': np.uint16,
+    'description': np.uint32,
+    'fingerprint': 'S32',
+}
+# numpy datetime units for the summary granularities; weeks are bucketed by their Monday
+BUCKET_UNITS = {'day': 'D', 'week': 'D', 'month': 'M', 'year': 'Y'}
+
+
+def encode(values):
+    # Dictionary encoding: (codes, dictionary) with codes in first-seen order
+    dictionary = {}
+    codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+    return codes, list(dictionary)
+
+
+def aggregates(rows):
+    # Monthly (month, category_id, transaction_type, currency, total_minor, count) in rollup form,
+    # expense totals absolute, plus yearly income and expense totals per currency
+    months = defaultdict(lambda: [0, 0])
+    year = {'income': defaultdict(int), 'expenses': defaultdict(int)}
+    for row in rows:
+        income = row['transaction_type'] == 'income'
+        amount = row['amount_minor'] if income else abs(row['amount_minor'])
+        total = months[(row['date'].strftime('%Y-%m'), row['category_id'], row['transaction_type'], row['currency'])]
+        total[0] += amount
+        total[1] += 1
+        year['income' if income else 'expenses'][row['currency']] += amount
+    return {
+        'months': [[*key, total, count] for key, (total, count) in sorted(months.items(), key=lambda item: str(item[0]))],
+        'year': {side: dict(totals) for side, totals in year.items()},
+    }
+
+
+def write(path, user_id, year, rows):
+    # rows: dicts with the transaction columns, written in (date, id) order
+    rows = sorted(rows, key=lambda row: (row['date'], row['id']))
+    os.makedirs(path)
+    type_codes, transaction_types = encode(row['transaction_type'] for row in rows)
+    currency_codes, currencies = encode(row['currency'] for row in rows)
+    source_codes, sources = encode(row['source'] for row in rows)
+    description_codes, descriptions = encode(row['description'] for row in rows)
+    values = {
+        'id': [row['id'] for row in rows],
+        'date': [row['date'] for row in rows],
+        'amount_minor': [row['amount_minor'] for row in rows],
+        'category_id': [row['category_id'] or 0 for row in rows],
+        'category_null': [row['category_id'] is None for row in rows],
+        'transaction_type': type_codes,
+        'currency': currency_codes,
+        'source': source_codes,
+        'description': description_codes,
+        'fingerprint': [(row['fingerprint'] or '').encode() for row in rows],
+    }
+    for name, dtype in COLUMNS.items():
+        np.save(os.path.join(path, f'{name}.npy'), np.array(values[name], dtype=dtype))
+    with open(os.path.join(path, DESCRIPTIONS_FILE), 'w') as file:
+        json.dump(descriptions, file)
+    meta = {
+        'user_id': user_id,
+        'year': year,
+        'rows': len(rows),
+        'transaction_types': transaction_types,
+        'currencies': currencies,
+        'sources': sources,
+        **aggregates(rows),
+    }
+    # Written last: a directory without it is an interrupted write
+    with open(os.path.join(path, META_FILE), 'w') as file:
+        json.dump(meta, file)
+    return meta
+
+
+class Archive:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as file:
+            self.meta = json.load(file)
+        self.columns = {}
+        self.descriptions = None
+
+    def column(self, name):
+        # Memory-mapped: only the pages a query touches are read, and the OS page cache keeps them
+        if name not in self.columns:
+            self.columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self.columns[name]
+
+    def description(self, code):
+        return self.all_descriptions()[code]
+
+    def all_descriptions(self):
+        if self.descriptions is None:
+            with open(os.path.join(self.path, DESCRIPTIONS_FILE)) as file:
+                self.descriptions = json.load(file)
+        return self.descriptions
+
+    def code(self, dictionary, value):
+        # A value's code in one of the meta dictionaries, -1 (matching no row) when it is not there
+        values = self.meta[dictionary]
+        return values.index(value) if value in values else -1
+
+    def select(self, start=None, end=None, currency=None, other_currencies=False):
+        # Positions of the rows in [start, end] (dates), optionally only the rows in currency or
+        # only those in any other currency
+        dates = self.column('date')
+        mask = np.ones(len(dates), dtype=bool)
+        if start:
+            mask &= dates >= np.datetime64(start)
+        if end:
+            mask &= dates < np.datetime64(end + timedelta(days=1))
+        if currency is not None:
+            code = self.meta['currencies'].index(currency) if currency in self.meta['currencies'] else -1
+            codes = self.column('currency')
+            mask &= (codes != code) if other_currencies else (codes == code)
+        return np.flatnonzero(mask)
+
+    def find(self, start=None, end=None, before=None, transaction_type=None, category_ids=None, source=None,
+             amount_range=None, scales=None, description=None):
+        # Positions of the rows matching the transaction listing filters, newest first. before is a
+        # (date, id) keyset cursor, amount_range (min, max) with None for an open end compares
+        # amount_minor / scales[currency code], and description is a predicate on the text.
+        positions = self.select(start, end)
+        mask = np.ones(len(positions), dtype=bool)
+        if before is not None:
+            dates = self.column('date')[positions]
+            cursor = np.datetime64(before[0], 'us')
+            mask &= (dates < cursor) | ((dates == cursor) & (self.column('id')[positions] < before[1]))
+        if transaction_type is not None:
+            mask &= self.column('transaction_type')[positions] == self.code('transaction_types', transaction_type)
+        if source is not None:
+            mask &= self.column('source')[positions] == self.code('sources', source)
+        if category_ids is not None:
+            mask &= ~self.column('category_null')[positions] & np.isin(self.column('category_id')[positions], list(category_ids))
+        if amount_range is not None:
+            amounts = self.column('amount_minor')[positions] / np.array(scales)[self.column('currency')[positions]]
+            if amount_range[0] is not None:
+                mask &= amounts >= amount_range[0]
+            if amount_range[1] is not None:
+                mask &= amounts <= amount_range[1]
+        if description is not None:
+            codes = [code for code, text in enumerate(self.all_descriptions()) if text and description(text)]
+            mask &= np.isin(self.column('description')[positions], codes)
+        return positions[mask][::-1]
+
+    def totals(self, positions):
+        # {(currency, transaction_type): (count, sum of absolute amount_minor)} over positions
+        if not len(positions):
+            return {}
+        keys = np.stack([self.column('currency')[positions], self.column('transaction_type')[positions]], axis=1).astype(np.int64)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse, minlength=len(groups))
+        sums = np.zeros(len(groups), dtype=np.int64)
+        np.add.at(sums, inverse, np.abs(self.column('amount_minor')[positions]))
+        return {
+            (self.meta['currencies'][currency], self.meta['transaction_types'][transaction_type]): (int(count), int(total))
+            for (currency, transaction_type), count, total in zip(groups.tolist(), counts.tolist(), sums.tolist())
+        }
+
+    def grouped(self, positions, granularity, category_keys, by_day=False):
+        # SUM of the signed amounts per (bucket, category key, transaction_type, currency[, day]),
+        # the same groups the summary queries produce. category_keys maps category ids to integer
+        # keys, so categories that read as the same one are summed together like in SQL.
+        if not len(positions):
+            return []
+        days = self.column('date')[positions].astype('datetime64[D]')
+        if granularity == 'week':
+            # 1970-01-01 was a Thursday, so day number + 3 counts from a Monday
+            numbers = days.astype(np.int64)
+            buckets = numbers - (numbers + 3) % 7
+        else:
+            buckets = days.astype(f'datetime64[{BUCKET_UNITS[granularity]}]').astype(np.int64)
+        amounts = self.column('amount_minor')[positions]
+        types = self.column('transaction_type')[positions].astype(np.int64)
+        transaction_types = self.meta['transaction_types']
+        income = types == (transaction_types.index('income') if 'income' in transaction_types else -1)
+        signed = np.where(income, amounts, np.abs(amounts))
+        category_ids = np.where(self.column('category_null')[positions], -1, self.column('category_id')[positions])
+        ids, inverse = np.unique(category_ids, return_inverse=True)
+        categories = np.array([category_keys.get(id, -1) for id in ids.tolist()], dtype=np.int64)[inverse]
+        keys = [buckets, categories, types, self.column('currency')[positions].astype(np.int64)]
+        if by_day:
+            keys.append(days.astype(np.int64))
+        groups, inverse = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+        totals = np.zeros(len(groups), dtype=np.int64)
+        np.add.at(totals, inverse.ravel(), signed)
+
+        unit = BUCKET_UNITS[granularity]
+        labels = np.datetime_as_string(groups[:, 0].astype(f'datetime64[{unit}]'))
+        day_labels = np.datetime_as_string(groups[:, 4].astype('datetime64[D]')) if by_day else None
+        currencies = self.meta['currencies']
+        result = []
+        for index, (_, category_key, transaction_type, currency) in enumerate(groups[:, :4].tolist()):
+            row = [str(labels[index]), category_key, transaction_types[transaction_type], currencies[currency]]
+            if by_day:
+                row.append(str(day_labels[index]))
+            row.append(int(totals[index]))
+            result.append(row)
+        return result
+
+    def rows(self, positions=None):
+        # Row dicts with the transaction columns, in (date, id) order
+        if positions is None:
+            positions = np.arange(self.meta['rows'])
+        transaction_types = self.meta['transaction_types']
+        currencies = self.meta['currencies']
+        sources = self.meta['sources']
+        columns = {name: self.column(name)[positions].tolist() for name in COLUMNS if name != 'date'}
+        dates = self.column('date')[positions].astype(datetime)
+        for index in range(len(positions)):
+            yield {
+                'id': columns['id'][index],
+                'date': dates[index],
+                'amount_minor': columns['amount_minor'][index],
+                'currency': currencies[columns['currency'][index]],
+                'category_id': None if columns['category_null'][index] else columns['category_id'][index],
+                'transaction_type': transaction_types[columns['transaction_type'][index]],
+                'description': self.description(columns['description'][index]),
+                'source': sources[columns['source'][index]],
+                'fingerprint': columns['fingerprint'][index].decode() or None,
+            }
+
+    def contains_ids(self, ids):
+        # The subset of ids stored in this archive
+        candidates = np.array(sorted(ids), dtype=np.int64)
+        found = np.isin(candidates, self.column('id'))
+        return set(candidates[found].tolist())
+
+    def contains_fingerprints(self, fingerprints):
+        # The subset of fingerprints stored in this archive
+        candidates = np.array([fingerprint.encode() for fingerprint in fingerprints], dtype='S32')
+        found = np.isin(candidates, self.column('fingerprint'))
+        return {fingerprint for fingerprint, hit in zip(fingerprints, found.tolist()) if hit}
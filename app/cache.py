@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request
+from flask_login import current_user
+from app import compression, db
+from app.models import DataVersion
+
+
+def bump_data_version(*user_ids):
+    # Runs in the caller's session, so the new version becomes visible together with the write
+    table = DataVersion.__table__
+    for user_id in set(user_ids):
+        result = db.session.execute(
+            table.update().where(table.c.user_id == user_id).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(user_id=user_id, version=1))
+
+
+def current_data_version(user_id):
+    version = db.session.execute(
+        db.select(DataVersion.version).where(DataVersion.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+
+class MemoryCache:
+    # LRU over serialized (body, mimetype, encoding) responses, evicting least recently used
+    # entries beyond max_bytes
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        body = value[0]
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self.entries[key] = value
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, *_) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class SqliteCache:
+    # Optional second tier in a local SQLite file, shared by all worker processes on the host
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.connection() as connection:
+            # Files written before encoded variants were cached lack the encoding column and are
+            # only a cache, so they are started over
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(response_cache)')}
+            if columns and 'encoding' not in columns:
+                connection.execute('DROP TABLE IF EXISTS response_cache')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS response_cache '
+                '(key TEXT PRIMARY KEY, body BLOB NOT NULL, mimetype TEXT NOT NULL, encoding TEXT, '
+                'size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_response_cache_accessed ON response_cache (accessed)')
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None or self.local.pid != os.getpid():
+            self.local.connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            self.local.connection.execute('PRAGMA journal_mode=WAL')
+            self.local.pid = os.getpid()
+        return self.local.connection
+
+    def get(self, key):
+        try:
+            row = self.connection().execute(
+                'SELECT body, mimetype, encoding FROM response_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                self.connection().execute('UPDATE response_cache SET accessed = ? WHERE key = ?', (time.time(), key))
+            return row
+        except sqlite3.Error:
+            return None
+
+    def set(self, key, value):
+        body, mimetype, encoding = value
+        try:
+            connection = self.connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO response_cache (key, body, mimetype, encoding, size, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                (key, body, mimetype, encoding, len(body), time.time()),
+            )
+            total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM response_cache').fetchone()[0]
+            if total > self.max_bytes:
+                # Drop the least recently used quarter in one statement
+                connection.execute(
+                    'DELETE FROM response_cache WHERE key IN '
+                    '(SELECT key FROM response_cache ORDER BY accessed LIMIT (SELECT COUNT(*) / 4 + 1 FROM response_cache))'
+                )
+        except sqlite3.Error:
+            pass
+
+
+class ResponseCache:
+
+    def __init__(self, app=None):
+        self.memory = None
+        self.shared = None
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.memory = MemoryCache(app.config['RESPONSE_CACHE_MAX_BYTES'])
+        self.shared = None
+        if app.config['RESPONSE_CACHE_BACKEND'] == 'sqlite':
+            self.shared = SqliteCache(app.config['RESPONSE_CACHE_PATH'], app.config['RESPONSE_CACHE_SHARED_MAX_BYTES'])
+        app.extensions['response_cache'] = self
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+
+response_cache = ResponseCache()
+
+
+# Extra inputs to every cache key besides the data version, e.g. the version of the loaded FX rates
+key_parts = []
+
+
+def add_key_part(part):
+    if part not in key_parts:
+        key_parts.append(part)
+
+
+def versioned_response(view):
+    # Caches a JSON view per (user, data version, endpoint, query string) and answers matching
+    # If-None-Match requests with 304. Checking costs one primary key lookup of the data version.
+    # The body is cached once per content encoding, so a hit is sent without compressing it again.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_data_version(current_user.id)
+        # Cached identity data loaded under another version is reloaded (see identity.user_categories)
+        g.data_version = (current_user.id, version)
+        key = (
+            f'{current_user.id}:{version}:{[part() for part in key_parts]}:{request.endpoint}:'
+            f'{sorted(request.args.items(multi=True))}:{sorted(kwargs.items())}'
+        )
+        etag = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+        # Compressed responses carry the tag with an encoding suffix (see app.compression)
+        matched = next((tag for tag in request.if_none_match.as_set() if tag.split('-', 1)[0] == etag), None)
+        if matched:
+            response = current_app.response_class(status=304)
+            response.set_etag(matched)
+        else:
+            encoding = compression.choose_encoding(request.accept_encodings)
+            variant = f'{etag}-{encoding}' if encoding else etag
+            cached = response_cache.get(variant)
+            if cached is None:
+                plain = response_cache.get(etag) if encoding else None
+                if plain is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    plain = (response.get_data(), response.mimetype, None)
+                    response_cache.set(etag, plain)
+                cached = plain
+                if encoding:
+                    body = compression.compress_body(
+                        plain[0], plain[1], encoding, current_app.config['COMPRESS_MIN_SIZE'], current_app.config['COMPRESS_LEVEL']
+                    )
+                    cached = (body, plain[1], encoding) if body is not None else plain
+                    response_cache.set(variant, cached)
+            response = current_app.response_class(cached[0], mimetype=cached[1])
+            if cached[1] in compression.COMPRESSIBLE_TYPES:
+                response.vary.add('Accept-Encoding')
+            if cached[2]:
+                # Already encoded, so compress_response leaves it alone
+                response.headers['Content-Encoding'] = cached[2]
+                response.set_etag(f'{etag}-{cached[2]}')
+            else:
+                response.set_etag(etag)
+
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
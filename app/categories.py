@@ -0,0 +1,112 @@
+from app import db
+from app.identity import category_cache, invalidate_after_commit, user_categories
+from app.models import Category, Transaction
+
+FALLBACK_NAME = 'Other'
+
+# A transaction's category after following replaced_by_id. Both joins go through the category
+# primary key; use join_categories() to add them to a query.
+Replacement = db.aliased(Category, name='replacement')
+resolved_category_id = db.func.coalesce(Category.replaced_by_id, Category.id)
+resolved_category_name = db.func.coalesce(Replacement.name, Category.name)
+
+
+def join_categories(query, category_id):
+    return (
+        query
+        .outerjoin(Category, Category.id == category_id)
+        .outerjoin(Replacement, Replacement.id == Category.replaced_by_id)
+    )
+
+
+def category_filter(user_id, category_id):
+    # Rows filed under the category itself or under a category that was folded into it; kept on
+    # Transaction.category_id so the (user_id, category_id, date) index still serves the filter
+    return Transaction.category_id.in_(
+        db.select(Category.id).where(
+            Category.user_id == user_id,
+            (Category.id == category_id) | (Category.replaced_by_id == category_id),
+        )
+    )
+
+
+def category_ids_by_name(user_id, names):
+    # Statement parsers and imports only know category names. Maps them to the user's live
+    # categories, creating the missing ones in the caller's transaction.
+    names = {name or FALLBACK_NAME for name in names}
+    by_name = {}
+    for category in user_categories(user_id).values():
+        by_name.setdefault(category.name, category.id)
+    missing = names - set(by_name)
+    if missing:
+        # Categories created earlier in this transaction are not in the cache yet
+        rows = db.session.execute(
+            db.select(Category.id, Category.name)
+            .where(Category.user_id == user_id, Category.name.in_(missing), Category.replaced_by_id.is_(None))
+            .order_by(Category.id)
+        )
+        for id, name in rows:
+            by_name.setdefault(name, id)
+        created = [Category(name=name, user_id=user_id) for name in sorted(missing - set(by_name))]
+        if created:
+            db.session.add_all(created)
+            db.session.flush()
+            by_name.update((category.name, category.id) for category in created)
+    return by_name
+
+
+def replace_category(user_id, category_id, replacement_id):
+    # Deleting a category only touches category rows, however many transactions it has: they keep
+    # their category_id and are read as the replacement. Categories that were folded into this
+    # one move along, so a lookup never follows more than one hop.
+    table = Category.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.user_id == user_id, (table.c.id == category_id) | (table.c.replaced_by_id == category_id))
+        .values(replaced_by_id=replacement_id)
+    )
+    invalidate_after_commit(db.session, category_cache, user_id)
+    # The category index still votes for the old id; it is rebuilt on next use
+    from app.categorizer import index_cache
+    invalidate_after_commit(db.session, index_cache, user_id)
+
+
+def rename_category(user_id, category_id, name):
+    table = Category.__table__
+    db.session.execute(
+        table.update().where(table.c.user_id == user_id, table.c.id == category_id).values(name=name)
+    )
+    invalidate_after_commit(db.session, category_cache, user_id)
+
+
+def backfill_category_ids(batch_size=1000):
+    # Files rows that only have the old free-text category under the user's category of that
+    # name, creating the missing ones. Works in id order and commits per batch, so an interrupted
+    # run continues where it stopped. The text column is no longer on the model, hence the
+    # lightweight table.
+    table = db.table('transaction', db.column('id'), db.column('user_id'), db.column('category'), db.column('category_id'))
+    if 'category' not in {column['name'] for column in db.inspect(db.engine).get_columns('transaction')}:
+        return 0
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.user_id, table.c.category)
+            .where(table.c.id > last_id, table.c.category_id.is_(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+
+        names = {}
+        for _, user_id, name in rows:
+            names.setdefault(user_id, set()).add(name)
+        ids = {user_id: category_ids_by_name(user_id, user_names) for user_id, user_names in names.items()}
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('row_id')).values(category_id=db.bindparam('new_category_id')),
+            [{'row_id': id, 'new_category_id': ids[user_id][name or FALLBACK_NAME]} for id, user_id, name in rows],
+        )
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1][0]
@@ -0,0 +1,169 @@
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.categories import FALLBACK_NAME, join_categories, resolved_category_id, resolved_category_name
+from app.identity import TTLCache, user_categories
+from app.metrics import metrics
+from app.models import Transaction
+
+# Per-user map from merchant tokens to the categories the user filed them under, used to
+# categorize imported statement rows. A token only predicts a category once at least MIN_SHARE of
+# its uses went there, so words shared by many merchants (cities, "sp", "zoo") drop out on their own.
+MIN_SHARE = 0.6
+MIN_TOKEN_LENGTH = 3
+TOKEN_RE = re.compile(r'[a-z]+')
+# Letters NFKD does not decompose
+FOLD = str.maketrans({'ł': 'l', 'Ł': 'L', 'ø': 'o', 'Ø': 'O', 'ß': 'ss', 'đ': 'd', 'Đ': 'D'})
+
+
+@lru_cache(maxsize=65536)
+def merchant_tokens(description):
+    # Lowercase ASCII words of the description without duplicates, in order; digits (store
+    # numbers, dates) are dropped
+    text = unicodedata.normalize('NFKD', (description or '').translate(FOLD)).encode('ascii', 'ignore').decode()
+    return tuple(dict.fromkeys(token for token in TOKEN_RE.findall(text.lower()) if len(token) >= MIN_TOKEN_LENGTH))
+
+
+class CategoryIndex:
+    # counts: token -> {category_id: number of transactions}; best: token -> (category_id, share)
+    # for the tokens that pass MIN_SHARE. Lookups only read best, updates recompute one token's entry.
+    # Rows in an ignored (fallback) category teach nothing.
+
+    def __init__(self, ignored=()):
+        self.counts = {}
+        self.best = {}
+        self.ignored = frozenset(ignored)
+        self.lock = threading.Lock()
+
+    def add(self, description, category_id, count=1):
+        if category_id in self.ignored:
+            return
+        with self.lock:
+            for token in merchant_tokens(description):
+                categories = self.counts.setdefault(token, {})
+                total = categories.get(category_id, 0) + count
+                if total > 0:
+                    categories[category_id] = total
+                else:
+                    categories.pop(category_id, None)
+                self.update_best(token, categories)
+
+    def update_best(self, token, categories):
+        if not categories:
+            del self.counts[token]
+            self.best.pop(token, None)
+            return
+        category_id, count = max(categories.items(), key=lambda item: item[1])
+        share = count / sum(categories.values())
+        if share >= MIN_SHARE:
+            self.best[token] = (category_id, share)
+        else:
+            self.best.pop(token, None)
+
+    def lookup(self, description):
+        # Each token votes for its category with its share; ties go to the earlier token, which
+        # is usually the merchant name
+        votes = {}
+        winner = None
+        for token in merchant_tokens(description):
+            entry = self.best.get(token)
+            if entry is None:
+                continue
+            category_id, share = entry
+            votes[category_id] = votes.get(category_id, 0) + share
+            if winner is None or votes[category_id] > votes[winner]:
+                winner = category_id
+        return winner
+
+
+index_cache = TTLCache('category_index', max_entries=1000, ttl=600)
+
+
+def load_index(user_id):
+    # Learned from the user's whole history, one row per distinct description and category
+    index = CategoryIndex(id for id, category in user_categories(user_id).items() if category.name == FALLBACK_NAME)
+    rows = db.session.execute(
+        join_categories(
+            db.select(Transaction.description, resolved_category_id, db.func.count()).select_from(Transaction),
+            Transaction.category_id,
+        )
+        .where(Transaction.user_id == user_id, resolved_category_name != FALLBACK_NAME)
+        .group_by(Transaction.description, resolved_category_id)
+    )
+    for description, category_id, count in rows:
+        index.add(description, category_id, count)
+    return index
+
+
+def category_index(user_id):
+    index = index_cache.get(user_id)
+    if index is None:
+        with metrics.timer('category_index_load'):
+            index = load_index(user_id)
+        index_cache.set(user_id, index)
+    return index
+
+
+def categorize(user_id, rows):
+    # Sets category_id on the row dicts whose description the user's history recognizes; the
+    # others keep their category. Repeated descriptions in the batch are looked up once.
+    index = category_index(user_id)
+    live = user_categories(user_id)
+    fallback = {id for id, category in live.items() if category.name == FALLBACK_NAME}
+    predictions = {}
+    categorized = 0
+    for row in rows:
+        description = row.get('description')
+        if description not in predictions:
+            predictions[description] = index.lookup(description)
+        category_id = predictions[description]
+        # Predictions can point at categories deleted since the index was loaded
+        if category_id in live and category_id not in fallback:
+            row['category_id'] = category_id
+            categorized += 1
+    metrics.inc('rows_categorized_total', (), categorized)
+    return categorized
+
+
+def learn(user_id, description, category_id, sign=1):
+    # Called for every written transaction; the change reaches the loaded index once the session
+    # commits, and an index that is not loaded picks it up from the database when it is
+    db.session.info.setdefault('category_index', []).append((user_id, description, category_id, sign))
+
+
+def learn_transactions(transactions, sign=1):
+    for t in transactions:
+        learn(t.user_id, t.description, t.category_id, sign)
+
+
+def learn_rows(rows, sign=1):
+    for row in rows:
+        learn(row['user_id'], row.get('description'), row['category_id'], sign)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_learned(session):
+    for user_id, description, category_id, sign in session.info.pop('category_index', ()):
+        index = index_cache.peek(user_id)
+        if index is not None:
+            index.add(description, category_id, sign)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_learned(session):
+    session.info.pop('category_index', None)
+
+
+def index_counters():
+    labels = (('cache', index_cache.name),)
+    yield 'cache_hits_total', labels, index_cache.hits
+    yield 'cache_misses_total', labels, index_cache.misses
+
+
+def init_app(app):
+    index_cache.configure(app.config['CATEGORY_INDEX_CACHE_SIZE'], app.config['CATEGORY_INDEX_CACHE_TTL'])
+    metrics.register_collector(index_counters)
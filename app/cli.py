@@ -0,0 +1,92 @@
+import click
+from flask.cli import AppGroup
+from app import archive, db, rollups, schema
+from app.models import TransactionArchive
+from app.money import from_minor
+
+rollups_cli = AppGroup('rollups', help='Maintain the per-user summary rollup tables.')
+schema_cli = AppGroup('schema', help='Bring an existing database up to the current models.')
+archive_cli = AppGroup('archive', help='Move old transactions into per-year archive files and back.')
+
+
+@rollups_cli.command('verify')
+@click.option('--user-id', type=int, default=None, help='Only check this user.')
+def verify_rollups(user_id):
+    drift = rollups.find_drift(user_id)
+    for item in drift:
+        user, month, category_id, transaction_type, currency = item['key']
+        click.echo(
+            f"user={user} month={month} category_id={category_id} type={transaction_type} currency={currency}: "
+            f"expected total={from_minor(item['expected_total'] or 0, currency)} count={item['expected_count']}, "
+            f"stored total={from_minor(item['actual_total'] or 0, currency)} count={item['actual_count']}"
+        )
+    if drift:
+        click.echo(f'{len(drift)} rollup rows drifted, run "flask rollups rebuild" to fix them')
+        raise SystemExit(1)
+    click.echo('Rollups match the transaction table')
+
+
+@rollups_cli.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_rollups(user_id):
+    count = rollups.rebuild(user_id)
+    click.echo(f'Rebuilt {count} rollup rows')
+
+
+@schema_cli.command('upgrade')
+def upgrade_schema():
+    report = schema.upgrade()
+    for name in report['columns']:
+        click.echo(f'Added column {name}')
+    if report['fingerprints']:
+        click.echo(f"Fingerprinted {report['fingerprints']} existing transactions")
+    if report['amounts']:
+        click.echo(f"Converted {report['amounts']} existing transactions to minor units")
+    if report['categories']:
+        click.echo(f"Linked {report['categories']} existing transactions to their category")
+    for name in report['dropped']:
+        click.echo(f'Dropped column {name}')
+    for name in report['indexes']:
+        click.echo(f'Created index {name}')
+    if report['search_index']:
+        click.echo('Built the full-text search index')
+    if report['rollup_rows'] is not None:
+        click.echo(f"Rebuilt {report['rollup_rows']} rollup rows")
+    click.echo('Schema is up to date')
+
+
+@archive_cli.command('run')
+@click.option('--user-id', type=int, default=None, help='Only archive this user.')
+@click.option('--after-days', type=int, default=None, help='Archive years that ended this long ago (default: ARCHIVE_AFTER_DAYS).')
+def run_archive(user_id, after_days):
+    moved = archive.archive_old_transactions(user_id, after_days)
+    for user, year, count in moved:
+        click.echo(f'user={user} year={year}: archived {count} transactions')
+    click.echo(f'Archived {sum(count for _, _, count in moved)} transactions' if moved else 'Nothing to archive')
+
+
+@archive_cli.command('restore')
+@click.option('--user-id', type=int, required=True)
+@click.option('--year', type=int, required=True)
+def restore_archive(user_id, year):
+    try:
+        count = archive.restore_year(user_id, year)
+    except archive.ArchiveError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Restored {count} transactions')
+
+
+@archive_cli.command('list')
+@click.option('--user-id', type=int, default=None, help='Only list this user.')
+def list_archives(user_id):
+    query = db.select(TransactionArchive).order_by(TransactionArchive.user_id, TransactionArchive.year)
+    if user_id is not None:
+        query = query.where(TransactionArchive.user_id == user_id)
+    for record in db.session.execute(query).scalars():
+        click.echo(f'user={record.user_id} year={record.year} rows={record.rows} directory={record.directory}')
+
+
+def register(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(archive_cli)
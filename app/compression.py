@@ -0,0 +1,66 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/html', 'text/csv', 'text/plain', 'text/css', 'application/javascript', 'text/javascript')
+
+
+def choose_encoding(accept_encoding):
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        # Quality 4 compresses about as well as gzip -6 at a fraction of the time of the default 11
+        return brotli.compress(body, quality=min(level, 4))
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def compress_body(body, mimetype, encoding, min_size, level):
+    # What compress_response would send for this body, or None when it would send it as it is
+    if mimetype not in COMPRESSIBLE_TYPES or len(body) < min_size:
+        return None
+    return compress(body, encoding, level)
+
+
+def compress_response(response, min_size, level):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_TYPES
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(body, encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag has to differ per encoding; versioned_response accepts the suffixed form
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+def init_app(app):
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+
+    @app.after_request
+    def compress_after_request(response):
+        return compress_response(response, min_size, level)
@@ -0,0 +1,98 @@
+from functools import wraps
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('auto', 'sqlite', 'postgresql', 'none')
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    # Sends everything to the replica once a read-only view has flagged the session (see
+    # replica_reads); writes would fail there, so only views that never write use it
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def resolve_profile(config, uri):
+    profile = config['DATABASE_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DATABASE_PROFILE {profile!r}, expected one of: {', '.join(PROFILES)}")
+    if profile == 'auto':
+        backend = make_url(uri).get_backend_name()
+        return backend if backend in ('sqlite', 'postgresql') else 'none'
+    return profile
+
+
+def engine_options(config, uri):
+    profile = resolve_profile(config, uri)
+    if profile == 'sqlite':
+        # The driver's own lock wait, in seconds; busy_timeout is also set per connection below
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    if profile == 'postgresql':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+    return {}
+
+
+def sqlite_pragmas(config):
+    # WAL lets readers keep reading the last committed state while an import holds the write lock;
+    # synchronous=NORMAL is durable across application crashes in WAL mode and skips most fsyncs
+    pragmas = (
+        ('journal_mode', 'WAL'),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('temp_store', 'MEMORY'),
+    )
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def configure(app):
+    # Called before db.init_app: fills in engine options for the primary and the replica bind.
+    # Options set explicitly in SQLALCHEMY_ENGINE_OPTIONS win over the profile's.
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(config, uri), **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    if config['DATABASE_REPLICA_URL']:
+        replica = config['DATABASE_REPLICA_URL']
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = {'url': replica, **engine_options(config, replica)}
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_app(app, db):
+    # Called after db.init_app, before any connection is opened
+    with app.app_context():
+        engines = db.engines
+    for key, engine in engines.items():
+        uri = app.config['DATABASE_REPLICA_URL'] if key == REPLICA_BIND else app.config['SQLALCHEMY_DATABASE_URI']
+        if resolve_profile(app.config, uri) == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+            event.listen(engine, 'connect', sqlite_pragmas(app.config))
+
+
+def replica_reads(view):
+    # Routes the rest of the request's queries to DATABASE_REPLICA_URL when one is configured. The
+    # flag lives on the request's session, so it also covers responses streamed after the view returns.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        current_app.extensions['sqlalchemy'].session.info['read_only'] = True
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,139 @@
+import bisect
+import csv
+import logging
+import os
+import threading
+from datetime import date as date_type, timedelta
+from app.cache import add_key_part
+from app.money import exponent
+
+# Rates come from a local CSV file with date,currency,rate rows, where rate is the value of one
+# unit of the currency in FX_BASE_CURRENCY on that date. Days without a row use the latest earlier
+# rate (weekends, bank holidays).
+MAX_LOOKUPS = 100000
+
+logger = logging.getLogger(__name__)
+
+
+class FxError(ValueError):
+    pass
+
+
+def parse_day(value):
+    return value if isinstance(value, date_type) else date_type.fromisoformat(str(value)[:10])
+
+
+def month_end(month):
+    # 'YYYY-MM' -> the month's last day, the day monthly totals are converted on
+    year, number = map(int, month.split('-'))
+    return date_type(year + number // 12, number % 12 + 1, 1) - timedelta(days=1)
+
+
+class RateTable:
+    def __init__(self):
+        self.path = None
+        self.base = None
+        self.version = None
+        self.series = {}
+        # (currency, day) -> rate; the bisect over a currency's series only runs once per key
+        self.lookups = {}
+        self.lock = threading.Lock()
+
+    def configure(self, path, base):
+        self.path = path
+        self.base = base
+        self.refresh()
+
+    def refresh(self):
+        # A replaced rates file is picked up without a restart, at the cost of one stat() per call
+        try:
+            version = os.stat(self.path).st_mtime_ns if self.path else None
+        except OSError:
+            version = None
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                try:
+                    self.series = self.load(self.path) if version is not None else {}
+                except (OSError, FxError) as e:
+                    # Keep serving the rates loaded last rather than failing every summary
+                    logger.error('Could not load FX rates: %s', e)
+                else:
+                    self.lookups = {}
+                self.version = version
+
+    @staticmethod
+    def load(path):
+        points = {}
+        with open(path, newline='', encoding='utf-8') as file:
+            for line_number, record in enumerate(csv.DictReader(file), start=2):
+                try:
+                    day = parse_day(record['date'].strip())
+                    currency = record['currency'].strip().upper()
+                    rate = float(record['rate'])
+                except (KeyError, AttributeError, ValueError):
+                    raise FxError(f'{path}:{line_number}: expected date,currency,rate')
+                points.setdefault(currency, {})[day] = rate
+        series = {}
+        for currency, by_day in points.items():
+            days = sorted(by_day)
+            series[currency] = (days, [by_day[day] for day in days])
+        return series
+
+    def rate(self, currency, day):
+        if currency == self.base:
+            return 1.0
+        key = (currency, day)
+        rate = self.lookups.get(key)
+        if rate is None:
+            days, rates = self.series.get(currency, ((), ()))
+            index = bisect.bisect_right(days, day) - 1
+            if index < 0:
+                raise FxError(f'No {currency} rate on or before {day.isoformat()}')
+            rate = rates[index]
+            if len(self.lookups) >= MAX_LOOKUPS:
+                self.lookups = {}
+            self.lookups[key] = rate
+        return rate
+
+    def factor(self, currency, target, day):
+        # Multiplier taking minor units of currency to minor units of target
+        return (self.rate(currency, day) / self.rate(target, day)
+                * 10 ** (exponent(target) - exponent(currency)))
+
+    def convert_rows(self, rows, target):
+        # rows: (bucket, category, transaction_type, currency, day, total in minor units), one per
+        # currency and day. Returns (converted, unconverted): the rows in target as (bucket,
+        # category, transaction_type, target, total), and the rows without a rate for their day,
+        # left in their own currency as (bucket, category, transaction_type, currency, total).
+        self.refresh()
+        factors = {}
+        converted = []
+        unconverted = []
+        for bucket, category, transaction_type, currency, day, total in rows:
+            key = (currency, day)
+            if key not in factors:
+                try:
+                    factors[key] = self.factor(currency, target, parse_day(day))
+                except FxError:
+                    factors[key] = None
+            if factors[key] is None:
+                unconverted.append((bucket, category, transaction_type, currency, total))
+            else:
+                converted.append((bucket, category, transaction_type, target, round(total * factors[key])))
+        return converted, unconverted
+
+
+rates = RateTable()
+
+
+def rates_version():
+    rates.refresh()
+    return rates.version
+
+
+def init_app(app):
+    rates.configure(app.config['FX_RATES_PATH'], app.config['FX_BASE_CURRENCY'])
+    # Converted summaries are cached, so a new rates file has to change their keys
+    add_key_part(rates_version)
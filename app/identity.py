@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from app import db
+from app.metrics import metrics
+from app.models import Category, User
+
+CachedCategory = namedtuple('CachedCategory', ('id', 'name', 'is_default'))
+
+
+class TTLCache:
+    # Per-process LRU whose entries also expire after ttl seconds, which bounds how long another
+    # worker process can serve a value that was invalidated elsewhere
+
+    def __init__(self, name, max_entries=10000, ttl=60):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+    def peek(self, key):
+        # For updating an entry in place: no LRU bump, no hit or miss counted
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry[1] if entry is not None and entry[0] > time.monotonic() else None
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def configure(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clear()
+
+
+user_cache = TTLCache('user')
+category_cache = TTLCache('category')
+
+
+def cached_user(user_id):
+    # A detached copy of the row: safe to share between requests, but nothing may be lazy loaded
+    # from it and it must not be added to a session
+    user = user_cache.get(user_id)
+    if user is None:
+        row = db.session.execute(
+            db.select(User.id, User.username, User.email, User.password_hash).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        user = User(id=row.id, username=row.username, email=row.email, password_hash=row.password_hash)
+        make_transient_to_detached(user)
+        user_cache.set(user_id, user)
+    return user
+
+
+def known_data_version(user_id):
+    # The user's data version when the request has already read it (see cache.versioned_response)
+    known = g.get('data_version')
+    return known[1] if known is not None and known[0] == user_id else None
+
+
+def user_categories(user_id):
+    # {id: CachedCategory} of one user's live (not deleted) categories, in id order. Entries
+    # remember the data version they were loaded under: a versioned response reloads an entry
+    # from another version, so a list cached before another process added a category is never
+    # served (and cached) under the version that came with it.
+    version = known_data_version(user_id)
+    entry = category_cache.get(user_id)
+    if entry is None or (version is not None and entry[0] != version):
+        rows = db.session.execute(
+            db.select(Category.id, Category.name, Category.is_default)
+            .where(Category.user_id == user_id, Category.replaced_by_id.is_(None))
+            .order_by(Category.id)
+        )
+        entry = (version, {row.id: CachedCategory(row.id, row.name, bool(row.is_default)) for row in rows})
+        category_cache.set(user_id, entry)
+    return entry[1]
+
+
+def user_category(user_id, category_id):
+    # An id missing from the cached map may belong to a category another process created after
+    # the map was loaded, so it is looked up again before it is rejected
+    category = user_categories(user_id).get(category_id)
+    if category is None:
+        category_cache.invalidate(user_id)
+        category = user_categories(user_id).get(category_id)
+    return category
+
+
+def invalidate_after_commit(session, cache, key):
+    # Dropping the entry only once the change is committed keeps other requests from re-caching
+    # the old value between the flush and the commit
+    session.info.setdefault('invalidate', set()).add((cache, key))
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def user_changed(mapper, connection, target):
+    invalidate_after_commit(object_session(target), user_cache, target.id)
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def category_changed(mapper, connection, target):
+    invalidate_after_commit(object_session(target), category_cache, target.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_invalidations(session):
+    for cache, key in session.info.pop('invalidate', ()):
+        cache.invalidate(key)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_invalidations(session):
+    session.info.pop('invalidate', None)
+
+
+def cache_counters():
+    for cache in (user_cache, category_cache):
+        labels = (('cache', cache.name),)
+        yield 'cache_hits_total', labels, cache.hits
+        yield 'cache_misses_total', labels, cache.misses
+
+
+def init_app(app):
+    user_cache.configure(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    category_cache.configure(app.config['CATEGORY_CACHE_SIZE'], app.config['CATEGORY_CACHE_TTL'])
+    metrics.register_collector(cache_counters)
@@ -0,0 +1,186 @@
+import math
+from collections import Counter
+from hashlib import blake2b
+from sqlalchemy.dialects import postgresql, sqlite
+from app import archive, categorizer, db, rollups
+from app.categories import FALLBACK_NAME, category_ids_by_name
+from app.metrics import metrics
+from app.models import Transaction
+from app.money import default_currency, to_minor
+
+# Rows are looked up and inserted in chunks this size (also keeps IN (...) under SQLite's variable limit)
+CHUNK_SIZE = 500
+TRANSACTION_TYPES = ('income', 'expense')
+
+
+class IngestError(ValueError):
+    pass
+
+
+class Fingerprinter:
+    # The fingerprint covers (user, date, amount, description, source) plus the row's occurrence
+    # number within one statement, so two identical coffees on the same day stay two rows while
+    # importing the same (or an overlapping) statement again maps onto the rows that are already there.
+
+    def __init__(self, user_id, source):
+        self.user_id = user_id
+        self.source = source
+        self.seen = Counter()
+
+    def __call__(self, date, amount, description):
+        base = f'{self.user_id}|{date.isoformat()}|{float(amount):.2f}|{description or ""}|{self.source}'
+        occurrence = self.seen[base]
+        self.seen[base] += 1
+        return blake2b(f'{base}|{occurrence}'.encode(), digest_size=16).hexdigest()
+
+    def assign(self, rows):
+        for row in rows:
+            row['fingerprint'] = self(row['date'], row['amount'], row.get('description'))
+        return rows
+
+
+def insert_ignoring_duplicates():
+    # Returns the fingerprints of the rows that were actually stored: a row another session
+    # inserted after the existing-fingerprint lookup is silently skipped by the conflict clause
+    table = Transaction.__table__
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=['fingerprint']).returning(table.c.fingerprint)
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=['fingerprint']).returning(table.c.fingerprint)
+    # Other engines rely on the existing-fingerprint lookup below
+    return table.insert()
+
+
+def ingest_rows(user_id, rows, source, fingerprinter=None, categorize=False):
+    # Inserts row dicts (date, amount, category_id or a category name, transaction_type, description
+    # and optionally currency / fingerprint) in the caller's transaction and updates the rollups for the rows
+    # that were actually new. Returns (inserted rows, skipped count). With categorize, the category
+    # the user's history gives a row's description wins over the one it came with.
+    with metrics.timer('ingest'):
+        if categorize:
+            categorizer.categorize(user_id, rows)
+        inserted, skipped = _ingest_rows(user_id, rows, source, fingerprinter or Fingerprinter(user_id, source))
+    metrics.inc('rows_ingested_total', (('source', source),), len(inserted))
+    metrics.inc('rows_skipped_total', (('source', source),), skipped)
+    return inserted, skipped
+
+
+def _ingest_rows(user_id, rows, source, fingerprinter):
+    inserted = []
+    skipped = 0
+    currency = default_currency()
+    names = {row.get('category') for row in rows if row.get('category_id') is None}
+    category_ids = category_ids_by_name(user_id, names) if names else {}
+
+    for start in range(0, len(rows), CHUNK_SIZE):
+        chunk = [{
+            'user_id': user_id,
+            'date': row['date'],
+            'amount': row['amount'],
+            'amount_minor': to_minor(row['amount'], row.get('currency') or currency),
+            'currency': row.get('currency') or currency,
+            'category_id': row.get('category_id') or category_ids[row.get('category') or FALLBACK_NAME],
+            'transaction_type': row['transaction_type'],
+            'description': row.get('description', ''),
+            'source': source,
+            'fingerprint': row.get('fingerprint') or fingerprinter(row['date'], row['amount'], row.get('description')),
+        } for row in rows[start:start + CHUNK_SIZE]]
+
+        existing = set(db.session.execute(
+            db.select(Transaction.fingerprint).where(Transaction.fingerprint.in_([row['fingerprint'] for row in chunk]))
+        ).scalars())
+        existing |= archive.archived_fingerprints(user_id, chunk)
+        new_rows = []
+        for row in chunk:
+            if row['fingerprint'] not in existing:
+                existing.add(row['fingerprint'])
+                new_rows.append(row)
+
+        if new_rows:
+            result = db.session.execute(insert_ignoring_duplicates(), new_rows)
+            if result.returns_rows:
+                stored = set(result.scalars())
+                new_rows = [row for row in new_rows if row['fingerprint'] in stored]
+            rollups.record_added_rows(new_rows)
+            inserted.extend(new_rows)
+        skipped += len(chunk) - len(new_rows)
+
+    return inserted, skipped
+
+
+def validate_one(row):
+    # The checks for a row entered by hand: a finite amount greater than 0, a known type and text
+    # for the category name and description. Raises IngestError, returns the row with the amount as a float.
+    try:
+        amount = float(row['amount'])
+    except (TypeError, ValueError):
+        raise IngestError('Invalid amount format')
+    if not math.isfinite(amount):
+        raise IngestError('Invalid amount format')
+    if amount <= 0:
+        raise IngestError('Amount must be greater than 0')
+    if row.get('transaction_type') not in TRANSACTION_TYPES:
+        raise IngestError(f"Invalid transaction_type, expected one of: {', '.join(TRANSACTION_TYPES)}")
+    for field in ('category', 'description'):
+        if not isinstance(row.get(field) or '', str):
+            raise IngestError(f'Invalid {field}')
+    return dict(row, amount=amount)
+
+
+def ingest_one(user_id, row, source='manual'):
+    # Single-row variant for the JSON endpoints; validates the row (validate_one) and returns the
+    # stored Transaction (the existing one when the same row was submitted before), or None when
+    # the row is already archived.
+    row = validate_one(row)
+    row['fingerprint'] = Fingerprinter(user_id, source)(row['date'], row['amount'], row.get('description'))
+    ingest_rows(user_id, [row], source)
+    return Transaction.query.filter_by(fingerprint=row['fingerprint']).one_or_none()
+
+
+def backfill_fingerprints(batch_size=1000):
+    # Gives rows that predate fingerprints one, numbering repeated rows in id order the same way
+    # an import numbers them in statement order. Safe to re-run: only NULL fingerprints are touched.
+    fingerprinters = {}
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(
+                Transaction.id, Transaction.user_id, Transaction.date, Transaction.amount,
+                Transaction.description, Transaction.source, Transaction.fingerprint,
+            )
+            .where(Transaction.id > last_id)
+            .order_by(Transaction.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+
+        changes = []
+        for id, user_id, date, amount, description, source, fingerprint in rows:
+            key = (user_id, source or 'manual')
+            if key not in fingerprinters:
+                fingerprinters[key] = Fingerprinter(*key)
+            # Rows that already have a fingerprint still advance the occurrence numbering
+            computed = fingerprinters[key](date, amount, description)
+            if fingerprint is None:
+                changes.append({'row_id': id, 'fingerprint': computed})
+
+        # A legacy row whose fingerprint is already taken is a duplicate from before deduplication
+        # existed; it keeps a NULL fingerprint rather than breaking the unique index.
+        taken = set(db.session.execute(
+            db.select(Transaction.fingerprint).where(Transaction.fingerprint.in_([c['fingerprint'] for c in changes]))
+        ).scalars()) if changes else set()
+        changes = [change for change in changes if change['fingerprint'] not in taken]
+
+        if changes:
+            db.session.execute(
+                Transaction.__table__.update()
+                .where(Transaction.__table__.c.id == db.bindparam('row_id'))
+                .values(fingerprint=db.bindparam('fingerprint')),
+                changes,
+            )
+        db.session.commit()
+        updated += len(changes)
+        last_id = rows[-1][0]
@@ -0,0 +1,146 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from app import db
+
+
+def worker_id():
+    # Taken at claim time, so each forked worker process has its own
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class ImportQueue:
+    # Statement imports run in a bounded thread pool; the import_job table is the source of truth,
+    # so anything left queued by a previous process is picked up again. A running job is leased
+    # to the process that claimed it, which renews the lease from a heartbeat thread; only jobs
+    # whose lease expired (their process died) are requeued. Several worker processes of one
+    # server can therefore all resume on startup without running a job twice.
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self._resumed = False
+        self._heartbeat_pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self._resumed = False
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config['IMPORT_WORKERS'],
+            thread_name_prefix='import-worker',
+        )
+        app.extensions['import_queue'] = self
+        if app.config['IMPORT_RESUME_JOBS']:
+            app.before_request(self.resume_once)
+
+    def submit(self, job_id):
+        self.start_heartbeat()
+        return self.executor.submit(self.run, job_id)
+
+    def resume_once(self):
+        if self._resumed:
+            return
+        with self._lock:
+            if self._resumed:
+                return
+            self._resumed = True
+            self.resume()
+
+    def requeue_expired(self):
+        # Running jobs whose lease was not renewed within IMPORT_LEASE_SECONDS go back to queued
+        from app.models import ImportJob
+
+        expired = datetime.utcnow() - timedelta(seconds=self.app.config['IMPORT_LEASE_SECONDS'])
+        count = ImportJob.query.filter(
+            ImportJob.status == 'running',
+            db.or_(ImportJob.heartbeat_at.is_(None), ImportJob.heartbeat_at < expired),
+        ).update({'status': 'queued', 'started_at': None, 'owner': None}, synchronize_session=False)
+        db.session.commit()
+        return count
+
+    def resume(self):
+        from app.models import ImportJob
+
+        self.requeue_expired()
+        job_ids = [job_id for job_id, in db.session.query(ImportJob.id).filter_by(status='queued').order_by(ImportJob.id)]
+        for job_id in job_ids:
+            self.submit(job_id)
+        return job_ids
+
+    def start_heartbeat(self):
+        # One per process: threads do not survive fork, so every worker starts its own
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+        threading.Thread(target=self.heartbeat, name='import-heartbeat', daemon=True).start()
+
+    def heartbeat(self):
+        from app.models import ImportJob
+
+        while True:
+            time.sleep(self.app.config['IMPORT_LEASE_SECONDS'] / 4)
+            with self.app.app_context():
+                try:
+                    ImportJob.query.filter_by(status='running', owner=worker_id()).update(
+                        {'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+                    )
+                    db.session.commit()
+                    # Jobs of a worker that died are taken over by whichever process notices first
+                    if self.requeue_expired():
+                        self.resume()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Import job heartbeat failed')
+
+    def run(self, job_id):
+        from app.models import ImportJob
+        from app.transactions.importer import import_statement
+
+        with self.app.app_context():
+            # Claim the job so a job submitted twice (upload + resume, or two workers resuming)
+            # is only processed once
+            now = datetime.utcnow()
+            claimed = ImportJob.query.filter_by(id=job_id, status='queued').update(
+                {'status': 'running', 'started_at': now, 'owner': worker_id(), 'heartbeat_at': now}
+            )
+            db.session.commit()
+            if not claimed:
+                return
+
+            job = db.session.get(ImportJob, job_id)
+
+            def commit_batch(extracted, inserted):
+                job.rows_extracted = extracted
+                job.rows_inserted = inserted
+                job.heartbeat_at = datetime.utcnow()
+                db.session.commit()
+
+            try:
+                job.rows_extracted, job.rows_inserted = import_statement(
+                    job.user_id,
+                    job.filepath,
+                    batch_size=self.app.config['IMPORT_BATCH_SIZE'],
+                    on_batch=commit_batch,
+                )
+                job.status = 'done'
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Import job %s failed: %s', job_id, e)
+                job = db.session.get(ImportJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+            if os.path.exists(job.filepath):
+                os.remove(job.filepath)
+
+
+import_queue = ImportQueue()
@@ -0,0 +1,129 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import has_request_context, request
+from flask.logging import default_handler
+
+# LOG_PROFILE picks one of these; LOG_LEVEL and LOG_DEBUG_SAMPLE_RATE override single settings
+PROFILES = {
+    'development': {'level': 'DEBUG', 'format': 'text', 'queue': False, 'debug_sample_rate': 1.0},
+    'production': {'level': 'INFO', 'format': 'json', 'queue': True, 'debug_sample_rate': 0.01},
+    'quiet': {'level': 'WARNING', 'format': 'text', 'queue': False, 'debug_sample_rate': 0.0},
+}
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s in %(module)s: %(message)s'
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line; attributes passed with extra= are added as fields
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    # Runs on the calling thread, where the request is still available
+
+    def filter(self, record):
+        if has_request_context() and not hasattr(record, 'path'):
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class DebugSampler(logging.Filter):
+    # Lets through a fraction of DEBUG records; everything above DEBUG always passes
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock prepare() formats the record on the calling thread. Only the %-merge happens here
+    # (so later changes to the arguments do not leak into the message); formatting and I/O run on
+    # the listener thread.
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def profile_settings(config):
+    profile = config['LOG_PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown LOG_PROFILE {profile!r}, expected one of: {', '.join(PROFILES)}")
+    settings = dict(PROFILES[profile])
+    if config.get('LOG_LEVEL'):
+        settings['level'] = config['LOG_LEVEL'].upper()
+    if config.get('LOG_DEBUG_SAMPLE_RATE') is not None:
+        settings['debug_sample_rate'] = config['LOG_DEBUG_SAMPLE_RATE']
+    return settings
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def init_app(app):
+    # Configures the root logger, so Flask's, werkzeug's and the app's own records share one pipeline
+    global _listener
+    settings = profile_settings(app.config)
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings['format'] == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    stop_listener()
+    if settings['queue']:
+        handler = DeferredQueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = output
+    handler.addFilter(DebugSampler(settings['debug_sample_rate']))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings['level'])
+
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(logging.NOTSET)
+
+
+def restart_listener():
+    # A forked worker inherits the queue but not the listener thread
+    if _listener is not None:
+        _listener.start()
+
+
+atexit.register(stop_listener)
+os.register_at_fork(after_in_child=restart_listener)
@@ -1,8 +1,17 @@
+from datetime import datetime
 from flask import render_template, jsonify, request
 from flask_login import login_required, current_user
 from app.main import bp
 from app.models import Transaction, Category
-from app import db
+from app import archive, db, rollups
+from app.cache import bump_data_version, versioned_response
+from app.categories import rename_category, replace_category
+from app.database import replica_reads
+from app.identity import user_categories, user_category
+from app.ingest import IngestError, ingest_one
+from app.money import CurrencyError, parse_currency
+from app.summary import SummaryError, build_summary, date_range_conditions, parse_summary_args
+from app.transactions.readmodel import transaction_dicts
 
 @bp.route('/')
 @bp.route('/index')
@@ -17,68 +26,47 @@ def add_transaction():
     if not data or 'amount' not in data or 'category_id' not in data or 'transaction_type' not in data:
         return jsonify({'error': 'Missing required fields'}), 400
     
-    category = Category.query.filter_by(id=data['category_id'], user_id=current_user.id).first()
+    try:
+        category = user_category(current_user.id, int(data['category_id']))
+    except (TypeError, ValueError):
+        category = None
     if not category:
         return jsonify({'error': 'Invalid category'}), 400
-    
-    transaction = Transaction(
-        amount=data['amount'],
-        category=category.name,  # Keep for backward compatibility
-        category_id=category.id,
-        transaction_type=data['transaction_type'],
-        description=data.get('description', ''),
-        user_id=current_user.id
-    )
-    
-    db.session.add(transaction)
+    try:
+        currency = parse_currency(data.get('currency'))
+    except CurrencyError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        transaction = ingest_one(current_user.id, {
+            'amount': data['amount'],
+            'currency': currency,
+            'category_id': category.id,
+            'transaction_type': data['transaction_type'],
+            'description': data.get('description', ''),
+            'date': datetime.utcnow(),
+        })
+    except IngestError as e:
+        return jsonify({'error': str(e)}), 400
+    if transaction is None:
+        return jsonify({'error': 'Duplicate of an archived transaction'}), 409
     db.session.commit()
     
     return jsonify(transaction.to_dict())
 
 @bp.route('/transactions/get_summary')
 @login_required
+@replica_reads
+@versioned_response
 def get_summary():
-    transactions = Transaction.query.filter_by(user_id=current_user.id).all()
-    
-    # Debug logging
-    print(f"Found {len(transactions)} transactions")
-    for t in transactions:
-        print(f"Transaction: amount={t.amount}, type={t.transaction_type}, category={t.category}")
-    
-    # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.transaction_type == 'income')
-    total_expenses = sum(abs(t.amount) for t in transactions if t.transaction_type == 'expense')
-    
-    print(f"Total income: {total_income}")
-    print(f"Total expenses: {total_expenses}")
-    print(f"Balance: {total_income - total_expenses}")
-    
-    # Calculate category breakdown (only for expenses)
-    by_category = {}
-    for t in transactions:
-        if t.transaction_type == 'expense':
-            category_name = t.category_ref.name if t.category_ref else t.category
-            by_category[category_name] = by_category.get(category_name, 0) + abs(t.amount)
-    
-    # Calculate monthly summary
-    monthly_summary = {}
-    for t in transactions:
-        month = t.date.strftime('%Y-%m')
-        if t.transaction_type == 'income':
-            monthly_summary[month] = monthly_summary.get(month, 0) + t.amount
-        else:
-            monthly_summary[month] = monthly_summary.get(month, 0) - abs(t.amount)
-    
-    response_data = {
-        'transactions': [t.to_dict() for t in transactions],
-        'total_income': total_income,
-        'total_expenses': total_expenses,
-        'balance': total_income - total_expenses,
-        'by_category': by_category,
-        'monthly_summary': monthly_summary
-    }
-    
-    print("Response data:", response_data)
+    try:
+        start, end, granularity, currency = parse_summary_args(request.args)
+        response_data = build_summary(current_user.id, start, end, granularity, currency)
+    except SummaryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response_data['transactions'] = archive.with_archived_dicts(
+        transaction_dicts(current_user.id, *date_range_conditions(start, end)), current_user.id, start, end)
     return jsonify(response_data)
 
 @bp.route('/transactions/delete_transaction/<int:transaction_id>', methods=['DELETE'])
@@ -86,8 +74,12 @@ def get_summary():
 def delete_transaction(transaction_id):
     transaction = Transaction.query.filter_by(id=transaction_id, user_id=current_user.id).first()
     if not transaction:
+        if archive.delete_rows(current_user.id, [transaction_id]):
+            db.session.commit()
+            return jsonify({'message': 'Transaction deleted successfully'})
         return jsonify({'error': 'Transaction not found'}), 404
     
+    rollups.record_deleted([transaction])
     db.session.delete(transaction)
     db.session.commit()
     
@@ -95,8 +87,9 @@ def delete_transaction(transaction_id):
 
 @bp.route('/categories', methods=['GET'])
 @login_required
+@versioned_response
 def get_categories():
-    categories = Category.query.filter_by(user_id=current_user.id).all()
+    categories = user_categories(current_user.id).values()
     return jsonify([{
         'id': cat.id,
         'name': cat.name,
@@ -112,6 +105,7 @@ def add_category():
     
     category = Category(name=data['name'], user_id=current_user.id)
     db.session.add(category)
+    bump_data_version(current_user.id)
     db.session.commit()
     
     return jsonify({
@@ -120,29 +114,45 @@ def add_category():
         'is_default': category.is_default
     }), 201
 
+@bp.route('/categories/<int:category_id>', methods=['PATCH'])
+@login_required
+def update_category(category_id):
+    data = request.get_json()
+    if not data or not data.get('name'):
+        return jsonify({'error': 'Category name is required'}), 400
+    category = user_category(current_user.id, category_id)
+    if not category:
+        return jsonify({'error': 'Category not found'}), 404
+
+    # Only the category row changes, transactions pick the name up through the join
+    rename_category(current_user.id, category_id, data['name'])
+    bump_data_version(current_user.id)
+    db.session.commit()
+
+    return jsonify({
+        'id': category.id,
+        'name': data['name'],
+        'is_default': category.is_default
+    })
+
 @bp.route('/categories/<int:category_id>', methods=['DELETE'])
 @login_required
 def delete_category(category_id):
-    category = Category.query.filter_by(id=category_id, user_id=current_user.id).first()
+    category = user_category(current_user.id, category_id)
+    categories = user_categories(current_user.id)
     if not category:
         return jsonify({'error': 'Category not found'}), 404
     
     if category.is_default:
         return jsonify({'error': 'Cannot delete default category'}), 400
     
-    # Update transactions that use this category to use a default category
-    default_category = Category.query.filter_by(
-        user_id=current_user.id,
-        is_default=True
-    ).first()
-    
-    if default_category:
-        Transaction.query.filter_by(category_id=category_id).update({
-            'category_id': default_category.id,
-            'category': default_category.name
-        })
-    
-    db.session.delete(category)
+    # Its transactions are read as belonging to the first default category from now on
+    default_category = next((c for c in categories.values() if c.is_default), None)
+    if not default_category:
+        return jsonify({'error': 'No default category to move its transactions to'}), 400
+
+    replace_category(current_user.id, category_id, default_category.id)
+    bump_data_version(current_user.id)
     db.session.commit()
     
-    return jsonify({'message': 'Category deleted successfully'}), 200 
\ No newline at end of file
+    return jsonify({'message': 'Category deleted successfully'}), 200
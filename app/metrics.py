@@ -0,0 +1,239 @@
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import Response, current_app, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+SLOW_LOG_STATEMENTS = 5
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.sum = self.sum
+        histogram.count = self.count
+        return histogram
+
+
+class RequestSeries:
+    __slots__ = ('latency', 'statuses', 'queries', 'query_time')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statuses = {}
+        self.queries = 0
+        self.query_time = 0.0
+
+
+class Metrics:
+    # Process-local counters and histograms keyed by label tuples. Each update is a dict lookup and
+    # a few additions under one lock, which keeps the per-request cost in the low microseconds.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.requests = {}
+        self.collectors = []
+        self.local = threading.local()
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def register_collector(self, collect):
+        # collect() returns (name, labels, value) counters read at scrape time
+        if collect not in self.collectors:
+            self.collectors.append(collect)
+
+    def observe_stage(self, stage, seconds):
+        self.observe('stage_duration_seconds', (('stage', stage),), seconds, STAGE_BUCKETS)
+
+    def record_request(self, endpoint, method, status, elapsed, queries, query_time):
+        # One dict lookup and a few additions under a single lock acquisition
+        series = self.requests.get((endpoint, method))
+        if series is None:
+            series = self.requests.setdefault((endpoint, method), RequestSeries())
+        with self.lock:
+            series.latency.observe(elapsed)
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+            series.queries += queries
+            series.query_time += query_time
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started)
+
+    def render(self):
+        # Prometheus text exposition format
+        with self.lock:
+            histograms = [(key, histogram.copy()) for key, histogram in self.histograms.items()]
+            counters = dict(self.counters)
+            for (endpoint, method), series in self.requests.items():
+                labels = (('endpoint', endpoint), ('method', method))
+                histograms.append((('request_duration_seconds', labels), series.latency.copy()))
+                for status, count in series.statuses.items():
+                    counters[('requests_total', labels + (('status', status),))] = count
+                counters[('sql_queries_total', labels)] = series.queries
+                counters[('sql_seconds_total', labels)] = series.query_time
+        for collect in self.collectors:
+            for name, labels, value in collect():
+                counters[(name, labels)] = value
+
+        lines = []
+        declared = set()
+        for (name, labels), histogram in sorted(histograms, key=lambda item: item[0]):
+            name = f'financeapp_{name}'
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", repr(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum}')
+            lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+        for (name, labels), value in sorted(counters.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            name = f'financeapp_{name}'
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+
+metrics = Metrics()
+
+
+class RequestState:
+    __slots__ = ('started', 'queries', 'query_time', 'statements')
+
+    def __init__(self, track_statements):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = {} if track_statements else None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own execution context: a statement that fails never reaches
+    # after_cursor_execute, and its start time is dropped together with the context
+    context.metrics_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.metrics_started
+    state = getattr(metrics.local, 'request', None)
+    if state is None:
+        # Queries outside a request (import jobs, CLI) only go to the totals
+        metrics.inc('sql_queries_total', (('endpoint', '-'), ('method', '-')))
+        metrics.inc('sql_seconds_total', (('endpoint', '-'), ('method', '-')), elapsed)
+        return
+    state.queries += 1
+    state.query_time += elapsed
+    if state.statements is not None:
+        entry = state.statements.get(statement)
+        if entry is None:
+            state.statements[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+def finish_request(status, slow_ms):
+    state = getattr(metrics.local, 'request', None)
+    if state is None:
+        return
+    metrics.local.request = None
+    elapsed = time.perf_counter() - state.started
+    req = request._get_current_object()
+    metrics.record_request(req.endpoint or 'unmatched', req.method, status, elapsed, state.queries, state.query_time)
+
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        top = sorted(state.statements.items(), key=lambda item: item[1][1], reverse=True)[:SLOW_LOG_STATEMENTS]
+        breakdown = '; '.join(
+            f'{count}x {seconds * 1000:.1f} ms {" ".join(statement.split())[:200]}' for statement, (count, seconds) in top
+        )
+        current_app.logger.warning(
+            'Slow request %s %s: %.1f ms, %d queries in %.1f ms. Top queries: %s',
+            req.method, req.path, elapsed * 1000, state.queries, state.query_time * 1000, breakdown,
+        )
+
+
+def metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, db):
+    if not app.config['METRICS_ENABLED']:
+        return
+    slow_ms = app.config['SLOW_REQUEST_MS']
+
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        metrics.local.request = RequestState(bool(slow_ms))
+
+    @app.after_request
+    def record_request_metrics(response):
+        finish_request(response.status_code, slow_ms)
+        return response
+
+    @app.teardown_request
+    def record_failed_request_metrics(exc):
+        # Only still pending when the view raised
+        finish_request(500, slow_ms)
+
+    # Per-route traffic is not for everyone: the endpoint needs a token, or an explicit opt-in to
+    # serve it without one (e.g. on a private scrape network)
+    if app.config['METRICS_TOKEN'] or app.config['METRICS_PUBLIC']:
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -19,14 +19,25 @@ class User(UserMixin, db.Model):
 
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    # Served from the per-process identity cache; a miss costs one query
+    from app.identity import cached_user
+    return cached_user(int(id))
 
 class Category(db.Model):
+    __table_args__ = (
+        db.Index('ix_category_user', 'user_id'),
+        db.Index('ix_category_replaced_by', 'replaced_by_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     transactions = db.relationship('Transaction', backref='category_ref', lazy=True)
     is_default = db.Column(db.Boolean, default=False)
+    # Set when the category is deleted: its transactions keep their category_id and are read as
+    # belonging to the replacement (see app.categories)
+    replaced_by_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    replaced_by = db.relationship('Category', remote_side=[id])
 
     def __init__(self, name, user_id, is_default=False):
         self.name = name
@@ -34,15 +45,26 @@ class Category(db.Model):
         self.is_default = is_default
 
 class Transaction(db.Model):
+    __table_args__ = (
+        db.Index('ix_transaction_user_date', 'user_id', 'date', 'id'),
+        db.Index('ix_transaction_user_type_date', 'user_id', 'transaction_type', 'date', 'id'),
+        db.Index('ix_transaction_user_category_date', 'user_id', 'category_id', 'date', 'id'),
+        db.Index('ix_transaction_user_source_date', 'user_id', 'source', 'date', 'id'),
+        db.Index('ix_transaction_user_amount', 'user_id', 'amount'),
+        db.Index('ix_transaction_fingerprint', 'fingerprint', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(64), nullable=False) 
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    amount = db.Column(db.Float, nullable=False)  # float mirror of amount_minor for responses
+    amount_minor = db.Column(db.BigInteger)  # see app.money, NULL only until "flask schema upgrade" has run
+    currency = db.Column(db.String(3))
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))  # the name only lives on Category
     transaction_type = db.Column(db.String(64), nullable=False) 
     description = db.Column(db.String(256))
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     source = db.Column(db.String(64), default='manual') 
+    fingerprint = db.Column(db.String(32))  # see app.ingest, NULL only for rows that predate it
     
     def __init__(self, **kwargs):
         super(Transaction, self).__init__(**kwargs)
@@ -50,13 +72,96 @@ class Transaction(db.Model):
             self.date = datetime.utcnow()
     
     def to_dict(self):
+        category = self.category_ref
+        if category is not None and category.replaced_by is not None:
+            category = category.replaced_by
         return {
             'id': self.id,
             'amount': self.amount,
-            'category': self.category,
-            'category_id': self.category_id,
+            'currency': self.currency,
+            'category': category.name if category else None,
+            'category_id': category.id if category else None,
             'transaction_type': self.transaction_type,
             'description': self.description or '',
-            'date': self.date.strftime('%Y-%m-%d %H:%M:%S') if self.date else datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            # isoformat produces the same text as strftime('%Y-%m-%d %H:%M:%S') at a fraction of the cost
+            'date': (self.date or datetime.utcnow()).isoformat(sep=' ', timespec='seconds'),
             'source': self.source
-        } 
\ No newline at end of file
+        }
+
+class SummaryRollup(db.Model):
+    __tablename__ = 'summary_rollup'
+    __table_args__ = (
+        db.Index('ix_summary_rollup_user_month', 'user_id', 'month'),
+        db.Index('ix_summary_rollup_user_category', 'user_id', 'category_id'),
+    )
+
+    # Per (user, month, category, type, currency) totals, kept in step with Transaction writes.
+    # Expense totals are stored as absolute values so the summary never has to look at raw rows.
+    # Category names are joined in at read time, so renames and deletes never touch this table.
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    transaction_type = db.Column(db.String(64), nullable=False)
+    currency = db.Column(db.String(3))
+    total_minor = db.Column(db.BigInteger)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+    __table_args__ = (
+        db.Index('ix_import_job_status', 'status', 'id'),
+        db.Index('ix_import_job_user', 'user_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(256), nullable=False)
+    filepath = db.Column(db.String(512), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    rows_extracted = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Lease of a running job: the "host:pid" running it, renewed every few seconds (see app.jobs)
+    owner = db.Column(db.String(64))
+    heartbeat_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'rows_extracted': self.rows_extracted,
+            'rows_inserted': self.rows_inserted,
+            'rows_skipped': self.rows_extracted - self.rows_inserted,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None,
+        }
+
+class TransactionArchive(db.Model):
+    __tablename__ = 'transaction_archive'
+    __table_args__ = (
+        db.Index('ix_transaction_archive_user_year', 'user_id', 'year', unique=True),
+    )
+
+    # One per user and calendar year whose transactions were moved out of the transaction table
+    # into column files (app.archive). directory is relative to ARCHIVE_PATH and changes
+    # whenever the archive is rewritten, so readers of the previous files are never disturbed.
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    directory = db.Column(db.String(256), nullable=False)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    # Bumped in the same transaction as every write to a user's transactions or categories
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
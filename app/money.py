@@ -0,0 +1,71 @@
+from decimal import ROUND_HALF_UP, Decimal
+from flask import current_app
+from app import db
+from app.models import Transaction
+
+# Amounts are stored as integers in the currency's minor unit (grosze, cents). Currencies without
+# a minor unit are listed here, everything else has two decimals.
+EXPONENTS = {'JPY': 0, 'KRW': 0, 'ISK': 0, 'CLP': 0}
+DEFAULT_EXPONENT = 2
+
+
+class CurrencyError(ValueError):
+    pass
+
+
+def exponent(currency):
+    return EXPONENTS.get(currency, DEFAULT_EXPONENT)
+
+
+def default_currency():
+    return current_app.config['DEFAULT_CURRENCY']
+
+
+def parse_currency(value):
+    if value in (None, ''):
+        return default_currency()
+    currency = str(value).strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise CurrencyError('Invalid currency, expected a three letter ISO 4217 code')
+    return currency
+
+
+def to_minor(amount, currency):
+    # Goes through the decimal text of the float so 0.1 + 0.2 style noise never reaches the integer
+    return int(Decimal(str(amount)).scaleb(exponent(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor, currency):
+    return amount_minor / 10 ** exponent(currency)
+
+
+def backfill_minor_units(batch_size=1000):
+    # Converts rows that predate amount_minor, in id order and one commit per batch, so an
+    # interrupted run picks up where it stopped. Rows without a currency get the default one.
+    table = Transaction.__table__
+    currency = default_currency()
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.amount, table.c.currency)
+            .where(table.c.id > last_id, table.c.amount_minor.is_(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+
+        db.session.execute(
+            table.update()
+            .where(table.c.id == db.bindparam('row_id'))
+            .values(amount_minor=db.bindparam('amount_minor'), currency=db.bindparam('row_currency')),
+            [{
+                'row_id': id,
+                'amount_minor': to_minor(amount, row_currency or currency),
+                'row_currency': row_currency or currency,
+            } for id, amount, row_currency in rows],
+        )
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1][0]
@@ -0,0 +1,156 @@
+from collections import defaultdict
+from app import categorizer, db
+from app.cache import bump_data_version
+from app.models import DataVersion, SummaryRollup, Transaction
+from app.money import default_currency, to_minor
+
+
+def rollup_key(user_id, date, category_id, transaction_type, currency):
+    return (user_id, date.strftime('%Y-%m'), category_id, transaction_type, currency)
+
+
+def rollup_amount(transaction_type, amount):
+    # Income is summed as-is, everything else counts as an expense by its absolute value
+    return amount if transaction_type == 'income' else abs(amount)
+
+
+def collect_deltas(transactions, sign=1):
+    # Totals are integer minor units, so adding and subtracting deltas never drifts
+    deltas = defaultdict(lambda: [0, 0])
+    currency = default_currency()
+    for t in transactions:
+        amount_minor = t.amount_minor if t.amount_minor is not None else to_minor(t.amount, t.currency or currency)
+        delta = deltas[rollup_key(t.user_id, t.date, t.category_id, t.transaction_type, t.currency or currency)]
+        delta[0] += sign * rollup_amount(t.transaction_type, amount_minor)
+        delta[1] += sign
+    return deltas
+
+
+def collect_row_deltas(rows, sign=1):
+    # Same as collect_deltas for plain row dicts written with Core inserts
+    deltas = defaultdict(lambda: [0, 0])
+    for row in rows:
+        delta = deltas[rollup_key(row['user_id'], row['date'], row['category_id'], row['transaction_type'], row['currency'])]
+        delta[0] += sign * rollup_amount(row['transaction_type'], row['amount_minor'])
+        delta[1] += sign
+    return deltas
+
+
+def apply_deltas(deltas):
+    # Runs inside the caller's session so rollups commit (or roll back) together with the rows.
+    # Every transaction write passes through here, so this is also where data versions are bumped.
+    table = SummaryRollup.__table__
+    bump_data_version(*(key[0] for key, (total, count) in deltas.items() if count or total))
+    for (user_id, month, category_id, transaction_type, currency), (total, count) in deltas.items():
+        if not count and not total:
+            continue
+        match = (
+            (table.c.user_id == user_id)
+            & (table.c.month == month)
+            & (table.c.category_id == category_id)
+            & (table.c.transaction_type == transaction_type)
+            & (table.c.currency == currency)
+        )
+        result = db.session.execute(
+            table.update().where(match).values(total_minor=table.c.total_minor + total, count=table.c.count + count)
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(
+                user_id=user_id,
+                month=month,
+                category_id=category_id,
+                transaction_type=transaction_type,
+                currency=currency,
+                total_minor=total,
+                count=count,
+            ))
+        elif count < 0:
+            db.session.execute(table.delete().where(match & (table.c.count <= 0)))
+
+
+# The category index learns from the same writes as the rollups
+def record_added(transactions):
+    apply_deltas(collect_deltas(transactions, sign=1))
+    categorizer.learn_transactions(transactions, sign=1)
+
+
+def record_deleted(transactions):
+    apply_deltas(collect_deltas(transactions, sign=-1))
+    categorizer.learn_transactions(transactions, sign=-1)
+
+
+def record_added_rows(rows):
+    apply_deltas(collect_row_deltas(rows, sign=1))
+    categorizer.learn_rows(rows, sign=1)
+
+
+def record_deleted_rows(rows):
+    apply_deltas(collect_row_deltas(rows, sign=-1))
+    categorizer.learn_rows(rows, sign=-1)
+
+
+def compute_from_transactions(user_id=None, batch_size=1000):
+    query = Transaction.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return collect_deltas(query.order_by(Transaction.id).yield_per(batch_size))
+
+
+def stored_rollups(user_id=None):
+    table = SummaryRollup.__table__
+    query = db.select(
+        table.c.user_id,
+        table.c.month,
+        table.c.category_id,
+        table.c.transaction_type,
+        table.c.currency,
+        db.func.sum(table.c.total_minor),
+        db.func.sum(table.c.count),
+    ).group_by(table.c.user_id, table.c.month, table.c.category_id, table.c.transaction_type, table.c.currency)
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+    return {row[:5]: [row[5], row[6]] for row in db.session.execute(query)}
+
+
+def find_drift(user_id=None):
+    expected = compute_from_transactions(user_id)
+    actual = stored_rollups(user_id)
+    drift = []
+    for key in sorted(set(expected) | set(actual), key=lambda k: tuple('' if v is None else str(v) for v in k)):
+        expected_total, expected_count = expected.get(key, (0, 0))
+        actual_total, actual_count = actual.get(key, (0, 0))
+        if expected_count != actual_count or expected_total != actual_total:
+            drift.append({
+                'key': key,
+                'expected_total': expected_total,
+                'actual_total': actual_total,
+                'expected_count': expected_count,
+                'actual_count': actual_count,
+            })
+    return drift
+
+
+def rebuild(user_id=None):
+    table = SummaryRollup.__table__
+    deltas = compute_from_transactions(user_id)
+    delete = table.delete()
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+    db.session.execute(delete)
+    # Cached summaries may have been built from the drifted rollups
+    if user_id is not None:
+        bump_data_version(user_id)
+    else:
+        db.session.execute(DataVersion.__table__.update().values(version=DataVersion.__table__.c.version + 1))
+    if deltas:
+        db.session.execute(table.insert(), [{
+            'user_id': key[0],
+            'month': key[1],
+            'category_id': key[2],
+            'transaction_type': key[3],
+            'currency': key[4],
+            'total_minor': total,
+            'count': count,
+        } for key, (total, count) in deltas.items()])
+    db.session.commit()
+    return len(deltas)
@@ -0,0 +1,93 @@
+from app import db
+
+
+def add_missing_columns():
+    # create_all() never alters existing tables; nullable columns added to a model are added here
+    added = []
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f'ALTER TABLE {preparer.format_table(table)} '
+                    f'ADD COLUMN {preparer.format_column(column)} {column_type}'
+                ))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+# Columns the models no longer have, dropped by upgrade() once their data has been migrated
+REMOVED_COLUMNS = {
+    'transaction': ('category',),  # replaced by category_id
+    'summary_rollup': ('category', 'total'),  # names are joined in at read time, totals are total_minor
+}
+
+
+def drop_removed_columns():
+    dropped = []
+    inspector = db.inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    for table_name, names in REMOVED_COLUMNS.items():
+        if not inspector.has_table(table_name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table_name)}
+        for name in names:
+            if name not in existing:
+                continue
+            # Needs SQLite 3.35 or newer
+            with db.engine.begin() as connection:
+                connection.execute(db.text(
+                    f'ALTER TABLE {preparer.quote(table_name)} DROP COLUMN {preparer.quote(name)}'
+                ))
+            dropped.append(f'{table_name}.{name}')
+    return dropped
+
+
+def create_missing_indexes():
+    # create_all() only adds indexes together with new tables, existing databases need them explicitly
+    created = []
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in {i['name'] for i in db.inspect(db.engine).get_indexes(table.name)}:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
+
+
+def upgrade():
+    from app import rollups
+    from app.categories import backfill_category_ids
+    from app.ingest import backfill_fingerprints
+    from app.models import SummaryRollup, Transaction
+    from app.money import backfill_minor_units
+    from app.transactions.search import create_search_index
+
+    had_rollups = db.inspect(db.engine).has_table(SummaryRollup.__tablename__)
+    db.create_all()
+    report = {'columns': add_missing_columns()}
+    # Fingerprints must be filled in before their unique index is built
+    report['fingerprints'] = backfill_fingerprints()
+    report['amounts'] = backfill_minor_units()
+    # The old columns are only dropped after everything they held has been copied over
+    report['categories'] = backfill_category_ids()
+    report['dropped'] = drop_removed_columns()
+    report['indexes'] = create_missing_indexes()
+    report['search_index'] = create_search_index()
+    # Rollups are derived data: ones keyed by the old columns are rebuilt rather than migrated, and
+    # a database that had none (or an empty table next to transactions) gets them built
+    report['rollup_rows'] = None
+    stale = db.session.execute(db.select(SummaryRollup.id).where(SummaryRollup.total_minor.is_(None)).limit(1)).first()
+    empty = (
+        db.session.execute(db.select(SummaryRollup.id).limit(1)).first() is None
+        and db.session.execute(db.select(Transaction.id).limit(1)).first() is not None
+    )
+    if not had_rollups or stale or empty or any(name.startswith('summary_rollup.') for name in report['dropped']):
+        report['rollup_rows'] = rollups.rebuild()
+    return report
@@ -0,0 +1,167 @@
+import argparse
+import gc
+import logging
+import os
+import resource
+import signal
+import socket
+import sys
+import time
+from app import create_app, db
+from app.transactions.importer import available_cpus, extract_transactions_from_text
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is restarted only after the same delay, so a
+# crash on startup does not turn into a fork loop
+RESPAWN_DELAY = 1.0
+
+
+def rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def warmup():
+    # Statement parsing pulls in pdfplumber, pdfminer and Pillow. Importing them in the master
+    # means every worker shares the pages instead of loading its own copy on the first upload.
+    import pdfplumber  # noqa: F401
+
+    extract_transactions_from_text('01.01.2024\n"Warmup"\n-1,00 PLN')
+
+
+def prepare_for_fork(app):
+    # Workers open their own connections, and whatever the master loaded is moved out of the
+    # garbage collector's reach so collections in a worker do not copy the shared pages
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host or '0.0.0.0', int(port)
+
+
+def serve_gunicorn(app, bind, workers):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('preload_app', True)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def serve_prefork(app, bind, workers):
+    # Fallback without gunicorn: the master binds the socket and forks workers that each run a
+    # threaded werkzeug server accepting on it. Workers that exit are replaced until the master
+    # gets SIGTERM or SIGINT.
+    from werkzeug.serving import make_server
+
+    host, port = parse_bind(bind)
+    listener = socket.create_server((host, port), backlog=128)
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid:
+            children[pid] = time.monotonic()
+            return
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            make_server(host, port, app, threaded=True, fd=listener.fileno()).serve_forever()
+        finally:
+            os._exit(0)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    logger.info('Serving on http://%s:%d with %d workers', host, port, workers)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning('Worker %d exited with status %d, starting a new one', pid, status)
+        if time.monotonic() - started < RESPAWN_DELAY:
+            time.sleep(RESPAWN_DELAY)
+        spawn()
+    listener.close()
+
+
+def main(started=None):
+    # started: time.perf_counter() taken before the app was imported, for the startup report
+    parser = argparse.ArgumentParser(description='Run the app with a pre-forking multi-process server.')
+    parser.add_argument('--bind', help='host:port (default: SERVE_BIND)')
+    parser.add_argument('--workers', type=int, help='worker processes (default: SERVE_WORKERS, or one per core)')
+    parser.add_argument('--warmup', action=argparse.BooleanOptionalAction, default=None,
+                        help='load the statement parsing modules before forking (default: SERVE_WARMUP)')
+    parser.add_argument('--backend', choices=('auto', 'gunicorn', 'werkzeug'), default='auto')
+    args = parser.parse_args()
+
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+    config = app.config
+    warm = config['SERVE_WARMUP'] if args.warmup is None else args.warmup
+    if warm:
+        warmup()
+    warmed = time.perf_counter()
+    prepare_for_fork(app)
+
+    bind = args.bind or config['SERVE_BIND']
+    workers = args.workers or config['SERVE_WORKERS'] or available_cpus()
+    # Every worker starts its own statement parse pool, so they share the IMPORT_PROCESSES budget
+    # (one per core by default) instead of each taking all the cores
+    config['IMPORT_PROCESSES'] = max(1, (config['IMPORT_PROCESSES'] or available_cpus()) // workers)
+    backend = args.backend
+    if backend == 'auto':
+        try:
+            import gunicorn  # noqa: F401
+            backend = 'gunicorn'
+        except ImportError:
+            backend = 'werkzeug'
+
+    report = {
+        'imports_ms': round((imported - started) * 1000, 1) if started is not None else None,
+        'create_app_ms': round((created - imported) * 1000, 1),
+        'warmup_ms': round((warmed - created) * 1000, 1) if warm else None,
+        'rss_mb': round(rss_mb(), 1),
+        'backend': backend,
+        'workers': workers,
+        'import_processes': config['IMPORT_PROCESSES'],
+    }
+    if workers > 1 and config['METRICS_ENABLED'] and (config['METRICS_TOKEN'] or config['METRICS_PUBLIC']):
+        logger.warning('Metrics are kept per worker process: each /metrics scrape shows one of the %d workers', workers)
+    logger.info(
+        'Startup: imports %s ms, create_app %s ms, warmup %s ms, master RSS %s MB',
+        report['imports_ms'], report['create_app_ms'], report['warmup_ms'], report['rss_mb'],
+        extra={'startup': report},
+    )
+
+    if backend == 'gunicorn':
+        serve_gunicorn(app, bind, workers)
+    else:
+        serve_prefork(app, bind, workers)
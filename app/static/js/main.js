@@ -5,8 +5,7 @@ document.addEventListener('DOMContentLoaded', function() {
     if (isAuthenticated) {
         // Load initial data only if user is authenticated
         loadCategories();
-        loadTransactions();
-        loadSummary();
+        loadDashboard();
     } else {
         // If not authenticated, show empty state
         document.getElementById('transactionsList').innerHTML = '<div class="text-center">Please log in to view transactions</div>';
@@ -48,8 +47,7 @@ document.addEventListener('DOMContentLoaded', function() {
         })
         .then(data => {
             document.getElementById('transactionForm').reset();
-            loadTransactions();
-            loadSummary();
+            loadDashboard();
         })
         .catch(error => {
             console.error('Error:', error);
@@ -94,13 +92,31 @@ document.addEventListener('DOMContentLoaded', function() {
     document.getElementById('pdfForm')?.addEventListener('submit', function(e) {
         e.preventDefault();
         const fileInput = document.getElementById('pdfFile');
-        const file = fileInput.files[0];
+        const files = Array.from(fileInput.files);
+        const file = files[0];
 
         if (!file) {
             alert('Please select a PDF file');
             return;
         }
 
+        if (files.length > 1 || file.name.toLowerCase().endsWith('.zip')) {
+            uploadStatementBatch(files)
+                .then(data => {
+                    fileInput.value = '';
+                    const failed = data.files.filter(report => report.status === 'failed');
+                    if (failed.length > 0) {
+                        alert('Some statements could not be processed:\n' + failed.map(report => `${report.filename}: ${report.error}`).join('\n'));
+                    }
+                    loadDashboard();
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    alert('Error processing statements: ' + error.message);
+                });
+            return;
+        }
+
         const formData = new FormData();
         formData.append('file', file);
 
@@ -114,13 +130,15 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             return response.json();
         })
-        .then(data => {
-            if (data.error) {
-                throw new Error(data.error);
+        .then(job => {
+            if (job.error) {
+                throw new Error(job.error);
             }
             fileInput.value = '';
-            loadTransactions();
-            loadSummary();
+            return pollImportJob(job.id);
+        })
+        .then(job => {
+            loadDashboard();
         })
         .catch(error => {
             console.error('Error:', error);
@@ -129,6 +147,48 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+function uploadStatementBatch(files) {
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+
+    return fetch('/transactions/upload_batch', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json().then(data => {
+        if (!response.ok || data.error) {
+            throw new Error(data.error || 'Network response was not ok');
+        }
+        return data;
+    }));
+}
+
+// Resolves once the background import has finished, rejects if it failed
+function pollImportJob(jobId, interval = 1000) {
+    return new Promise((resolve, reject) => {
+        const check = () => {
+            fetch(`/transactions/import_jobs/${jobId}`)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error('Network response was not ok');
+                    }
+                    return response.json();
+                })
+                .then(job => {
+                    if (job.status === 'done') {
+                        resolve(job);
+                    } else if (job.status === 'failed') {
+                        reject(new Error(job.error || 'Import failed'));
+                    } else {
+                        setTimeout(check, interval);
+                    }
+                })
+                .catch(reject);
+        };
+        check();
+    });
+}
+
 function loadCategories() {
     fetch('/categories')
         .then(response => {
@@ -203,7 +263,7 @@ function deleteCategory(categoryId) {
     })
     .then(data => {
         loadCategories();
-        loadTransactions();
+        loadDashboard();
     })
     .catch(error => {
         console.error('Error:', error);
@@ -211,68 +271,88 @@ function deleteCategory(categoryId) {
     });
 }
 
-function loadTransactions() {
-    fetch('/transactions/get_summary')
+const PAGE_SIZE = 50;
+
+// Fetches the next page of the history after the rows already shown
+function loadTransactions(cursor) {
+    const params = new URLSearchParams({ limit: PAGE_SIZE, cursor: cursor });
+
+    fetch(`/transactions/list?${params}`)
         .then(response => {
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
             return response.json();
         })
-        .then(data => {
-            const transactionsList = document.getElementById('transactionsList');
-            transactionsList.innerHTML = '';
-
-            if (data.transactions && data.transactions.length > 0) {
-                data.transactions.forEach(transaction => {
-                    const transactionElement = document.createElement('div');
-                    transactionElement.className = 'transaction-item';
-                    
-                    const transactionInfo = document.createElement('div');
-                    transactionInfo.className = 'transaction-info';
-                    
-                    const category = document.createElement('div');
-                    category.className = 'transaction-category';
-                    category.textContent = transaction.category;
-                    
-                    const description = document.createElement('div');
-                    description.className = 'transaction-description';
-                    description.textContent = transaction.description || 'No description';
-                    
-                    const date = document.createElement('div');
-                    date.className = 'transaction-date';
-                    date.textContent = new Date(transaction.date).toLocaleDateString();
-                    
-                    transactionInfo.appendChild(category);
-                    transactionInfo.appendChild(description);
-                    transactionInfo.appendChild(date);
-                    
-                    const amount = document.createElement('div');
-                    amount.className = `transaction-amount ${transaction.transaction_type}`;
-                    amount.textContent = `$${Math.abs(transaction.amount).toFixed(2)}`;
-                    
-                    const deleteButton = document.createElement('button');
-                    deleteButton.className = 'btn btn-danger';
-                    deleteButton.innerHTML = '<i class="fas fa-trash"></i>';
-                    deleteButton.onclick = () => deleteTransaction(transaction.id);
-                    
-                    transactionElement.appendChild(transactionInfo);
-                    transactionElement.appendChild(amount);
-                    transactionElement.appendChild(deleteButton);
-                    
-                    transactionsList.appendChild(transactionElement);
-                });
-            } else {
-                transactionsList.innerHTML = '<div class="text-center">No transactions found</div>';
-            }
-        })
+        .then(data => renderTransactions(data.transactions, data.next_cursor, true))
         .catch(error => {
-            console.error('Error:', error);
-            const transactionsList = document.getElementById('transactionsList');
-            transactionsList.innerHTML = '<div class="text-center">Please log in to view transactions</div>';
+            console.error('Error loading transactions:', error);
         });
 }
 
+function renderTransactions(transactions, nextCursor, append) {
+    const transactionsList = document.getElementById('transactionsList');
+    if (!append) {
+        transactionsList.innerHTML = '';
+    }
+    document.getElementById('loadMoreTransactions')?.remove();
+
+    if (transactions && transactions.length > 0) {
+        transactions.forEach(transaction => {
+            const transactionElement = document.createElement('div');
+            transactionElement.className = 'transaction-item';
+            
+            const transactionInfo = document.createElement('div');
+            transactionInfo.className = 'transaction-info';
+            
+            const category = document.createElement('div');
+            category.className = 'transaction-category';
+            category.textContent = transaction.category;
+            
+            const description = document.createElement('div');
+            description.className = 'transaction-description';
+            description.textContent = transaction.description || 'No description';
+            
+            const date = document.createElement('div');
+            date.className = 'transaction-date';
+            date.textContent = new Date(transaction.date).toLocaleDateString();
+            
+            transactionInfo.appendChild(category);
+            transactionInfo.appendChild(description);
+            transactionInfo.appendChild(date);
+            
+            const amount = document.createElement('div');
+            amount.className = `transaction-amount ${transaction.transaction_type}`;
+            amount.textContent = new Intl.NumberFormat('en-US', {
+                style: 'currency',
+                currency: transaction.currency || 'USD'
+            }).format(Math.abs(transaction.amount));
+            
+            const deleteButton = document.createElement('button');
+            deleteButton.className = 'btn btn-danger';
+            deleteButton.innerHTML = '<i class="fas fa-trash"></i>';
+            deleteButton.onclick = () => deleteTransaction(transaction.id);
+            
+            transactionElement.appendChild(transactionInfo);
+            transactionElement.appendChild(amount);
+            transactionElement.appendChild(deleteButton);
+            
+            transactionsList.appendChild(transactionElement);
+        });
+
+        if (nextCursor) {
+            const loadMoreButton = document.createElement('button');
+            loadMoreButton.id = 'loadMoreTransactions';
+            loadMoreButton.className = 'btn btn-secondary';
+            loadMoreButton.textContent = 'Load more';
+            loadMoreButton.onclick = () => loadTransactions(nextCursor);
+            transactionsList.appendChild(loadMoreButton);
+        }
+    } else if (!append) {
+        transactionsList.innerHTML = '<div class="text-center">No transactions found</div>';
+    }
+}
+
 // Global chart instances
 let categoryChart = null;
 let monthlyChart = null;
@@ -286,8 +366,9 @@ function destroyChart(chart) {
     return null;
 }
 
-function loadSummary() {
-    fetch('/transactions/get_summary')
+// One request for the aggregates and the first page of transactions
+function loadDashboard() {
+    fetch(`/transactions/dashboard?recent=${PAGE_SIZE}`)
         .then(response => {
             if (!response.ok) {
                 throw new Error('Network response was not ok');
@@ -296,12 +377,13 @@ function loadSummary() {
         })
         .then(data => {
             console.log('Received summary data:', data);
+            renderTransactions(data.recent_transactions, data.recent_cursor, false);
             
             // Update summary numbers with proper formatting
             const formatCurrency = (amount) => {
                 return new Intl.NumberFormat('en-US', {
                     style: 'currency',
-                    currency: 'USD',
+                    currency: data.currency || 'USD',
                     minimumFractionDigits: 2,
                     maximumFractionDigits: 2
                 }).format(amount);
@@ -505,6 +587,7 @@ function loadSummary() {
         })
         .catch(error => {
             console.error('Error loading summary:', error);
+            document.getElementById('transactionsList').innerHTML = '<div class="text-center">Please log in to view transactions</div>';
             document.getElementById('totalIncome').textContent = '$0.00';
             document.getElementById('totalExpenses').textContent = '$0.00';
             document.getElementById('balance').textContent = '$0.00';
@@ -553,8 +636,7 @@ function deleteTransaction(id) {
         return response.json();
     })
     .then(data => {
-        loadTransactions();
-        loadSummary();
+        loadDashboard();
     })
     .catch(error => {
         console.error('Error:', error);
@@ -0,0 +1,228 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from app import archive, db
+from app.categories import join_categories, resolved_category_name
+from app.fx import month_end, rates
+from app.models import SummaryRollup, Transaction
+from app.money import CurrencyError, default_currency, from_minor, parse_currency
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+
+
+class SummaryError(ValueError):
+    pass
+
+
+def parse_date(value, field):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise SummaryError(f'Invalid {field} date, expected YYYY-MM-DD')
+
+
+def parse_summary_args(args):
+    granularity = args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        raise SummaryError(f"Invalid granularity, expected one of: {', '.join(GRANULARITIES)}")
+    start = parse_date(args.get('from'), 'from')
+    end = parse_date(args.get('to'), 'to')
+    if start and end and start > end:
+        raise SummaryError('from must not be after to')
+    try:
+        currency = parse_currency(args['currency']) if args.get('currency') else None
+    except CurrencyError as e:
+        raise SummaryError(str(e))
+    return start, end, granularity, currency
+
+
+def bucket_expression(column, granularity):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        if granularity == 'day':
+            return db.func.strftime('%Y-%m-%d', column)
+        if granularity == 'week':
+            # Monday of the row's week
+            return db.func.date(column, 'weekday 0', '-6 days')
+        if granularity == 'month':
+            return db.func.strftime('%Y-%m', column)
+        return db.func.strftime('%Y', column)
+    if dialect == 'postgresql':
+        formats = {'day': 'YYYY-MM-DD', 'week': 'YYYY-MM-DD', 'month': 'YYYY-MM', 'year': 'YYYY'}
+        return db.func.to_char(db.func.date_trunc(granularity, column), formats[granularity])
+    # A 400 through the routes' SummaryError handling rather than a 500
+    raise SummaryError(f'Summaries by {granularity} are not supported on {dialect}')
+
+
+def signed_amount():
+    # Integer minor units: SUM stays exact and cheaper than accumulating floats
+    return db.case(
+        (Transaction.transaction_type == 'income', Transaction.amount_minor),
+        else_=db.func.abs(Transaction.amount_minor),
+    )
+
+
+def currency_column():
+    return db.func.coalesce(Transaction.currency, default_currency())
+
+
+def date_range_conditions(start, end):
+    conditions = []
+    if start:
+        conditions.append(Transaction.date >= datetime.combine(start, datetime.min.time()))
+    if end:
+        conditions.append(Transaction.date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return conditions
+
+
+def covers_whole_months(start, end):
+    return (start is None or start.day == 1) and (end is None or (end + timedelta(days=1)).day == 1)
+
+
+def summarize(rows):
+    # rows: (bucket, category, transaction_type, currency, total) in minor units of the reporting
+    # currency, with expense totals already absolute. Sums stay integers until the very end.
+    total_income = 0
+    total_expenses = 0
+    by_category = {}
+    by_period = {}
+
+    for bucket, category, transaction_type, _, total in rows:
+        if transaction_type == 'income':
+            total_income += total
+            by_period[bucket] = by_period.get(bucket, 0) + total
+        else:
+            total_expenses += total
+            by_category[category] = by_category.get(category, 0) + total
+            by_period[bucket] = by_period.get(bucket, 0) - total
+
+    return total_income, total_expenses, by_category, by_period
+
+
+def rollup_query(user_id, start, end, granularity, *columns):
+    table = SummaryRollup.__table__
+    bucket = table.c.month if granularity == 'month' else db.func.substr(table.c.month, 1, 4)
+    groups = (bucket, resolved_category_name, table.c.transaction_type, table.c.currency, *columns)
+    query = (
+        join_categories(db.select(*groups, db.func.sum(table.c.total_minor)).select_from(table), table.c.category_id)
+        .where(table.c.user_id == user_id)
+        .group_by(*groups)
+    )
+    if start:
+        query = query.where(table.c.month >= start.strftime('%Y-%m'))
+    if end:
+        query = query.where(table.c.month <= end.strftime('%Y-%m'))
+    return query
+
+
+def rollup_rows(user_id, start, end, granularity):
+    return db.session.execute(rollup_query(user_id, start, end, granularity)).all()
+
+
+def converted_rollup_rows(user_id, start, end, granularity, target):
+    # Rollups keep one total per month and currency, so month and year summaries convert each
+    # month at the rate of its last day (the latest earlier rate for the current month) instead
+    # of going back to the table for daily totals. They can differ from a day or week summary
+    # of the same range by the rate movement within each month.
+    table = SummaryRollup.__table__
+    query = rollup_query(user_id, start, end, granularity, table.c.month).where(table.c.currency != target)
+    return rates.convert_rows(
+        ((bucket, category, transaction_type, currency, month_end(month), total)
+         for bucket, category, transaction_type, currency, month, total in db.session.execute(query)),
+        target,
+    )
+
+
+def transaction_rows(user_id, start, end, granularity):
+    # Served by the (user_id, date) index, grouped down to one row per bucket/category/type
+    bucket = bucket_expression(Transaction.date, granularity)
+    currency = currency_column()
+    query = (
+        join_categories(
+            db.select(bucket, resolved_category_name, Transaction.transaction_type, currency, db.func.sum(signed_amount()))
+            .select_from(Transaction),
+            Transaction.category_id,
+        )
+        .where(Transaction.user_id == user_id, *date_range_conditions(start, end))
+        .group_by(bucket, resolved_category_name, Transaction.transaction_type, currency)
+    )
+    return db.session.execute(query).all()
+
+
+def converted_rows(user_id, start, end, granularity, target):
+    # Amounts in other currencies are summed per day in SQL and each day's total is converted at
+    # that day's rate, so the conversion costs one multiplication per (currency, day) group
+    bucket = bucket_expression(Transaction.date, granularity)
+    day = bucket_expression(Transaction.date, 'day')
+    currency = currency_column()
+    query = (
+        join_categories(
+            db.select(bucket, resolved_category_name, Transaction.transaction_type, currency, day, db.func.sum(signed_amount()))
+            .select_from(Transaction),
+            Transaction.category_id,
+        )
+        .where(Transaction.user_id == user_id, currency != target, *date_range_conditions(start, end))
+        .group_by(bucket, resolved_category_name, Transaction.transaction_type, currency, day)
+    )
+    return rates.convert_rows(db.session.execute(query), target)
+
+
+def reporting_currency(currencies):
+    # REPORTING_CURRENCY when it is configured. Otherwise the one currency all of the summary's
+    # rows are in, so someone with only PLN statements gets PLN totals without needing any
+    # rates, and DEFAULT_CURRENCY for mixed (or no) rows.
+    configured = current_app.config['REPORTING_CURRENCY']
+    if configured:
+        return configured
+    return next(iter(currencies)) if len(currencies) == 1 else default_currency()
+
+
+def unconverted_totals(rows):
+    # Rows that had no rate, summed per currency in that currency
+    totals = {}
+    for _, _, transaction_type, currency, total in rows:
+        entry = totals.setdefault(currency, {'total_income': 0, 'total_expenses': 0})
+        entry['total_income' if transaction_type == 'income' else 'total_expenses'] += total
+    return {
+        currency: {name: from_minor(total, currency) for name, total in entry.items()}
+        for currency, entry in totals.items()
+    }
+
+
+def build_summary(user_id, start=None, end=None, granularity='month', currency=None):
+    aggregated = granularity in ('month', 'year') and covers_whole_months(start, end)
+    if aggregated:
+        rows = rollup_rows(user_id, start, end, granularity)
+    else:
+        rows = transaction_rows(user_id, start, end, granularity)
+    archives = archive.user_archives(user_id, start, end)
+    currency = currency or reporting_currency({row[3] for row in rows} | archive.currencies(archives))
+    unconverted = []
+    if any(row[3] != currency for row in rows):
+        converted, unconverted = (converted_rollup_rows if aggregated else converted_rows)(user_id, start, end, granularity, currency)
+        rows = [row for row in rows if row[3] == currency] + converted
+    # Archived years are not in the table or its rollups; their rows come already converted
+    archived, archived_unconverted = archive.summary_rows(user_id, archives, start, end, granularity, currency, aggregated)
+    rows = rows + archived
+    unconverted = unconverted + archived_unconverted
+
+    total_income, total_expenses, by_category, by_period = summarize(rows)
+    by_period = {bucket: from_minor(total, currency) for bucket, total in by_period.items()}
+    summary = {
+        'total_income': from_minor(total_income, currency),
+        'total_expenses': from_minor(total_expenses, currency),
+        'balance': from_minor(total_income - total_expenses, currency),
+        'currency': currency,
+        'by_category': {category: from_minor(total, currency) for category, total in by_category.items()},
+        'granularity': granularity,
+        'by_period': by_period,
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+    }
+    if granularity == 'month':
+        summary['monthly_summary'] = by_period
+    if unconverted:
+        # Left out of the totals above rather than failing the whole summary
+        summary['unconverted'] = unconverted_totals(unconverted)
+    return summary
@@ -0,0 +1,196 @@
+import math
+from datetime import datetime
+from app import archive, db, rollups
+from app.identity import user_category
+from app.ingest import Fingerprinter, ingest_rows
+from app.models import Transaction
+from app.money import CurrencyError, default_currency, parse_currency, to_minor
+
+CHUNK_SIZE = 500
+TRANSACTION_TYPES = ('income', 'expense')
+# Pending operations are applied grouped by kind, in this order
+APPLY_ORDER = ('create', 'update', 'delete')
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_date(value):
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except (TypeError, ValueError):
+            continue
+    raise BatchError('Invalid date, expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS')
+
+
+def validate_fields(item, find_category, required):
+    missing = [field for field in required if field not in item]
+    if missing:
+        raise BatchError(f"Missing required field: {', '.join(missing)}")
+
+    fields = {}
+    if 'amount' in item:
+        try:
+            fields['amount'] = float(item['amount'])
+        except (TypeError, ValueError):
+            raise BatchError('Invalid amount format')
+        if not math.isfinite(fields['amount']):
+            raise BatchError('Invalid amount format')
+    if 'currency' in item:
+        try:
+            fields['currency'] = parse_currency(item['currency'])
+        except CurrencyError as e:
+            raise BatchError(str(e))
+    if 'category_id' in item:
+        try:
+            category = find_category(int(item['category_id']))
+        except (TypeError, ValueError):
+            category = None
+        if category is None:
+            raise BatchError('Invalid category')
+        fields['category_id'] = category.id
+    if 'transaction_type' in item:
+        if item['transaction_type'] not in TRANSACTION_TYPES:
+            raise BatchError(f"Invalid transaction_type, expected one of: {', '.join(TRANSACTION_TYPES)}")
+        fields['transaction_type'] = item['transaction_type']
+    if 'description' in item:
+        if not isinstance(item['description'] or '', str):
+            raise BatchError('Invalid description')
+        fields['description'] = item['description'] or ''
+    if item.get('date'):
+        fields['date'] = parse_date(item['date'])
+    return fields
+
+
+def validate_operation(item, find_category):
+    if not isinstance(item, dict):
+        raise BatchError('Operation must be an object')
+    op = item.get('op')
+    if op == 'create':
+        fields = validate_fields(item, find_category, ('amount', 'category_id', 'transaction_type'))
+        fields.setdefault('description', '')
+        fields.setdefault('date', datetime.utcnow())
+        return op, None, fields
+    if op in ('update', 'delete'):
+        # bool is an int subclass, but true is not id 1
+        if not isinstance(item.get('id'), int) or isinstance(item['id'], bool):
+            raise BatchError('Missing or invalid id')
+        fields = validate_fields(item, find_category, ()) if op == 'update' else {}
+        return op, item['id'], fields
+    raise BatchError('Invalid op, expected create, update or delete')
+
+
+def apply_creates(user_id, creates, fingerprinter, results):
+    rows = [fields for _, fields in creates]
+    fingerprinter.assign(rows)
+    inserted, _ = ingest_rows(user_id, rows, 'manual', fingerprinter)
+    inserted = {row['fingerprint'] for row in inserted}
+    ids = dict(db.session.execute(
+        db.select(Transaction.fingerprint, Transaction.id)
+        .where(Transaction.fingerprint.in_([row['fingerprint'] for row in rows]))
+    ).all())
+    for (index, _), row in zip(creates, rows):
+        status = 'created' if row['fingerprint'] in inserted else 'duplicate'
+        results[index] = {'index': index, 'op': 'create', 'status': status, 'id': ids.get(row['fingerprint'])}
+
+
+def apply_updates(user_id, updates, results):
+    transactions = {t.id: t for t in Transaction.query.filter(
+        Transaction.user_id == user_id, Transaction.id.in_([id for _, id, _ in updates])
+    )}
+    # Several updates of one id are merged in order, so each transaction leaves and re-enters
+    # the rollups exactly once
+    changed = {}
+    missing = {id for _, id, _ in updates if id not in transactions}
+    archived = set().union(*archive.archived_ids(user_id, missing).values()) if missing else set()
+    for index, id, fields in updates:
+        transaction = transactions.get(id)
+        if transaction is None:
+            error = 'Transaction is archived, restore its year to edit it' if id in archived else 'Transaction not found'
+            results[index] = {'index': index, 'op': 'update', 'status': 'error', 'id': id, 'error': error}
+            continue
+        changed.setdefault(id, (transaction, {}))[1].update(fields)
+        results[index] = {'index': index, 'op': 'update', 'status': 'updated', 'id': id}
+    changed = list(changed.values())
+
+    # The fingerprint is left alone: it identifies the imported row, so re-importing the statement
+    # will not bring back the original values of an edited transaction.
+    rollups.record_deleted([transaction for transaction, _ in changed])
+    currency = default_currency()
+    for transaction, fields in changed:
+        for field, value in fields.items():
+            setattr(transaction, field, value)
+        transaction.currency = transaction.currency or currency
+        transaction.amount_minor = to_minor(transaction.amount, transaction.currency)
+    db.session.flush()
+    rollups.record_added([transaction for transaction, _ in changed])
+
+
+def apply_deletes(user_id, deletes, results):
+    transactions = {t.id: t for t in Transaction.query.filter(
+        Transaction.user_id == user_id, Transaction.id.in_([id for _, id in deletes])
+    )}
+    missing = {id for _, id in deletes if id not in transactions}
+    archived = archive.delete_rows(user_id, missing) if missing else set()
+    found = []
+    for index, id in deletes:
+        if id in archived:
+            results[index] = {'index': index, 'op': 'delete', 'status': 'deleted', 'id': id}
+        elif id in transactions:
+            found.append(id)
+            results[index] = {'index': index, 'op': 'delete', 'status': 'deleted', 'id': id}
+        else:
+            results[index] = {'index': index, 'op': 'delete', 'status': 'error', 'id': id, 'error': 'Transaction not found'}
+
+    rows = [transactions[id] for id in set(found)]
+    rollups.record_deleted(rows)
+    for transaction in rows:
+        db.session.expunge(transaction)
+    db.session.execute(Transaction.__table__.delete().where(Transaction.__table__.c.id.in_(set(found))))
+
+
+def apply_batch(user_id, operations, chunk_size=CHUNK_SIZE):
+    # Validates everything against the user's cached categories, then applies the valid
+    # operations chunk by chunk in the caller's transaction. Invalid items are reported and skipped.
+    def find_category(category_id):
+        return user_category(user_id, category_id)
+
+    fingerprinter = Fingerprinter(user_id, 'manual')
+    results = [None] * len(operations)
+
+    pending = {op: [] for op in APPLY_ORDER}
+
+    def flush():
+        if pending['create']:
+            apply_creates(user_id, pending['create'], fingerprinter, results)
+        if pending['update']:
+            apply_updates(user_id, pending['update'], results)
+        if pending['delete']:
+            apply_deletes(user_id, pending['delete'], results)
+        for group in pending.values():
+            group.clear()
+
+    for start in range(0, len(operations), chunk_size):
+        for index in range(start, min(start + chunk_size, len(operations))):
+            try:
+                op, id, fields = validate_operation(operations[index], find_category)
+            except BatchError as e:
+                item = operations[index] if isinstance(operations[index], dict) else {}
+                results[index] = {'index': index, 'op': item.get('op'), 'status': 'error', 'error': str(e)}
+                continue
+            # An operation must not run before one that came earlier in the request (an update
+            # after a delete of the same row, a create after a delete of an identical one), so
+            # the pending groups that would run after it are applied first
+            if any(pending[later] for later in APPLY_ORDER[APPLY_ORDER.index(op) + 1:]):
+                flush()
+            if op == 'create':
+                pending[op].append((index, fields))
+            elif op == 'update':
+                pending[op].append((index, id, fields))
+            else:
+                pending[op].append((index, id))
+        flush()
+
+    return results
@@ -0,0 +1,165 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+import multiprocessing
+import os
+import time
+from app.ingest import Fingerprinter, ingest_rows
+from app.metrics import metrics
+from app.transactions.parsers import detect_format, get_parser
+
+_parse_pool = None
+
+
+def iter_pages(filepath):
+    # pdfplumber (with pdfminer and Pillow) takes longer to import than the rest of the app and
+    # only statement imports need it
+    import pdfplumber
+
+    with pdfplumber.open(filepath) as pdf:
+        for page in pdf.pages:
+            with metrics.timer('pdf_page_extract'):
+                page_text = page.extract_text()
+            # Drop the parsed layout objects so only the current page is held in memory
+            page.flush_cache()
+            if page_text:
+                yield page_text
+
+
+def iter_lines(texts):
+    for text in texts:
+        for line in text.split('\n'):
+            line = line.strip()
+            if line:
+                yield line
+
+
+def iter_statement_rows(pages, format=None):
+    # The bank format is picked from the first page unless it is given explicitly
+    pages = iter(pages)
+    first_page = next(pages, None)
+    if first_page is None:
+        return
+    parser = get_parser(format or detect_format(first_page))
+    yield from parser.parse(iter_lines(chain([first_page], pages)))
+
+
+def extract_transactions_from_text(text, format=None):
+    return list(iter_statement_rows([text], format))
+
+
+def iter_batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_statement(user_id, filepath, source='pdf', batch_size=500, on_batch=None):
+    # pages -> lines -> candidates -> batched inserts. Each batch goes through the bulk ingest
+    # (duplicates of already imported rows are skipped) and is handed to on_batch, which commits it
+    # before the next pages are parsed.
+    extracted = 0
+    inserted = 0
+    fingerprinter = Fingerprinter(user_id, source)
+    rows = iter_statement_rows(iter_pages(filepath))
+
+    batches = iter_batches(rows, batch_size)
+    while True:
+        # Producing a batch extracts and parses as many pages as it takes to fill it
+        started = time.perf_counter()
+        batch = next(batches, None)
+        if batch is None:
+            break
+        metrics.observe_stage('statement_parse_batch', time.perf_counter() - started)
+        added, _ = ingest_rows(user_id, batch, source, fingerprinter, categorize=True)
+        extracted += len(batch)
+        inserted += len(added)
+        if on_batch:
+            on_batch(extracted, inserted)
+
+    return extracted, inserted
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def pool_context():
+    # The pool is created inside a threaded server worker, and a forked child could inherit a lock
+    # some other thread was holding. Its processes come from a forkserver (or are spawned where
+    # there is none) that has only the parsing code loaded.
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def get_parse_pool(max_workers=None):
+    # max_workers is this process's share: server.main divides IMPORT_PROCESSES between workers
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=max_workers or available_cpus(), mp_context=pool_context())
+    return _parse_pool
+
+
+def parse_statement_file(filepath):
+    # Runs in a pool process: no database access, only text extraction and parsing
+    pages = 0
+
+    def counted(texts):
+        nonlocal pages
+        for text in texts:
+            pages += 1
+            yield text
+
+    # Metrics recorded in the pool process are lost, so the parse time travels back with the result
+    started = time.perf_counter()
+    try:
+        rows = list(iter_statement_rows(counted(iter_pages(filepath))))
+        return {'rows': rows, 'pages': pages, 'error': None, 'seconds': time.perf_counter() - started}
+    except Exception as e:
+        return {'rows': [], 'pages': pages, 'error': str(e), 'seconds': time.perf_counter() - started}
+
+
+def import_statement_files(user_id, files, source='pdf', batch_size=500, max_workers=None):
+    # files: (filename, filepath) pairs. Every file is parsed in its own process, so the batch takes
+    # about as long as its largest statement; the rows are then merged by date and inserted.
+    pool = get_parse_pool(max_workers)
+    results = pool.map(parse_statement_file, [filepath for _, filepath in files])
+
+    report = []
+    rows = []
+    for index, ((filename, _), result) in enumerate(zip(files, results)):
+        metrics.observe_stage('statement_file_parse', result['seconds'])
+        report.append({
+            'filename': filename,
+            'status': 'failed' if result['error'] else 'done',
+            'pages': result['pages'],
+            'rows': len(result['rows']),
+            'rows_inserted': 0,
+            'rows_skipped': 0,
+            'error': result['error'],
+        })
+        # Occurrences are numbered per statement, so overlapping statements deduplicate each other
+        Fingerprinter(user_id, source).assign(result['rows'])
+        for row in result['rows']:
+            row['file_index'] = index
+        rows.extend(result['rows'])
+
+    # The sort is stable, so rows keep their statement order within a day
+    rows.sort(key=lambda row: row['date'])
+    inserted_fingerprints = set()
+    for batch in iter_batches(rows, batch_size):
+        added, _ = ingest_rows(user_id, batch, source, categorize=True)
+        inserted_fingerprints.update(row['fingerprint'] for row in added)
+
+    for row in rows:
+        counter = 'rows_inserted' if row['fingerprint'] in inserted_fingerprints else 'rows_skipped'
+        report[row['file_index']][counter] += 1
+
+    return report, len(inserted_fingerprints)
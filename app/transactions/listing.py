@@ -0,0 +1,109 @@
+import base64
+import heapq
+import json
+from datetime import datetime
+from app import archive, db
+from app.categories import category_filter
+from app.models import Transaction
+from app.transactions.readmodel import row_to_dict, select_transactions
+from app.summary import date_range_conditions, parse_date
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class ListingError(ValueError):
+    pass
+
+
+def encode_cursor(transaction):
+    payload = json.dumps([transaction.date.strftime('%Y-%m-%dT%H:%M:%S.%f'), transaction.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.strptime(date, '%Y-%m-%dT%H:%M:%S.%f'), int(id)
+    except (ValueError, TypeError):
+        raise ListingError('Invalid cursor')
+
+
+def parse_amount(value, field):
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ListingError(f'Invalid {field}')
+
+
+def parse_list_args(args):
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ListingError('Invalid limit')
+    if limit < 1:
+        raise ListingError('limit must be positive')
+
+    category_id = args.get('category_id')
+    if category_id:
+        try:
+            category_id = int(category_id)
+        except ValueError:
+            raise ListingError('Invalid category_id')
+
+    return {
+        'limit': min(limit, MAX_PAGE_SIZE),
+        'cursor': decode_cursor(args['cursor']) if args.get('cursor') else None,
+        'transaction_type': args.get('type') or None,
+        'category_id': category_id or None,
+        'source': args.get('source') or None,
+        'min_amount': parse_amount(args.get('min_amount'), 'min_amount'),
+        'max_amount': parse_amount(args.get('max_amount'), 'max_amount'),
+        'start': parse_date(args.get('from'), 'from'),
+        'end': parse_date(args.get('to'), 'to'),
+    }
+
+
+def filter_conditions(user_id, transaction_type=None, category_id=None, source=None, min_amount=None,
+                      max_amount=None, start=None, end=None):
+    conditions = date_range_conditions(start, end)
+    if transaction_type:
+        conditions.append(Transaction.transaction_type == transaction_type)
+    if category_id:
+        conditions.append(category_filter(user_id, category_id))
+    if source:
+        conditions.append(Transaction.source == source)
+    if min_amount is not None:
+        conditions.append(Transaction.amount >= min_amount)
+    if max_amount is not None:
+        conditions.append(Transaction.amount <= max_amount)
+    return conditions
+
+
+def list_transactions(user_id, limit=DEFAULT_PAGE_SIZE, cursor=None, **filters):
+    # Equality filters lead the (user_id, <filter>, date, id) indexes so every page is a range scan
+    # that starts right after the cursor, no matter how deep into the history it is.
+    conditions = filter_conditions(user_id, **filters)
+    if cursor:
+        conditions.append(db.tuple_(Transaction.date, Transaction.id) < cursor)
+
+    query = select_transactions(user_id, *conditions)
+    rows = db.session.execute(
+        query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit + 1)
+    ).all()
+
+    # Archived years continue the same (date, id) order; they are only read once the page
+    # reaches back to them
+    archives = archive.user_archives(user_id, filters.get('start'), filters.get('end'))
+    if archives and (len(rows) <= limit or rows[-1].date.year <= max(archives)):
+        archived = archive.listing_rows(user_id, archive.find_rows(user_id, archives, cursor, **filters), limit + 1)
+        rows = list(heapq.merge(rows, archived, key=lambda row: (row.date, row.id), reverse=True))[:limit + 1]
+    page = rows[:limit]
+    return {
+        'transactions': [row_to_dict(row) for row in page],
+        'limit': limit,
+        'next_cursor': encode_cursor(page[-1]) if len(rows) > limit else None,
+    }
@@ -0,0 +1,16 @@
+from app.transactions.parsers.base import (
+    StatementParser, detect_format, get_parser, register_format, registered_formats,
+)
+from app.transactions.parsers.keywords import KeywordMatcher
+
+# Importing the built-in formats registers them
+from app.transactions.parsers import dmy_pln_eur  # noqa: E402,F401
+
+__all__ = [
+    'KeywordMatcher',
+    'StatementParser',
+    'detect_format',
+    'get_parser',
+    'register_format',
+    'registered_formats',
+]
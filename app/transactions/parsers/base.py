@@ -0,0 +1,40 @@
+DEFAULT_FORMAT = 'dmy_pln_eur'
+
+_formats = {}
+
+
+class StatementParser:
+    # Subclasses parse the stripped, non-empty lines of one statement in a single forward pass
+    # and yield row dicts with date (datetime), amount, currency, description, transaction_type
+    # and category.
+    name = None
+
+    @classmethod
+    def detect(cls, first_page):
+        return False
+
+    def parse(self, lines):
+        raise NotImplementedError
+
+
+def register_format(parser_cls):
+    _formats[parser_cls.name] = parser_cls
+    return parser_cls
+
+
+def registered_formats():
+    return list(_formats)
+
+
+def get_parser(name=None):
+    try:
+        return _formats[name or DEFAULT_FORMAT]()
+    except KeyError:
+        raise ValueError(f'Unknown statement format: {name}')
+
+
+def detect_format(first_page):
+    for name, parser_cls in _formats.items():
+        if parser_cls.detect(first_page):
+            return name
+    return DEFAULT_FORMAT
@@ -0,0 +1,101 @@
+from collections import deque
+from datetime import datetime
+import re
+from app.transactions.parsers.base import StatementParser, register_format
+from app.transactions.parsers.keywords import KeywordMatcher
+
+DATE_RE = re.compile(r'(\d{2})\.(\d{2})\.(\d{4})')
+AMOUNT_RE = re.compile(r'([-+]?[0-9\s,.]+)\s*(PLN|EUR)')
+
+CATEGORY_KEYWORDS = KeywordMatcher([
+    ('restauracje', 'Food & Dining'),
+    ('kawiarnia', 'Food & Dining'),
+    ('internet', 'Utilities'),
+    ('telefon', 'Utilities'),
+    ('hobby', 'Entertainment'),
+])
+
+# Context a candidate line needs: the merchant is searched up to 4 lines back,
+# category keywords are looked up from 3 lines back to 2 lines ahead.
+LOOKBACK = 4
+KEYWORD_LOOKBACK = 3
+LOOKAHEAD = 2
+
+
+@register_format
+class DmyPlnEurParser(StatementParser):
+    # Polish bank layout: dd.mm.yyyy dates on their own lines, the merchant in double quotes
+    # and amounts like "-1 234,56 PLN" or "12,00 EUR".
+    name = 'dmy_pln_eur'
+
+    @classmethod
+    def detect(cls, first_page):
+        return bool(DATE_RE.search(first_page) and AMOUNT_RE.search(first_page))
+
+    def parse(self, lines):
+        # One forward pass. Cheap substring checks gate the regexes, so most lines cost a few
+        # `in` tests. A candidate (amount line) takes its date and merchant from what has been
+        # seen so far and waits for LOOKAHEAD more lines before its category is matched.
+        merchants = deque(maxlen=LOOKBACK)
+        context = deque(maxlen=KEYWORD_LOOKBACK)
+        pending = deque()
+        last_date = None
+
+        for line in lines:
+            for waiting in pending:
+                waiting[1].append(line)
+            while pending and len(pending[0][1]) == pending[0][2]:
+                yield self.finish(*pending.popleft()[:2])
+
+            if '.' in line:
+                date_match = DATE_RE.search(line)
+                if date_match:
+                    day, month, year = date_match.groups()
+                    try:
+                        last_date = datetime(int(year), int(month), int(day))
+                    except ValueError:
+                        pass
+
+            if last_date and ('PLN' in line or 'EUR' in line):
+                row = self.parse_amount(line, last_date, merchants)
+                if row:
+                    # After using this date, clear it
+                    last_date = None
+                    window = list(context)
+                    window.append(line)
+                    pending.append((row, window, len(window) + LOOKAHEAD))
+
+            merchants.appendleft(line.strip('"') if line.startswith('"') and line.endswith('"') else None)
+            context.append(line)
+
+        while pending:
+            yield self.finish(*pending.popleft()[:2])
+
+    def parse_amount(self, line, date, merchants):
+        amount_match = AMOUNT_RE.search(line)
+        if not amount_match:
+            return None
+        try:
+            amount = float(amount_match.group(1).replace(' ', '').replace(',', '.'))
+        except ValueError:
+            # Skip if cannot cleanly convert amount
+            return None
+
+        description = 'Unknown'
+        for merchant in merchants:
+            if merchant is not None:
+                description = merchant
+                break
+
+        return {
+            'date': date,
+            'amount': abs(amount),
+            'currency': amount_match.group(2),
+            'description': description,
+            'transaction_type': 'income' if amount > 0 else 'expense',
+            'category': 'Other',
+        }
+
+    def finish(self, row, window):
+        row['category'] = CATEGORY_KEYWORDS.label(CATEGORY_KEYWORDS.mask(' '.join(window)), 'Other')
+        return row
@@ -0,0 +1,33 @@
+import re
+
+
+class KeywordMatcher:
+    # Matches many keywords against a line in one scan. The keywords are compiled into a single
+    # alternation that the C regex engine runs over the line once, which is what the repeated
+    # `in` checks did per keyword. Each keyword maps to a label; labels are reported as a bitmask
+    # so windows of lines can be combined with a plain OR.
+
+    def __init__(self, keywords):
+        # keywords: (keyword, label) pairs, label order is the priority order
+        self.labels = []
+        self.bits = {}
+        for keyword, label in keywords:
+            if label not in self.labels:
+                self.labels.append(label)
+            self.bits[keyword.lower()] = 1 << self.labels.index(label)
+        alternation = '|'.join(re.escape(keyword) for keyword in sorted(self.bits, key=len, reverse=True))
+        self.pattern = re.compile(alternation) if alternation else None
+
+    def mask(self, text):
+        if self.pattern is None:
+            return 0
+        mask = 0
+        for match in self.pattern.finditer(text.lower()):
+            mask |= self.bits[match.group()]
+        return mask
+
+    def label(self, mask, default=None):
+        if not mask:
+            return default
+        # Lowest set bit is the highest priority label
+        return self.labels[(mask & -mask).bit_length() - 1]
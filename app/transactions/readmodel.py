@@ -0,0 +1,58 @@
+from app import db
+from app.categories import join_categories, resolved_category_id, resolved_category_name
+from app.models import Transaction
+
+# Read endpoints select these columns with Core and build the response dicts straight from the
+# row tuples: no Transaction instances, no identity map, no per-row attribute instrumentation.
+# The category comes from a join (following deleted categories to their replacement), so there is
+# no lazy load per category either.
+FIELDS = ('id', 'amount', 'currency', 'category', 'category_id', 'transaction_type', 'description', 'date', 'source')
+CHUNK_ROWS = 1000
+
+
+def columns():
+    return (
+        Transaction.id,
+        Transaction.amount,
+        Transaction.currency,
+        resolved_category_name.label('category'),
+        resolved_category_id.label('category_id'),
+        Transaction.transaction_type,
+        Transaction.description,
+        Transaction.date,
+        Transaction.source,
+    )
+
+
+def select_transactions(user_id, *conditions):
+    return (
+        join_categories(db.select(*columns()).select_from(Transaction), Transaction.category_id)
+        .where(Transaction.user_id == user_id, *conditions)
+    )
+
+
+def row_to_dict(row):
+    # Same shape as Transaction.to_dict()
+    id, amount, currency, category, category_id, transaction_type, description, date, source = row
+    return {
+        'id': id,
+        'amount': amount,
+        'currency': currency,
+        'category': category,
+        'category_id': category_id,
+        'transaction_type': transaction_type,
+        'description': description or '',
+        'date': date.isoformat(sep=' ', timespec='seconds') if date else None,
+        'source': source,
+    }
+
+
+def iter_dicts(query):
+    # Streams from the cursor in CHUNK_ROWS batches
+    for row in db.session.execute(query.execution_options(yield_per=CHUNK_ROWS)):
+        yield row_to_dict(row)
+
+
+def transaction_dicts(user_id, *conditions):
+    query = select_transactions(user_id, *conditions).order_by(Transaction.date.desc(), Transaction.id.desc())
+    return list(iter_dicts(query))
@@ -1,92 +1,82 @@
 import os
-import re
-from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
+import shutil
+import tempfile
+import uuid
+import zipfile
+from datetime import datetime
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from app import db
+from app import archive, db, rollups
+from app.cache import versioned_response
+from app.database import replica_reads
 from app.transactions import bp
-from app.models import Transaction
-import pdfplumber
-import pandas as pd
-from datetime import datetime
+from app.ingest import IngestError, ingest_one
+from app.jobs import import_queue
+from app.models import ImportJob, Transaction
+from app.money import CurrencyError, parse_currency
+from app.summary import SummaryError, build_summary, date_range_conditions, parse_date, parse_summary_args
+from app.transactions.batch import apply_batch
+from app.transactions.importer import import_statement_files
+from app.transactions.listing import MAX_PAGE_SIZE, list_transactions, parse_list_args
+from app.transactions.readmodel import transaction_dicts
+from app.transactions.search import SearchError, parse_search_args, search_transactions
+from app.transactions.streaming import FORMATS, export_stream, import_stream
 
 ALLOWED_EXTENSIONS = {'pdf'}
+BATCH_EXTENSIONS = {'pdf', 'zip'}
+COPY_BLOCK_SIZE = 1024 * 1024
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def allowed_file(filename, extensions=ALLOWED_EXTENSIONS):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in extensions
 
-import re
-from datetime import datetime
+def save_batch_files(files, folder, max_files, max_file_bytes, max_total_bytes):
+    # Stores uploaded PDFs and the PDFs inside uploaded ZIP archives, returns (filename, filepath) pairs.
+    # A ZIP member's declared size is checked up front, but the limits are also enforced while
+    # copying since the declared size can lie (zip bombs).
+    saved = []
+    written = 0
 
-def extract_transactions_from_text(text):
-    transactions = []
-    lines = [line.strip() for line in text.split('\n') if line.strip()]
-
-    date_pattern = r'\d{2}\.\d{2}\.\d{4}'
-    amount_pattern = r'([-+]?[0-9\s,.]+)\s*(PLN|EUR)'
-
-    current_transaction = {}
-    last_date = None
-
-    for idx, line in enumerate(lines):
-        # Debug print
-        print(f"Line {idx}: {line}")
-
-        # If line has a date
-        date_match = re.search(date_pattern, line)
-        if date_match:
-            last_date = date_match.group()
-
-        # If line has amount
-        amount_match = re.search(amount_pattern, line)
-        if amount_match and last_date:
-            amount_raw = amount_match.group(1)
-            currency = amount_match.group(2)
-            try:
-                amount_clean = float(amount_raw.replace(' ', '').replace(',', '.'))
-            except ValueError:
-                # Skip if cannot cleanly convert amount
-                continue
-
-            description = 'Unknown'
-            # Search backwards for the merchant (quote line)
-            for back_idx in range(idx-1, max(idx-5, -1), -1):
-                if lines[back_idx].startswith('"') and lines[back_idx].endswith('"'):
-                    description = lines[back_idx].strip('\"')
-                    break
-
-            transaction_type = 'income' if amount_clean > 0 else 'expense'
-
-            # Optional category detection
-            category = 'Other'
-            nearby_text = ' '.join(lines[max(0, idx-3):idx+3]).lower()
-            if 'restauracje' in nearby_text or 'kawiarnia' in nearby_text:
-                category = 'Food & Drink'
-            elif 'internet' in nearby_text or 'telefon' in nearby_text:
-                category = 'Utilities'
-            elif 'hobby' in nearby_text:
-                category = 'Hobby'
-
-            transactions.append({
-                'date': datetime.strptime(last_date, '%d.%m.%Y').strftime('%Y-%m-%d %H:%M:%S'),
-                'amount': abs(amount_clean),
-                'currency': currency,
-                'description': description,
-                'transaction_type': transaction_type,
-                'category': category,
-            })
-
-            # After using this date, clear it
-            last_date = None
-
-    return transactions
+    def check(filename, size):
+        if size > max_file_bytes:
+            raise ValueError(f'{filename} is too large, at most {max_file_bytes} bytes per statement')
+        if written + size > max_total_bytes:
+            raise ValueError(f'Batch is too large, at most {max_total_bytes} bytes of statements')
+
+    def store(filename, source, declared_size=0):
+        nonlocal written
+        if len(saved) >= max_files:
+            raise ValueError(f'Too many files, at most {max_files} statements per batch')
+        check(filename, declared_size)
+        saved.append((filename, os.path.join(folder, f'{len(saved)}-{os.path.basename(filename)}')))
+        size = 0
+        with open(saved[-1][1], 'wb') as destination:
+            while block := source.read(COPY_BLOCK_SIZE):
+                size += len(block)
+                check(filename, size)
+                destination.write(block)
+        written += size
+
+    for file in files:
+        filename = secure_filename(file.filename)
+        if not filename.lower().endswith('.zip'):
+            store(filename, file.stream)
+            continue
+        with zipfile.ZipFile(file.stream) as archive:
+            for info in archive.infolist():
+                member = secure_filename(os.path.basename(info.filename))
+                if info.is_dir() or not allowed_file(member):
+                    continue
+                with archive.open(info) as source:
+                    store(f'{filename}/{member}', source, info.file_size)
+    return saved
 
 @bp.route('/add_transaction', methods=['POST'])
 @login_required
 def add_transaction():
     try:
         data = request.get_json()
-        current_app.logger.debug(f'Received data: {data}')
+        current_app.logger.debug('Received data: %s', data)
         
         if not data:
             current_app.logger.error('No data provided')
@@ -95,44 +85,77 @@ def add_transaction():
         required_fields = ['amount', 'category', 'transaction_type']
         for field in required_fields:
             if field not in data:
-                current_app.logger.error(f'Missing required field: {field}')
+                current_app.logger.error('Missing required field: %s', field)
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
-        # Convert amount to float and validate
         try:
-            amount = float(data['amount'])
-            if amount <= 0:
-                return jsonify({'error': 'Amount must be greater than 0'}), 400
-        except ValueError:
-            return jsonify({'error': 'Invalid amount format'}), 400
-
-        transaction = Transaction(
-            amount=amount,
-            category=data['category'],
-            transaction_type=data['transaction_type'],
-            description=data.get('description', ''),
-            user_id=current_user.id
-        )
+            currency = parse_currency(data.get('currency'))
+        except CurrencyError as e:
+            return jsonify({'error': str(e)}), 400
+
+        row = {
+            'amount': data['amount'],
+            'currency': currency,
+            'category': data['category'],
+            'transaction_type': data['transaction_type'],
+            'description': data.get('description', ''),
+            'date': datetime.utcnow(),
+        }
         
-        current_app.logger.debug(f'Creating transaction: {transaction.to_dict()}')
+        current_app.logger.debug('Creating transaction: %s', row)
         
-        db.session.add(transaction)
+        try:
+            transaction = ingest_one(current_user.id, row)
+        except IngestError as e:
+            return jsonify({'error': str(e)}), 400
+        if transaction is None:
+            return jsonify({'error': 'Duplicate of an archived transaction'}), 409
         db.session.commit()
         
         current_app.logger.debug('Transaction created successfully')
         return jsonify(transaction.to_dict())
     except Exception as e:
-        current_app.logger.error(f'Error creating transaction: {str(e)}')
+        current_app.logger.exception('Error creating transaction: %s', e)
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/batch', methods=['POST'])
+@login_required
+def batch():
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Expected a non-empty list of operations'}), 400
+    max_operations = current_app.config['BATCH_MAX_OPERATIONS']
+    if len(operations) > max_operations:
+        return jsonify({'error': f'Too many operations, at most {max_operations} per batch'}), 400
+
+    try:
+        results = apply_batch(current_user.id, operations, current_app.config['BATCH_CHUNK_SIZE'])
+        db.session.commit()
+    except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error applying batch: %s', e)
         return jsonify({'error': str(e)}), 500
 
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return jsonify({'results': results, 'counts': counts})
+
 @bp.route('/delete_transaction/<int:id>', methods=['DELETE'])
 @login_required
 def delete_transaction(id):
     try:
-        transaction = Transaction.query.get_or_404(id)
+        transaction = db.session.get(Transaction, id)
+        if transaction is None:
+            if archive.delete_rows(current_user.id, [id]):
+                db.session.commit()
+                return jsonify({'message': 'Transaction deleted'})
+            return jsonify({'error': 'Transaction not found'}), 404
         if transaction.user_id != current_user.id:
             return jsonify({'error': 'Unauthorized'}), 403
+        rollups.record_deleted([transaction])
         db.session.delete(transaction)
         db.session.commit()
         return jsonify({'message': 'Transaction deleted'})
@@ -149,92 +172,196 @@ def upload_pdf():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     if file and allowed_file(file.filename):
-        try:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-
-            # current_app.logger.info(f"Processing PDF file: {filename}")
-
-            # Collect all text at once
-            full_text = ""
-            with pdfplumber.open(filepath) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    # current_app.logger.info(f"Processing page {i+1}")
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + "\n"
-
-            # Process full text ONCE
-            print("----- FULL EXTRACTED TEXT START -----")
-            print(full_text)
-            print("----- FULL EXTRACTED TEXT END -----")
-
-            extracted_transactions = extract_transactions_from_text(full_text)
-
-            current_app.logger.info(f"Extracted {len(extracted_transactions)} transactions")
-
-            # Save extracted transactions to database
-            saved_transactions = []
-            for transaction_data in extracted_transactions:
-                try:
-                    transaction = Transaction(
-                        amount=transaction_data['amount'],
-                        category=transaction_data['category'],
-                        transaction_type=transaction_data['transaction_type'],
-                        description=transaction_data['description'],
-                        date=datetime.strptime(transaction_data['date'], '%Y-%m-%d %H:%M:%S'),
-                        user_id=current_user.id,
-                        source='pdf'
-                    )
-                    db.session.add(transaction)
-                    saved_transactions.append(transaction.to_dict())
-                except Exception as e:
-                    current_app.logger.error(f"Error saving transaction: {str(e)}")
-                    continue
+        # Parsing happens in the import queue, the request only stores the file and the job
+        filename = secure_filename(file.filename)
+        os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}-{filename}')
+        file.save(filepath)
 
-            db.session.commit()
+        job = ImportJob(user_id=current_user.id, filename=filename, filepath=filepath)
+        db.session.add(job)
+        db.session.commit()
+        import_queue.submit(job.id)
 
-            if os.path.exists(filepath):
-                os.remove(filepath)
+        return jsonify(job.to_dict()), 202
+    return jsonify({'error': 'Invalid file type'}), 400
 
-            return jsonify({
-                'message': f'Successfully extracted {len(saved_transactions)} transactions',
-                'transactions': saved_transactions
-            })
+@bp.route('/upload_batch', methods=['POST'])
+@login_required
+def upload_batch():
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'error': 'No selected files'}), 400
+    invalid = [file.filename for file in files if not allowed_file(file.filename, BATCH_EXTENSIONS)]
+    if invalid:
+        return jsonify({'error': f"Invalid file type: {', '.join(invalid)}"}), 400
 
-        except Exception as e:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            current_app.logger.error(f'Error processing PDF: {str(e)}')
-            return jsonify({'error': str(e)}), 500
-    return jsonify({'error': 'Invalid file type'}), 400
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    folder = tempfile.mkdtemp(prefix='batch-', dir=current_app.config['UPLOAD_FOLDER'])
+    try:
+        saved = save_batch_files(
+            files,
+            folder,
+            current_app.config['IMPORT_BATCH_MAX_FILES'],
+            current_app.config['IMPORT_BATCH_MAX_FILE_BYTES'],
+            current_app.config['IMPORT_BATCH_MAX_BYTES'],
+        )
+        if not saved:
+            return jsonify({'error': 'No PDF statements found'}), 400
+
+        report, inserted = import_statement_files(
+            current_user.id,
+            saved,
+            batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+            max_workers=current_app.config['IMPORT_PROCESSES'],
+        )
+        db.session.commit()
+        return jsonify({
+            'message': f'Successfully extracted {inserted} transactions from {len(saved)} files',
+            'rows_inserted': inserted,
+            'files': report,
+        })
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Error processing statement batch: %s', e)
+        return jsonify({'error': str(e)}), 500
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+@bp.route('/import_jobs/<int:job_id>')
+@login_required
+def get_import_job(job_id):
+    job = ImportJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/import_jobs')
+@login_required
+def list_import_jobs():
+    jobs = ImportJob.query.filter_by(user_id=current_user.id).order_by(ImportJob.id.desc()).limit(20).all()
+    return jsonify([job.to_dict() for job in jobs])
 
 @bp.route('/get_summary')
 @login_required
+@replica_reads
+@versioned_response
 def get_summary():
     try:
-        transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.date.desc()).all()
-        transactions_list = [t.to_dict() for t in transactions]
-        df = pd.DataFrame(transactions_list)
-        
-        if df.empty:
-            return jsonify({
-                'total_income': 0,
-                'total_expenses': 0,
-                'by_category': {},
-                'monthly_summary': {},
-                'transactions': transactions_list
-            })
-        
-        summary = {
-            'total_income': float(df[df['transaction_type'] == 'income']['amount'].sum()),
-            'total_expenses': float(df[df['transaction_type'] == 'expense']['amount'].sum()),
-            'by_category': df.groupby('category')['amount'].sum().to_dict(),
-            'monthly_summary': df.groupby(pd.to_datetime(df['date']).dt.to_period('M').astype(str))['amount'].sum().to_dict(),
-            'transactions': transactions_list
-        }
-        
+        start, end, granularity, currency = parse_summary_args(request.args)
+    except SummaryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        summary = build_summary(current_user.id, start, end, granularity, currency)
+        summary['transactions'] = archive.with_archived_dicts(
+            transaction_dicts(current_user.id, *date_range_conditions(start, end)), current_user.id, start, end)
         return jsonify(summary)
+    except SummaryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/dashboard')
+@login_required
+@replica_reads
+@versioned_response
+def dashboard():
+    # Aggregates plus the newest rows only; the rest of the history is paged through /list
+    # starting from recent_cursor.
+    try:
+        start, end, granularity, currency = parse_summary_args(request.args)
+        recent = int(request.args.get('recent', current_app.config['DASHBOARD_RECENT_ROWS']))
+    except SummaryError as e:
+        return jsonify({'error': str(e)}), 400
+    except ValueError:
+        return jsonify({'error': 'Invalid recent'}), 400
+    if recent < 0:
+        return jsonify({'error': 'recent must not be negative'}), 400
+
+    try:
+        summary = build_summary(current_user.id, start, end, granularity, currency)
+    except SummaryError as e:
+        return jsonify({'error': str(e)}), 400
+    if recent:
+        page = list_transactions(current_user.id, limit=min(recent, MAX_PAGE_SIZE), start=start, end=end)
+        summary['recent_transactions'] = page['transactions']
+        summary['recent_cursor'] = page['next_cursor']
+    else:
+        summary['recent_transactions'] = []
+        summary['recent_cursor'] = None
+    return jsonify(summary)
+
+@bp.route('/list')
+@login_required
+@replica_reads
+@versioned_response
+def list_page():
+    try:
+        filters = parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(list_transactions(current_user.id, **filters))
+
+@bp.route('/search')
+@login_required
+@replica_reads
+@versioned_response
+def search():
+    # Ranked full-text matches on the description, combinable with the /list filters
+    try:
+        terms, offset, filters = parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(search_transactions(current_user.id, terms, offset, **filters))
+    except SearchError as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/export')
+@login_required
+@replica_reads
+def export_transactions():
+    format = request.args.get('format', 'csv')
+    if format not in FORMATS:
+        return jsonify({'error': f"Invalid format, expected one of: {', '.join(FORMATS)}"}), 400
+    try:
+        start = parse_date(request.args.get('from'), 'from')
+        end = parse_date(request.args.get('to'), 'to')
+    except SummaryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(export_stream(current_user.id, format, start, end)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=transactions.{format}'},
+    )
+
+@bp.route('/import', methods=['POST'])
+@login_required
+def import_transactions():
+    # Either a multipart upload in `file` or the raw request body
+    file = request.files.get('file')
+    format = request.args.get('format')
+    if not format and file and '.' in file.filename:
+        format = file.filename.rsplit('.', 1)[1].lower()
+    if format not in FORMATS:
+        return jsonify({'error': f"Invalid format, expected one of: {', '.join(FORMATS)}"}), 400
+
+    try:
+        report = import_stream(
+            current_user.id,
+            file.stream if file else request.stream,
+            format,
+            batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+            on_batch=lambda report: db.session.commit(),
+        )
+        db.session.commit()
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        db.session.rollback()
+        current_app.logger.exception('Error importing transactions: %s', e)
+        return jsonify({'error': str(e)}), 500
+    return jsonify(report)
@@ -0,0 +1,203 @@
+import re
+import unicodedata
+from sqlalchemy import DDL, event
+from app import archive, db
+from app.categories import join_categories
+from app.models import Transaction
+from app.money import from_minor
+from app.transactions.listing import DEFAULT_PAGE_SIZE, ListingError, filter_conditions, parse_list_args
+from app.transactions.readmodel import columns, row_to_dict
+
+# Full-text index over Transaction.description. SQLite keeps a contentless FTS5 table in step
+# through triggers; PostgreSQL gets a generated tsvector column with a GIN index. Either way every
+# write path (ORM, Core inserts, bulk deletes) is covered without application code.
+MAX_TERMS = 8
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_DDL = (
+    # The owner column ("u<user_id>") lets the match itself narrow down to one user instead of
+    # joining every user's hits. Positions are not stored (detail=column) and 2-4 character
+    # prefixes are indexed, which keeps the doclists read per query small. remove_diacritics folds
+    # "Żabka" and "zabka" together.
+    'CREATE VIRTUAL TABLE IF NOT EXISTS transaction_fts USING fts5('
+    "description, owner, content='', detail=column, prefix='2 3 4', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS transaction_fts_insert AFTER INSERT ON "transaction" BEGIN '
+    "INSERT INTO transaction_fts(rowid, description, owner) VALUES (new.id, new.description, 'u' || new.user_id); END",
+    # A contentless table is told exactly what to remove
+    'CREATE TRIGGER IF NOT EXISTS transaction_fts_delete AFTER DELETE ON "transaction" BEGIN '
+    "INSERT INTO transaction_fts(transaction_fts, rowid, description, owner) "
+    "VALUES ('delete', old.id, old.description, 'u' || old.user_id); END",
+    'CREATE TRIGGER IF NOT EXISTS transaction_fts_update AFTER UPDATE OF description, user_id ON "transaction" BEGIN '
+    "INSERT INTO transaction_fts(transaction_fts, rowid, description, owner) "
+    "VALUES ('delete', old.id, old.description, 'u' || old.user_id); "
+    "INSERT INTO transaction_fts(rowid, description, owner) VALUES (new.id, new.description, 'u' || new.user_id); END",
+)
+SQLITE_POPULATE = (
+    'INSERT INTO transaction_fts(rowid, description, owner) '
+    'SELECT id, description, \'u\' || user_id FROM "transaction"'
+)
+POSTGRESQL_DDL = (
+    'ALTER TABLE "transaction" ADD COLUMN IF NOT EXISTS description_tsv tsvector '
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(description, ''))) STORED",
+    'CREATE INDEX IF NOT EXISTS ix_transaction_description_tsv ON "transaction" USING gin (description_tsv)',
+)
+
+for statement in SQLITE_DDL:
+    event.listen(Transaction.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRESQL_DDL:
+    event.listen(Transaction.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+# The FTS table would otherwise outlive a drop_all() with stale rows
+event.listen(Transaction.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS transaction_fts').execute_if(dialect='sqlite'))
+
+fts = db.table('transaction_fts', db.column('rowid'), db.column('rank'), db.column('transaction_fts'))
+description_tsv = db.literal_column('"transaction".description_tsv')
+
+
+class SearchError(ValueError):
+    pass
+
+
+def create_search_index():
+    # For databases created before search existed; returns True when the index had to be built
+    dialect = db.engine.dialect.name
+    inspector = db.inspect(db.engine)
+    if dialect == 'sqlite':
+        if inspector.has_table('transaction_fts'):
+            return False
+        with db.engine.begin() as connection:
+            for statement in SQLITE_DDL:
+                connection.execute(db.text(statement))
+            connection.execute(db.text(SQLITE_POPULATE))
+        return True
+    if dialect == 'postgresql':
+        if 'description_tsv' in {column['name'] for column in inspector.get_columns('transaction')}:
+            return False
+        with db.engine.begin() as connection:
+            for statement in POSTGRESQL_DDL:
+                connection.execute(db.text(statement))
+        return True
+    return False
+
+
+def query_terms(text):
+    terms = TOKEN_RE.findall((text or '').lower())
+    if not terms:
+        raise SearchError('q is required')
+    return terms[:MAX_TERMS]
+
+
+def matches(user_id, terms, ranked=True):
+    # Subquery of (id, rank) for one user's transactions containing every term as a prefix ("bied"
+    # finds "Biedronka"); a lower rank is a better match. Ranking is the expensive part of a broad
+    # match, so the totals query leaves it out.
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        expression = f'owner:u{int(user_id)} AND description:(' + ' '.join(f'"{term}"*' for term in terms) + ')'
+        return (
+            db.select(fts.c.rowid.label('id'), *([fts.c.rank.label('rank')] if ranked else []))
+            .where(fts.c.transaction_fts.op('MATCH')(expression))
+            .subquery('matches')
+        )
+    if dialect == 'postgresql':
+        query = db.func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        return (
+            db.select(Transaction.id, *([(-db.func.ts_rank(description_tsv, query)).label('rank')] if ranked else []))
+            .where(Transaction.user_id == user_id, description_tsv.op('@@')(query))
+            .subquery('matches')
+        )
+    raise SearchError(f'Search is not supported on {dialect}')
+
+
+def fold(text):
+    # Lower case without diacritics, like the unicode61 tokenizer's remove_diacritics
+    return ''.join(c for c in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(c))
+
+
+def description_matcher(terms):
+    # matches() for archived descriptions: every term is the prefix of a word
+    terms = [fold(term) for term in terms]
+
+    def match(description):
+        words = TOKEN_RE.findall(fold(description))
+        return all(any(word.startswith(term) for word in words) for term in terms)
+    return match
+
+
+def parse_search_args(args):
+    filters = parse_list_args(args)
+    if filters.pop('cursor'):
+        raise ListingError('cursor is not supported by search, use offset')
+    try:
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise ListingError('Invalid offset')
+    if offset < 0:
+        raise ListingError('offset must not be negative')
+    return query_terms(args.get('q')), offset, filters
+
+
+def search_transactions(user_id, terms, offset=0, limit=DEFAULT_PAGE_SIZE, **filters):
+    # Archived matches have no rank; they follow the matches in the table, newest first
+    found = matches(user_id, terms)
+    conditions = [Transaction.user_id == user_id, *filter_conditions(user_id, **filters)]
+    archives = archive.user_archives(user_id, filters.get('start'), filters.get('end'))
+    archived = list(archive.find_rows(user_id, archives, description=description_matcher(terms), **filters)) if archives else []
+
+    # The page is picked on (id, rank, date) alone; the full columns and category names are only
+    # joined in for the rows that made it
+    page = (
+        db.select(found.c.id, found.c.rank, Transaction.date)
+        .select_from(found)
+        .join(Transaction, Transaction.id == found.c.id)
+        .where(*conditions)
+        .order_by(found.c.rank, Transaction.date.desc(), Transaction.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .subquery('page')
+    )
+    rows = db.session.execute(
+        join_categories(
+            db.select(*columns()).select_from(page).join(Transaction, Transaction.id == page.c.id),
+            Transaction.category_id,
+        )
+        .order_by(page.c.rank, page.c.date.desc(), page.c.id.desc())
+    ).all()
+
+    # Totals cover the whole match set, not just the page
+    found = matches(user_id, terms, ranked=False)
+    sums = {}
+    for currency, transaction_type, count, total in db.session.execute(
+        db.select(
+            Transaction.currency, Transaction.transaction_type,
+            db.func.count(), db.func.sum(db.func.abs(Transaction.amount_minor)),
+        )
+        .select_from(found)
+        .join(Transaction, Transaction.id == found.c.id)
+        .where(*conditions)
+        .group_by(Transaction.currency, Transaction.transaction_type)
+    ):
+        sums[(currency, transaction_type)] = (count, total or 0)
+    table_count = sum(count for count, _ in sums.values())
+    if len(rows) <= limit and archived:
+        rows = rows + archive.listing_rows(user_id, archived, limit + 1 - len(rows), max(0, offset - table_count))
+    for found_archive, positions in archived:
+        for key, (count, total) in found_archive.totals(positions).items():
+            previous = sums.get(key, (0, 0))
+            sums[key] = (previous[0] + count, previous[1] + total)
+
+    totals = {'count': 0, 'income': {}, 'expenses': {}}
+    for (currency, transaction_type), (count, total) in sums.items():
+        totals['count'] += count
+        side = totals['income'] if transaction_type == 'income' else totals['expenses']
+        side[currency] = side.get(currency, 0) + total
+    for side in (totals['income'], totals['expenses']):
+        side.update((currency, from_minor(total, currency)) for currency, total in side.items())
+
+    return {
+        'transactions': [row_to_dict(row) for row in rows[:limit]],
+        'limit': limit,
+        'offset': offset,
+        'next_offset': offset + limit if len(rows) > limit else None,
+        'totals': totals,
+    }
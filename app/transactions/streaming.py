@@ -0,0 +1,193 @@
+import csv
+import heapq
+import io
+import json
+import math
+from datetime import datetime
+from app import archive, db
+from app.categories import join_categories, resolved_category_id, resolved_category_name
+from app.identity import user_categories, user_category
+from app.ingest import Fingerprinter, ingest_rows
+from app.models import Transaction
+from app.money import CurrencyError, parse_currency
+from app.summary import date_range_conditions
+
+FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = ('id', 'date', 'amount', 'currency', 'category', 'category_id', 'transaction_type', 'description', 'source')
+CHUNK_ROWS = 1000
+MAX_REPORTED_ERRORS = 20
+TRANSACTION_TYPES = ('income', 'expense')
+
+
+class TransferError(ValueError):
+    pass
+
+
+def export_columns():
+    resolved = {'category': resolved_category_name, 'category_id': resolved_category_id}
+    return [resolved[column].label(column) if column in resolved else getattr(Transaction, column)
+            for column in EXPORT_COLUMNS]
+
+
+def export_rows(user_id, start=None, end=None):
+    # yield_per streams from the cursor in CHUNK_ROWS batches; plain tuples, no ORM instances.
+    # Archived rows are merged in by (date, id), which both sides are already sorted by.
+    query = (
+        join_categories(db.select(*export_columns()).select_from(Transaction), Transaction.category_id)
+        .where(Transaction.user_id == user_id, *date_range_conditions(start, end))
+        .order_by(Transaction.date, Transaction.id)
+        .execution_options(yield_per=CHUNK_ROWS)
+    )
+    rows = db.session.execute(query)
+    yield from heapq.merge(archive.export_rows(user_id, start, end), rows, key=lambda row: (row[1], row[0]))
+
+
+def format_date(value):
+    return value.isoformat(sep=' ')
+
+
+def iter_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    # The header goes out before the first row is read
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    count = 0
+    for row in rows:
+        writer.writerow((row[0], format_date(row[1]), *row[2:]))
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(rows):
+    chunk = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['date'] = format_date(record['date'])
+        chunk.append(json.dumps(record))
+        if len(chunk) == CHUNK_ROWS:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def export_stream(user_id, format, start=None, end=None):
+    rows = export_rows(user_id, start, end)
+    return iter_csv(rows) if format == 'csv' else iter_ndjson(rows)
+
+
+def iter_records(stream, format):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if format == 'csv':
+        for line_number, record in enumerate(csv.DictReader(text), start=2):
+            yield line_number, record
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, record
+
+
+def parse_record(record, find_category, categories_by_name):
+    if not isinstance(record, dict):
+        raise TransferError('Invalid record')
+    try:
+        date = datetime.fromisoformat(str(record['date']).strip())
+        amount = float(record['amount'])
+    except KeyError as e:
+        raise TransferError(f'Missing required field: {e.args[0]}')
+    except (TypeError, ValueError):
+        # TypeError: a JSON null or a value missing from a short CSV row
+        raise TransferError('Invalid date or amount')
+    if not math.isfinite(amount):
+        raise TransferError('Invalid date or amount')
+    for field in ('category', 'category_id', 'description', 'source'):
+        if isinstance(record.get(field), (list, dict)):
+            raise TransferError(f'Invalid {field}')
+    try:
+        currency = parse_currency(record.get('currency'))
+    except CurrencyError as e:
+        raise TransferError(str(e))
+
+    transaction_type = record.get('transaction_type')
+    if transaction_type not in TRANSACTION_TYPES:
+        raise TransferError(f"Invalid transaction_type, expected one of: {', '.join(TRANSACTION_TYPES)}")
+
+    category = None
+    if record.get('category_id') not in (None, ''):
+        try:
+            category = find_category(int(record['category_id']))
+        except (TypeError, ValueError, OverflowError):
+            pass
+    if category is None and record.get('category'):
+        category = categories_by_name.get(str(record['category']))
+    if category is None and not record.get('category'):
+        raise TransferError('Missing required field: category')
+
+    return {
+        'date': date,
+        'amount': amount,
+        'currency': currency,
+        'category': category.name if category else str(record['category']),
+        'category_id': category.id if category else None,
+        'transaction_type': transaction_type,
+        'description': str(record.get('description') or ''),
+    }, str(record.get('source') or 'import')
+
+
+def import_stream(user_id, stream, format, batch_size=500, on_batch=None):
+    # Reads the upload record by record and ingests it in batches, so neither the file nor the
+    # parsed rows are ever held in full. Each batch is handed to on_batch to be committed.
+    categories_by_name = {category.name: category for category in user_categories(user_id).values()}
+
+    def find_category(category_id):
+        return user_category(user_id, category_id)
+
+    fingerprinters = {}
+    report = {'rows_read': 0, 'rows_inserted': 0, 'rows_skipped': 0, 'errors': [], 'error_count': 0}
+    batches = {}
+
+    def flush():
+        for source, rows in batches.items():
+            if source not in fingerprinters:
+                fingerprinters[source] = Fingerprinter(user_id, source)
+            inserted, skipped = ingest_rows(user_id, rows, source, fingerprinters[source])
+            report['rows_inserted'] += len(inserted)
+            report['rows_skipped'] += skipped
+        batches.clear()
+        if on_batch:
+            on_batch(report)
+
+    pending = 0
+    for line_number, record in iter_records(stream, format):
+        report['rows_read'] += 1
+        try:
+            row, source = parse_record(record, find_category, categories_by_name)
+        except TransferError as e:
+            report['error_count'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': line_number, 'error': str(e)})
+            continue
+        batches.setdefault(source, []).append(row)
+        pending += 1
+        if pending >= batch_size:
+            flush()
+            pending = 0
+
+    if pending:
+        flush()
+    return report
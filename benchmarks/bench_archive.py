@@ -0,0 +1,92 @@
+"""Summary latency with old years in the transaction table vs moved into archives.
+
+    python -m benchmarks.bench_archive [--users 2] [--transactions 200000] [--years 8] [--repeat 20]
+
+A database is generated (benchmarks.generate) in a temporary directory, the summaries below are
+timed for bench0, every year before the last two is archived with archive_old_transactions(), and
+the same summaries are timed again. Totals must come out the same. Finally one year is restored.
+
+- all years by month: rollups plus the monthly totals stored with each archive
+- all years by week: GROUP BY over the table vs memory-mapped column reads
+- one archived year by day, and the latest year by month (table only either way)
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+
+def timed(repeat, function):
+    result = function()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000, result
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--transactions', type=int, default=200000, help='per user')
+    parser.add_argument('--years', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'), ARCHIVE_PATH=os.path.join(workdir, 'archive'),
+        LOG_PROFILE='quiet', IMPORT_RESUME_JOBS='0',
+    )
+    from app import archive, create_app, db
+    from app.models import Transaction, User
+    from app.summary import build_summary
+    from benchmarks.generate import END, generate
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        generate(db, args.users, args.transactions, args.years)
+        print(f'generated {args.users} users x {args.transactions:,} transactions in {time.perf_counter() - started:.1f}s')
+        user_id = db.session.execute(db.select(User.id).where(User.username == 'bench0')).scalar()
+        first, last = END.year - args.years + 1, END.year
+        cases = {
+            'all years by month': (date(first, 1, 1), date(last, 12, 31), 'month'),
+            'all years by week': (date(first, 1, 1), date(last, 12, 31), 'week'),
+            f'{first + 1} by day': (date(first + 1, 1, 1), date(first + 1, 12, 31), 'day'),
+            f'{last} by month': (date(last, 1, 1), date(last, 12, 31), 'month'),
+        }
+
+        def run_cases():
+            return {name: timed(args.repeat, lambda case=case: build_summary(user_id, *case)) for name, case in cases.items()}
+
+        before = run_cases()
+        hot_before = db.session.execute(db.select(db.func.count()).select_from(Transaction)).scalar()
+        started = time.perf_counter()
+        moved = archive.archive_old_transactions(after_days=(date.today() - date(last - 1, 1, 1)).days)
+        archive_seconds = time.perf_counter() - started
+        hot_after = db.session.execute(db.select(db.func.count()).select_from(Transaction)).scalar()
+        after = run_cases()
+
+        print(f'archived {sum(count for _, _, count in moved):,} rows in {archive_seconds:.1f}s: '
+              f'table {hot_before:,} -> {hot_after:,} rows, archives {directory_bytes(archive.archive_root()) / 2**20:.1f} MB')
+        for name in cases:
+            (before_ms, before_summary), (after_ms, after_summary) = before[name], after[name]
+            same = 'same totals' if before_summary == after_summary else 'TOTALS DIFFER'
+            print(f'{name:<22} table {before_ms:8.1f} ms  archived {after_ms:8.1f} ms  {same}')
+
+        started = time.perf_counter()
+        restored = archive.restore_year(user_id, first)
+        print(f'restored {restored:,} rows of {first} in {time.perf_counter() - started:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
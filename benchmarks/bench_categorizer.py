@@ -0,0 +1,69 @@
+"""Category index build and lookup throughput on one core.
+
+    python -m benchmarks.bench_categorizer [--history 100000] [--lookups 200000] [--repeat 5]
+
+The index is learned from --history synthetic transactions (merchant, city and store number, each
+merchant filed under one category) and then asked for --lookups other descriptions. The description
+token cache is cleared before each run, so the timing includes tokenizing every distinct description.
+"""
+import argparse
+import random
+import time
+from app.categorizer import CategoryIndex, merchant_tokens
+from benchmarks.bench_search import CITIES, MERCHANTS
+
+
+def descriptions(rng, count):
+    # (description, merchant) pairs
+    merchants = [rng.choice(MERCHANTS) for _ in range(count)]
+    return [(f'{merchant} {rng.choice(CITIES)} {rng.randint(1, 999):03d}', merchant) for merchant in merchants]
+
+
+def best_of(repeat, fn, before=None):
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.history)
+    categories = {merchant: n % 10 + 1 for n, merchant in enumerate(MERCHANTS)}
+    history = descriptions(rng, args.history)
+    queries = [description for description, _ in descriptions(rng, args.lookups)]
+
+    index = CategoryIndex()
+
+    def build():
+        for description, merchant in history:
+            index.add(description, categories[merchant])
+
+    started = time.perf_counter()
+    build()
+    build_time = time.perf_counter() - started
+
+    def lookup_all():
+        lookup = index.lookup
+        for description in queries:
+            lookup(description)
+
+    elapsed = best_of(args.repeat, lookup_all, before=merchant_tokens.cache_clear)
+    hits = sum(index.lookup(description) is not None for description in queries)
+
+    print(f'{args.history:,} history rows learned in {build_time * 1000:.0f} ms, {len(index.counts):,} tokens')
+    print(f'{args.lookups:,} lookups, {hits / args.lookups:.0%} categorized')
+    print(f'{args.lookups / elapsed:,.0f} lookups/s')
+
+
+if __name__ == '__main__':
+    main()
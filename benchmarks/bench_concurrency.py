@@ -0,0 +1,162 @@
+"""Reader latency while a long import writes to the same SQLite database.
+
+    python -m benchmarks.bench_concurrency [--rows 200000] [--readers 4] [--commit-every 0] [--profiles none sqlite]
+        [--check-profiles sqlite] [--max-summary-ms 1000]
+
+Every profile runs in its own process against a fresh database file. A writer thread ingests
+--rows rows in IMPORT_BATCH_SIZE batches, committing every --commit-every batches (0: once at the
+end, like a multi-file upload), while reader threads alternately request /transactions/list and the
+/transactions/dashboard summary through the test client until the writer is done. The response
+cache is off, so every read reaches the database.
+
+The run fails (exit status 1) when a summary read under one of --check-profiles took longer than
+--max-summary-ms or any read failed: with WAL, readers must not wait for the import.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_profile(rows, readers, commit_every):
+    from app import create_app, db
+    from app.ingest import ingest_rows
+    from app.models import User
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    batch_size = app.config['IMPORT_BATCH_SIZE']
+    start = datetime(2020, 1, 1)
+    done = threading.Event()
+    writer_time = []
+
+    def write():
+        started = time.perf_counter()
+        with app.app_context():
+            for number, offset in enumerate(range(0, rows, batch_size), start=1):
+                batch = [{
+                    'date': start + timedelta(minutes=i),
+                    'amount': float(i % 500) + 0.99,
+                    'category': 'Other',
+                    'transaction_type': 'expense',
+                    'description': f'Imported row {i}',
+                } for i in range(offset, min(offset + batch_size, rows))]
+                ingest_rows(user_id, batch, 'pdf')
+                if commit_every and number % commit_every == 0:
+                    db.session.commit()
+            db.session.commit()
+        writer_time.append(time.perf_counter() - started)
+        done.set()
+
+    latencies = []
+    summary_latencies = []
+    errors = []
+
+    def read(client):
+        while not done.is_set():
+            for path, timings in (('/transactions/list?limit=50', latencies), ('/transactions/dashboard?recent=0', summary_latencies)):
+                started = time.perf_counter()
+                response = client.get(path)
+                elapsed = time.perf_counter() - started
+                if response.status_code == 200:
+                    timings.append(elapsed)
+                else:
+                    errors.append(response.status_code)
+
+    # Log in before the import starts: the first request also resumes queued import jobs, which
+    # writes and would have to wait for the import like any other writer
+    clients = [app.test_client() for _ in range(readers)]
+    for client in clients:
+        client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    threads = [threading.Thread(target=read, args=(client,)) for client in clients]
+    writer = threading.Thread(target=write)
+    writer.start()
+    for thread in threads:
+        thread.start()
+    writer.join()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'writer_seconds': writer_time[0],
+        'reads': len(latencies),
+        'errors': len(errors),
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies, default=0) * 1000,
+        'summary_reads': len(summary_latencies),
+        'summary_p99_ms': percentile(summary_latencies, 0.99) * 1000,
+        'summary_max_ms': max(summary_latencies, default=0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--commit-every', type=int, default=0)
+    parser.add_argument('--profiles', nargs='+', default=['none', 'sqlite'])
+    parser.add_argument('--check-profiles', nargs='*', default=['sqlite'], help='profiles whose summary reads must stay under the bound')
+    parser.add_argument('--max-summary-ms', type=float, default=1000)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_profile(args.rows, args.readers, args.commit_every)))
+        return
+
+    failures = []
+    for profile in args.profiles:
+        env = dict(
+            os.environ,
+            DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'),
+            DATABASE_PROFILE=profile,
+            LOG_PROFILE='quiet',
+            SLOW_REQUEST_MS='0',
+            RESPONSE_CACHE_MAX_BYTES='0',
+        )
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_concurrency', '--child', '--rows', str(args.rows), '--readers', str(args.readers),
+             '--commit-every', str(args.commit_every)],
+            env=env, check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{profile:>10}: import {result['writer_seconds']:6.1f} s  reads {result['reads']:6d}  errors {result['errors']:4d}  "
+              f"p50 {result['p50_ms']:7.1f} ms  p99 {result['p99_ms']:7.1f} ms  max {result['max_ms']:7.1f} ms  "
+              f"summaries {result['summary_reads']:6d}  p99 {result['summary_p99_ms']:7.1f} ms  max {result['summary_max_ms']:7.1f} ms")
+        if profile in args.check_profiles:
+            if result['errors']:
+                failures.append(f"{profile}: {result['errors']} reads failed")
+            if not result['summary_reads']:
+                failures.append(f'{profile}: no summary read completed during the import')
+            elif result['summary_max_ms'] > args.max_summary_ms:
+                failures.append(f"{profile}: a summary read waited {result['summary_max_ms']:.0f} ms (bound {args.max_summary_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
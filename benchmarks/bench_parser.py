@@ -0,0 +1,82 @@
+"""Statement parser throughput over a synthetic statement.
+
+    python -m benchmarks.bench_parser [--lines 100000] [--repeat 5]
+"""
+import argparse
+import re
+import time
+from datetime import datetime
+from app.transactions.importer import iter_lines, iter_statement_rows
+from benchmarks.statements import statement_pages
+
+
+def legacy_extract(text):
+    # The per-line re.search / backward scan / joined-window keyword lookup the engine replaced,
+    # kept here (without its per-line print) as the reference point.
+    transactions = []
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    last_date = None
+    for idx, line in enumerate(lines):
+        date_match = re.search(r'\d{2}\.\d{2}\.\d{4}', line)
+        if date_match:
+            last_date = date_match.group()
+        amount_match = re.search(r'([-+]?[0-9\s,.]+)\s*(PLN|EUR)', line)
+        if amount_match and last_date:
+            try:
+                amount = float(amount_match.group(1).replace(' ', '').replace(',', '.'))
+            except ValueError:
+                continue
+            description = 'Unknown'
+            for back_idx in range(idx - 1, max(idx - 5, -1), -1):
+                if lines[back_idx].startswith('"') and lines[back_idx].endswith('"'):
+                    description = lines[back_idx].strip('"')
+                    break
+            category = 'Other'
+            nearby_text = ' '.join(lines[max(0, idx - 3):idx + 3]).lower()
+            if 'restauracje' in nearby_text or 'kawiarnia' in nearby_text:
+                category = 'Food & Drink'
+            elif 'internet' in nearby_text or 'telefon' in nearby_text:
+                category = 'Utilities'
+            elif 'hobby' in nearby_text:
+                category = 'Hobby'
+            transactions.append({
+                'date': datetime.strptime(last_date, '%d.%m.%Y').strftime('%Y-%m-%d %H:%M:%S'),
+                'amount': abs(amount),
+                'description': description,
+                'transaction_type': 'income' if amount > 0 else 'expense',
+                'category': category,
+            })
+            last_date = None
+    return transactions
+
+
+def best_of(repeat, fn):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = statement_pages(args.lines)
+    line_count = sum(1 for _ in iter_lines(pages))
+
+    engine_time, rows = best_of(args.repeat, lambda: list(iter_statement_rows(pages)))
+    legacy_time, legacy_rows = best_of(args.repeat, lambda: legacy_extract('\n'.join(pages)))
+
+    print(f'{line_count} lines, {len(rows)} transactions (legacy: {len(legacy_rows)})')
+    print(f'engine: {engine_time * 1000:8.1f} ms  {line_count / engine_time:12,.0f} lines/s')
+    print(f'legacy: {legacy_time * 1000:8.1f} ms  {line_count / legacy_time:12,.0f} lines/s')
+    print(f'speedup: {legacy_time / engine_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Transaction read path: ORM instances + to_dict() against the column-projected read model.
+
+    python -m benchmarks.bench_readmodel [--rows 10000 100000 1000000] [--repeat 3]
+
+Every size gets its own user in one SQLite database in a temporary directory.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+CATEGORIES = ('Food & Dining', 'Transportation', 'Shopping', 'Utilities', 'Other')
+
+
+def populate(db, user_id, rows):
+    from app.models import Category, Transaction
+    categories = [Category(name, user_id, is_default=True) for name in CATEGORIES]
+    db.session.add_all(categories)
+    db.session.flush()
+    random.seed(rows)
+    start = datetime(2015, 1, 1)
+    for offset in range(0, rows, 10000):
+        batch = []
+        for i in range(offset, min(offset + 10000, rows)):
+            category = categories[i % len(categories)]
+            amount_minor = random.randint(100, 50000)
+            batch.append({
+                'user_id': user_id,
+                'date': start + timedelta(minutes=7 * i),
+                'amount': amount_minor / 100,
+                'amount_minor': amount_minor,
+                'currency': 'PLN',
+                'category_id': category.id,
+                'transaction_type': 'income' if i % 10 == 0 else 'expense',
+                'description': f'Payment {i}',
+                'source': 'pdf',
+            })
+        db.session.execute(Transaction.__table__.insert(), batch)
+    db.session.commit()
+
+
+def best_of(repeat, fn):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def run(app, rows, repeat):
+    from app import db
+    from app.models import Transaction, User
+    from app.transactions.readmodel import transaction_dicts
+
+    with app.app_context():
+        user = User(username=f'bench{rows}', email=f'bench{rows}@example.com')
+        db.session.add(user)
+        db.session.commit()
+        populate(db, user.id, rows)
+
+        def orm_path():
+            transactions = Transaction.query.filter(Transaction.user_id == user.id).order_by(Transaction.date.desc()).all()
+            result = app.json.dumps([t.to_dict() for t in transactions])
+            db.session.expunge_all()
+            return result
+
+        def readmodel_path():
+            return app.json.dumps(transaction_dicts(user.id))
+
+        orm_time, _ = best_of(repeat, orm_path)
+        readmodel_time, _ = best_of(repeat, readmodel_path)
+        db.session.remove()
+
+    print(f'{rows:>9,} rows  orm+to_dict: {rows / orm_time:12,.0f} rows/s  '
+          f'read model: {rows / readmodel_time:12,.0f} rows/s  speedup: {orm_time / readmodel_time:.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # Config reads DATABASE_URL when app is first imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    for rows in args.rows:
+        run(app, rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Full-text search latency on a large transaction table.
+
+    python -m benchmarks.bench_search [--rows 1000000] [--users 10] [--repeat 20]
+
+Rows are spread evenly over --users users in one SQLite database in a temporary directory, with
+descriptions drawn from a skewed merchant list so common merchants match tens of thousands of rows.
+Each query is run for one user and timed end to end (page of 50 plus match-set totals).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+MERCHANTS = (
+    'Biedronka', 'Lidl', 'Zabka', 'Orlen', 'Rossmann', 'Allegro', 'Kaufland', 'Carrefour', 'Auchan',
+    'Netto', 'Stokrotka', 'Hebe', 'Empik', 'Decathlon', 'Ikea', 'Leroy Merlin', 'Castorama', 'Pepco',
+    'Action', 'Media Expert', 'RTV Euro AGD', 'Shell', 'BP', 'Circle K', 'Uber', 'Bolt', 'PKP Intercity',
+    'Jakdojade', 'Netflix', 'Spotify', 'Apteka Gemini', 'Apteka DOZ', 'Starbucks', 'McDonalds', 'KFC',
+)
+CITIES = ('Warszawa', 'Krakow', 'Gdansk', 'Wroclaw', 'Poznan', 'Lodz', 'Katowice', 'Lublin')
+QUERIES = (
+    ('common term', {'q': 'biedronka'}),
+    ('common prefix', {'q': 'bied'}),
+    ('two terms', {'q': 'biedronka warsz'}),
+    ('rare term', {'q': 'castorama'}),
+    ('no match', {'q': 'zzzzzz'}),
+    ('term + date range', {'q': 'lidl', 'from': '2015-03-01', 'to': '2015-05-31'}),
+    ('term + type', {'q': 'orlen', 'type': 'expense'}),
+    ('deep page', {'q': 'biedronka', 'offset': '5000'}),
+)
+
+
+def description(rng):
+    # Zipf-like: the first merchants are by far the most frequent
+    merchant = MERCHANTS[min(int(rng.paretovariate(1.2)) - 1, len(MERCHANTS) - 1)]
+    return f'{merchant} {rng.choice(CITIES)} {rng.randint(1, 999):03d}'
+
+
+def populate(db, rows, users):
+    from app.models import Category, Transaction, User
+    rng = random.Random(rows)
+    user_ids, category_ids = [], []
+    for n in range(users):
+        user = User(username=f'bench{n}', email=f'bench{n}@example.com')
+        db.session.add(user)
+        db.session.flush()
+        category = Category('Other', user.id, is_default=True)
+        db.session.add(category)
+        db.session.flush()
+        user_ids.append(user.id)
+        category_ids.append(category.id)
+
+    start = datetime(2015, 1, 1)
+    for offset in range(0, rows, 10000):
+        batch = []
+        for i in range(offset, min(offset + 10000, rows)):
+            amount_minor = rng.randint(100, 50000)
+            batch.append({
+                'user_id': user_ids[i % users],
+                'date': start + timedelta(minutes=5 * (i // users)),
+                'amount': amount_minor / 100,
+                'amount_minor': amount_minor,
+                'currency': 'PLN',
+                'category_id': category_ids[i % users],
+                'transaction_type': 'income' if i % 20 == 0 else 'expense',
+                'description': description(rng),
+                'source': 'pdf',
+            })
+        db.session.execute(Transaction.__table__.insert(), batch)
+    db.session.commit()
+    return user_ids[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # Config reads DATABASE_URL when app is first imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from app import create_app, db
+    from app.transactions.search import parse_search_args, search_transactions
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        user_id = populate(db, args.rows, args.users)
+        print(f'{args.rows:,} rows for {args.users} users indexed in {time.perf_counter() - started:.1f}s')
+
+        for name, query in QUERIES:
+            terms, offset, filters = parse_search_args(query)
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                result = search_transactions(user_id, terms, offset, **filters)
+                timings.append((time.perf_counter() - started) * 1000)
+                db.session.remove()
+            timings.sort()
+            print(f'{name:<20} matches: {result["totals"]["count"]:>8,}  '
+                  f'p50: {statistics.median(timings):7.1f} ms  p95: {timings[int(len(timings) * 0.95) - 1]:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
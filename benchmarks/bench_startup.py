@@ -0,0 +1,143 @@
+"""Cold start to first response, and memory per worker of the pre-forking server.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--workers 4]
+
+Cold start runs a fresh interpreter that imports the app, creates it and serves GET /login through
+the test client, timed from process launch. "eager" imports pdfplumber first, which is what every
+process paid when the statement importer loaded it at module level.
+
+The server part starts serve.py with the werkzeug backend, with and without warmup, waits for the
+first response on /login and reads each worker's RSS and PSS from /proc (Linux only). PSS counts
+pages shared with the master and the other workers only in part, so it is what a worker really adds.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cold_start(eager):
+    # Runs in the child interpreter
+    started = time.perf_counter()
+    if eager:
+        import pdfplumber  # noqa: F401
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    response = app.test_client().get('/login')
+    finished = time.perf_counter()
+    import resource
+    return {
+        'imports_ms': (imported - started) * 1000,
+        'first_response_ms': (finished - started) * 1000,
+        'status': response.status_code,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_cold(eager, env):
+    command = [sys.executable, '-m', 'benchmarks.bench_startup', '--child'] + (['--eager'] if eager else [])
+    started = time.perf_counter()
+    output = subprocess.run(command, env=env, cwd=ROOT, check=True, stdout=subprocess.PIPE, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # Includes interpreter startup and exit
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                values[name] = int(rest.split()[0])
+    return values
+
+
+def run_server(workers, warmup, env):
+    port = free_port()
+    command = [sys.executable, 'serve.py', '--backend', 'werkzeug', '--workers', str(workers),
+               '--bind', f'127.0.0.1:{port}', '--warmup' if warmup else '--no-warmup']
+    started = time.perf_counter()
+    master = subprocess.Popen(command, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=5).read()
+                break
+            except (urllib.error.URLError, ConnectionError):
+                if master.poll() is not None:
+                    raise RuntimeError('serve.py exited before answering')
+                time.sleep(0.005)
+        first_response = (time.perf_counter() - started) * 1000
+        # Let every worker answer at least once
+        for _ in range(workers * 4):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=5).read()
+        with open(f'/proc/{master.pid}/task/{master.pid}/children') as file:
+            pids = [int(pid) for pid in file.read().split()]
+        memory = [memory_kb(pid) for pid in pids]
+        master_memory = memory_kb(master.pid)
+    finally:
+        master.terminate()
+        master.wait()
+    return {
+        'first_response_ms': first_response,
+        'master_rss_mb': master_memory['Rss'] / 1024,
+        'worker_rss_mb': statistics.mean(m['Rss'] for m in memory) / 1024,
+        'worker_pss_mb': statistics.mean(m['Pss'] for m in memory) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--eager', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(cold_start(args.eager)))
+        return
+
+    database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database, LOG_PROFILE='quiet', IMPORT_RESUME_JOBS='0')
+    subprocess.run([sys.executable, '-m', 'benchmarks.generate', '--database', database, '--users', '1', '--transactions', '0'],
+                   env=env, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+    for eager in (True, False):
+        runs = [run_cold(eager, env) for _ in range(args.repeat)]
+        print(f"cold start {'eager' if eager else 'lazy':>5}: "
+              f"process {statistics.median(r['process_ms'] for r in runs):6.0f} ms  "
+              f"imports {statistics.median(r['imports_ms'] for r in runs):6.0f} ms  "
+              f"first response {statistics.median(r['first_response_ms'] for r in runs):6.0f} ms  "
+              f"rss {statistics.median(r['rss_mb'] for r in runs):5.1f} MB")
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print('worker memory needs /proc/<pid>/smaps_rollup (Linux), skipped')
+        return
+    for warmup in (False, True):
+        result = run_server(args.workers, warmup, env)
+        print(f"serve.py {args.workers} workers, warmup {'on ' if warmup else 'off'}: "
+              f"first response {result['first_response_ms']:6.0f} ms  master rss {result['master_rss_mb']:5.1f} MB  "
+              f"worker rss {result['worker_rss_mb']:5.1f} MB  worker pss {result['worker_pss_mb']:5.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
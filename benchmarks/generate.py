@@ -0,0 +1,122 @@
+"""Deterministic synthetic data for the benchmarks.
+
+    python -m benchmarks.generate [--users 5] [--transactions 20000] [--years 3] [--categories 40]
+                                  [--seed 0] [--database PATH] [--statements DIR --statement-lines 2000]
+
+Creates --users users (bench0, bench1, ... with password "bench"), each with the default categories
+plus --categories extra ones and --transactions transactions spread over those categories and the
+last --years years, and rebuilds the rollups. The same arguments always produce the same rows.
+--statements writes one synthetic PDF statement per user in the layout the statement parser reads.
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+from benchmarks.statements import MERCHANTS, statement_lines, statement_pdf
+
+PASSWORD = 'bench'
+END = datetime(2024, 12, 31)
+CITIES = ('Warszawa', 'Krakow', 'Gdansk', 'Wroclaw', 'Poznan')
+INCOME_CATEGORIES = ('Salary', 'Investments', 'Other Income')
+BATCH_ROWS = 10000
+
+
+def create_users(db, users, categories):
+    # Returns [(user_id, [category ids], [income category ids])]
+    from app.auth.routes import create_default_categories
+    from app.models import Category, User
+    created = []
+    for n in range(users):
+        user = User(username=f'bench{n}', email=f'bench{n}@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        create_default_categories(user.id)
+        db.session.add_all(Category(name=f'Group {i:03d}', user_id=user.id) for i in range(categories))
+        db.session.commit()
+        rows = db.session.execute(db.select(Category.id, Category.name).where(Category.user_id == user.id).order_by(Category.id)).all()
+        created.append((
+            user.id,
+            [id for id, name in rows if name not in INCOME_CATEGORIES],
+            [id for id, name in rows if name in INCOME_CATEGORIES],
+        ))
+    return created
+
+
+def transaction_rows(rng, user_id, expense_ids, income_ids, count, years, currency):
+    span = timedelta(days=365 * years).total_seconds()
+    start = END - timedelta(days=365 * years)
+    for _ in range(count):
+        income = rng.random() < 0.05
+        amount_minor = rng.randint(100000, 900000) if income else rng.randint(100, 50000)
+        yield {
+            'user_id': user_id,
+            'date': start + timedelta(seconds=int(rng.random() * span)),
+            'amount': amount_minor / 100,
+            'amount_minor': amount_minor,
+            'currency': currency,
+            'category_id': rng.choice(income_ids if income else expense_ids),
+            'transaction_type': 'income' if income else 'expense',
+            'description': 'Pracodawca Sp. z o.o.' if income else f'{rng.choice(MERCHANTS)} {rng.choice(CITIES)} {rng.randint(1, 99):02d}',
+            'source': 'pdf',
+        }
+
+
+def generate(db, users=5, transactions=20000, years=3, categories=40, seed=0):
+    # Fills the database of the current app context; returns the users as create_users does
+    from app import rollups
+    from app.models import Transaction
+    from app.money import default_currency
+    rng = random.Random(seed)
+    created = create_users(db, users, categories)
+    for user_id, expense_ids, income_ids in created:
+        rows = transaction_rows(rng, user_id, expense_ids, income_ids, transactions, years, default_currency())
+        while True:
+            batch = [row for _, row in zip(range(BATCH_ROWS), rows)]
+            if not batch:
+                break
+            db.session.execute(Transaction.__table__.insert(), batch)
+        db.session.commit()
+    rollups.rebuild()
+    return created
+
+
+def write_statements(folder, count, lines, seed=0):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for n in range(count):
+        path = os.path.join(folder, f'statement-{n}.pdf')
+        with open(path, 'wb') as file:
+            file.write(statement_pdf(statement_lines(lines, seed=seed + n)))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--transactions', type=int, default=20000, help='per user')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--categories', type=int, default=40, help='extra categories per user')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', help='SQLite file to create (default: DATABASE_URL)')
+    parser.add_argument('--statements', help='directory for synthetic PDF statements')
+    parser.add_argument('--statement-lines', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.database:
+        # Config reads DATABASE_URL when app is first imported
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(args.database)
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        generate(db, args.users, args.transactions, args.years, args.categories, args.seed)
+        print(f'{args.users} users x {args.transactions:,} transactions in {db.engine.url.database}')
+    if args.statements:
+        paths = write_statements(args.statements, args.users, args.statement_lines, args.seed)
+        print(f'{len(paths)} statements in {args.statements}')
+
+
+if __name__ == '__main__':
+    main()
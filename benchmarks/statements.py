@@ -0,0 +1,63 @@
+import random
+from datetime import date, timedelta
+
+MERCHANTS = ['Biedronka', 'Lidl', 'Orlen', 'Starbucks', 'Orange Polska', 'Empik', 'Zabka', 'PKP Intercity']
+CATEGORY_LINES = ['Restauracje i kawiarnie', 'Internet i telefon', 'Hobby', 'Zakupy spozywcze', 'Transport', 'Kawiarnia']
+
+
+def statement_lines(line_count, seed=0, start=date(2024, 1, 1)):
+    # Synthetic statement text in the dd.mm.yyyy / "Merchant" / amount PLN|EUR layout
+    rng = random.Random(seed)
+    lines = ['Wyciag z rachunku', 'Numer rachunku 12 3456 7890 0000 0000 1234 5678']
+    day = start
+    while len(lines) < line_count:
+        day += timedelta(days=rng.random() < 0.3)
+        income = rng.random() < 0.05
+        amount = rng.randint(100, 900000) if income else rng.randint(100, 50000)
+        whole, cents = divmod(amount, 100)
+        whole = f'{whole:,}'.replace(',', ' ')
+        lines.append(day.strftime('%d.%m.%Y'))
+        lines.append(f'"{"Pracodawca Sp. z o.o." if income else rng.choice(MERCHANTS)}"')
+        lines.append('Wynagrodzenie' if income else rng.choice(CATEGORY_LINES))
+        lines.append(f'{"+" if income else "-"}{whole},{cents:02d} {"EUR" if rng.random() < 0.1 else "PLN"}')
+        if rng.random() < 0.2:
+            lines.append(f'Saldo po operacji {rng.randint(0, 99999)},{rng.randint(0, 99):02d}')
+    return lines[:line_count]
+
+
+def statement_pages(line_count, lines_per_page=60, seed=0):
+    lines = statement_lines(line_count, seed)
+    return ['\n'.join(lines[i:i + lines_per_page]) for i in range(0, len(lines), lines_per_page)]
+
+
+def pdf_text(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def statement_pdf(lines, lines_per_page=60):
+    # A minimal PDF with one Helvetica text line per statement line, which pdfplumber extracts
+    # back line by line; no PDF library needed
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages)))}] /Count {len(pages)} >>".encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for i, page in enumerate(pages):
+        content = ('BT /F1 10 Tf 12 TL 40 800 Td ' + ' '.join(f'({pdf_text(line)}) Tj T*' for line in page) + ' ET').encode('latin-1')
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>'.encode()
+        )
+        objects.append(b'<< /Length ' + str(len(content)).encode() + b' >>\nstream\n' + content + b'\nendstream')
+
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    for offset in offsets:
+        pdf += f'{offset:010d} 00000 n \n'.encode()
+    pdf += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return bytes(pdf)
@@ -0,0 +1,234 @@
+"""Timed scenarios over the HTTP endpoints, with results that can be compared against a baseline.
+
+    python -m benchmarks.suite [--users 5] [--transactions 20000] [--repeat 50] [--scenarios NAME ...]
+                               [--output results.json] [--baseline baseline.json] [--tolerance 0.2]
+
+A database is generated once (benchmarks.generate) and every scenario runs in its own process
+against a fresh copy of it, through Flask's test client logged in as bench0. Response caching is
+off so every request runs its view. Each scenario reports ops/s, p50/p99 latency, SQL queries per
+operation and the process's peak RSS.
+
+With --baseline, results are compared to an earlier --output file; the exit status is 1 when a
+scenario lost more than --tolerance of its throughput, its p99 grew by more than that, or it
+issues more queries per operation.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+SCENARIOS = ('get_summary', 'get_summary_transactions', 'add_transaction', 'delete_category', 'upload_pdf')
+JOB_POLL_SECONDS = 0.01
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def summary_requests(client, repeat, path):
+    # One calendar year per request, cycling through the generated years
+    for n in range(repeat):
+        year = 2024 - n % 3
+        yield lambda: client.get(f'{path}?from={year}-01-01&to={year}-12-31')
+
+
+def setup_scenario(name, app, client, repeat, statements):
+    # Returns the operations to time, each a callable doing one request (or, for uploads, one
+    # request plus polling until the import job has finished)
+    from app import db
+    from app.identity import user_categories
+    from app.models import User
+
+    with app.app_context():
+        user_id = db.session.execute(db.select(User.id).where(User.username == 'bench0')).scalar()
+        categories = list(user_categories(user_id).values())
+
+    if name == 'get_summary':
+        return list(summary_requests(client, repeat, '/transactions/get_summary'))
+    if name == 'get_summary_transactions':
+        return list(summary_requests(client, repeat, '/bench/get_summary'))
+    if name == 'add_transaction':
+        category_id = categories[0].id
+        return [
+            lambda n=n: client.post('/transactions/add_transaction', json={
+                'amount': 10 + n % 90,
+                'category_id': category_id,
+                'transaction_type': 'expense',
+                'description': f'Bench purchase {n}',
+            })
+            for n in range(repeat)
+        ]
+    if name == 'delete_category':
+        # Each operation folds one populated category into the default one
+        deletable = [category.id for category in categories if not category.is_default]
+        return [lambda id=id: client.delete(f'/categories/{id}') for id in deletable[:repeat]]
+    if name == 'upload_pdf':
+        def upload(path):
+            with open(path, 'rb') as file:
+                response = client.post('/transactions/upload_pdf', data={'file': (file, os.path.basename(path))},
+                                       content_type='multipart/form-data')
+            if response.status_code != 202:
+                return response
+            while True:
+                job = client.get(f"/transactions/import_jobs/{response.get_json()['id']}")
+                if job.get_json()['status'] in ('done', 'failed'):
+                    return job
+                time.sleep(JOB_POLL_SECONDS)
+        return [lambda path=path: upload(path) for path in statements[:repeat]]
+    raise ValueError(f'Unknown scenario: {name}')
+
+
+def run_scenario(name, repeat, statements):
+    from sqlalchemy import event
+    from app import create_app, db
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+    # The transactions blueprint's get_summary is shadowed by the main one on the same URL
+    app.add_url_rule('/bench/get_summary', 'bench_get_summary', app.view_functions['transactions.get_summary'])
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench0', 'password': 'bench'})
+    # Connections, caches and lazily imported modules are set up before the clock starts
+    client.get('/categories')
+    operations = setup_scenario(name, app, client, repeat, statements)
+
+    queries = 0
+
+    def count_query(*args):
+        nonlocal queries
+        queries += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for operation in operations:
+        operation_started = time.perf_counter()
+        response = operation()
+        latencies.append(time.perf_counter() - operation_started)
+        if response.status_code >= 400 or (response.is_json and response.get_json().get('status') == 'failed'):
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    return {
+        'ops': len(operations),
+        'errors': errors,
+        'ops_per_sec': len(operations) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries_per_op': queries / len(operations) if operations else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Returns the regressions as printable lines
+    regressions = []
+    for name, result in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        throughput = result['ops_per_sec'] / before['ops_per_sec'] if before['ops_per_sec'] else 1.0
+        p99 = result['p99_ms'] / before['p99_ms'] if before['p99_ms'] else 1.0
+        print(f"{name:<26} ops/s {throughput:6.2f}x  p99 {p99:6.2f}x  "
+              f"queries/op {before['queries_per_op']:.1f} -> {result['queries_per_op']:.1f}")
+        if throughput < 1 - tolerance:
+            regressions.append(f'{name}: throughput {throughput:.2f}x of baseline')
+        if p99 > 1 + tolerance:
+            regressions.append(f'{name}: p99 latency {p99:.2f}x of baseline')
+        if result['queries_per_op'] > before['queries_per_op'] + 0.5:
+            regressions.append(f"{name}: {result['queries_per_op']:.1f} queries per operation, was {before['queries_per_op']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--transactions', type=int, default=20000, help='per user')
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--categories', type=int, default=40, help='extra categories per user')
+    parser.add_argument('--statement-lines', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--statements', nargs='*', default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, args.repeat, args.statements)))
+        return
+
+    workdir = tempfile.mkdtemp()
+    template = os.path.join(workdir, 'template.db')
+    env = dict(os.environ, LOG_PROFILE='quiet', SLOW_REQUEST_MS='0', RESPONSE_CACHE_MAX_BYTES='0', IMPORT_RESUME_JOBS='0')
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.generate', '--database', template, '--users', str(args.users),
+         '--transactions', str(args.transactions), '--years', str(args.years), '--categories', str(args.categories),
+         '--seed', str(args.seed), '--statements', os.path.join(workdir, 'statements'),
+         '--statement-lines', str(args.statement_lines)],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    print(f'generated {args.users} users x {args.transactions:,} transactions in {time.perf_counter() - started:.1f}s')
+    # One statement per upload, each with different rows so none are skipped as duplicates
+    from benchmarks.generate import write_statements
+    statements = write_statements(os.path.join(workdir, 'uploads'), args.repeat, args.statement_lines, args.seed + args.users)
+
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'params': {key: getattr(args, key) for key in ('users', 'transactions', 'years', 'categories', 'statement_lines', 'seed', 'repeat')},
+        'platform': {'python': platform.python_version(), 'machine': platform.machine(), 'system': platform.system()},
+        'scenarios': {},
+    }
+    for name in args.scenarios:
+        database = os.path.join(workdir, f'{name}.db')
+        shutil.copyfile(template, database)
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.suite', '--child', name, '--repeat', str(args.repeat),
+             '--statements', *(statements if name == 'upload_pdf' else [])],
+            env=dict(env, DATABASE_URL='sqlite:///' + database), check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results['scenarios'][name] = result
+        print(f"{name:<26} {result['ops']:5d} ops  {result['ops_per_sec']:9.1f} ops/s  p50 {result['p50_ms']:8.1f} ms  "
+              f"p99 {result['p99_ms']:8.1f} ms  {result['queries_per_op']:6.1f} queries/op  "
+              f"rss {result['peak_rss_mb']:6.1f} MB  errors {result['errors']}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
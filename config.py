@@ -9,4 +9,53 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = os.path.join(basedir, 'uploads') 
\ No newline at end of file
+    DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE') or 'auto'  # auto, sqlite, postgresql or none
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')  # optional read replica for read-only endpoints
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS') or 2)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE') or 500)
+    IMPORT_PROCESSES = int(os.environ.get('IMPORT_PROCESSES') or 0) or None  # None: one per available core, divided between server workers
+    IMPORT_BATCH_MAX_FILES = int(os.environ.get('IMPORT_BATCH_MAX_FILES') or 100)
+    IMPORT_BATCH_MAX_FILE_BYTES = int(os.environ.get('IMPORT_BATCH_MAX_FILE_BYTES') or 20 * 1024 * 1024)
+    IMPORT_BATCH_MAX_BYTES = int(os.environ.get('IMPORT_BATCH_MAX_BYTES') or 200 * 1024 * 1024)  # all files of one batch, unpacked
+    IMPORT_RESUME_JOBS = os.environ.get('IMPORT_RESUME_JOBS', '1') != '0'
+    IMPORT_LEASE_SECONDS = int(os.environ.get('IMPORT_LEASE_SECONDS') or 60)  # a running job not renewed for this long is requeued
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND') or 'memory'  # memory or sqlite
+    RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH') or os.path.join(basedir, 'instance', 'response_cache.db')
+    RESPONSE_CACHE_SHARED_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_SHARED_MAX_BYTES') or 256 * 1024 * 1024)
+    DASHBOARD_RECENT_ROWS = int(os.environ.get('DASHBOARD_RECENT_ROWS') or 10)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 1024)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)
+    JSON_FAST_PROVIDER = os.environ.get('JSON_FAST_PROVIDER') != '0'
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 10000)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    CATEGORY_CACHE_SIZE = int(os.environ.get('CATEGORY_CACHE_SIZE') or 10000)
+    CATEGORY_CACHE_TTL = int(os.environ.get('CATEGORY_CACHE_TTL') or 300)
+    CATEGORY_INDEX_CACHE_SIZE = int(os.environ.get('CATEGORY_INDEX_CACHE_SIZE') or 1000)  # users with a learned category index in memory
+    CATEGORY_INDEX_CACHE_TTL = int(os.environ.get('CATEGORY_INDEX_CACHE_TTL') or 600)
+    LOG_PROFILE = os.environ.get('LOG_PROFILE') or 'production'  # development, production or quiet
+    LOG_LEVEL = os.environ.get('LOG_LEVEL')
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ['LOG_DEBUG_SAMPLE_RATE']) if os.environ.get('LOG_DEBUG_SAMPLE_RATE') else None
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED') != '0'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # /metrics requires "Authorization: Bearer <token>"; unset: no /metrics
+    METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC') == '1'  # serve /metrics without a token
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS') or 0)  # 0 disables the slow request log
+    SERVE_BIND = os.environ.get('SERVE_BIND') or '127.0.0.1:8000'
+    SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS') or 0) or None  # None: one per available core
+    SERVE_WARMUP = os.environ.get('SERVE_WARMUP', '1') != '0'  # load the statement parsing modules before forking
+    ARCHIVE_PATH = os.environ.get('ARCHIVE_PATH') or os.path.join(basedir, 'instance', 'archive')
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS') or 730)  # calendar years that ended this long ago can be archived
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS') or 10000)
+    DEFAULT_CURRENCY = (os.environ.get('DEFAULT_CURRENCY') or 'USD').upper()  # rows without a currency, e.g. manual entries
+    REPORTING_CURRENCY = (os.environ.get('REPORTING_CURRENCY') or '').upper() or None  # summaries unless ?currency= is given; unset: see summary.reporting_currency
+    FX_RATES_PATH = os.environ.get('FX_RATES_PATH') or os.path.join(basedir, 'instance', 'fx_rates.csv')
+    FX_BASE_CURRENCY = (os.environ.get('FX_BASE_CURRENCY') or DEFAULT_CURRENCY).upper()  # the currency the file's rates are quoted in
+    BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE') or 500) 
\ No newline at end of file
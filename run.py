@@ -1,18 +1,13 @@
 from app import create_app, db
 from app.models import User, Transaction
-import logging
 
 app = create_app()
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-app.logger.setLevel(logging.DEBUG)
-
 @app.shell_context_processor
 def make_shell_context():
     return {'db': db, 'User': User, 'Transaction': Transaction}
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True) 
\ No newline at end of file
+    # Development server only; the schema is created by init_db.py or `flask schema upgrade`,
+    # and production runs serve.py
+    app.run(debug=True)
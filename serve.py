@@ -0,0 +1,8 @@
+import time
+
+started = time.perf_counter()
+
+from app.server import main  # noqa: E402
+
+if __name__ == '__main__':
+    main(started)
@@ -0,0 +1,55 @@
+import pytest
+from config import Config
+from app import create_app, db
+from app.auth.routes import create_default_categories
+from app.models import User
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'config(**settings): Config values for the app fixture')
+
+
+@pytest.fixture
+def app(request, tmp_path, monkeypatch):
+    # Every test gets its own database, archive and cache files
+    marker = request.node.get_closest_marker('config')
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'app.db'),
+        'ARCHIVE_PATH': str(tmp_path / 'archive'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'RESPONSE_CACHE_PATH': str(tmp_path / 'response_cache.db'),
+        'FX_RATES_PATH': str(tmp_path / 'fx_rates.csv'),
+        'LOG_PROFILE': 'quiet',
+        'IMPORT_RESUME_JOBS': False,
+        'WTF_CSRF_ENABLED': False,
+        **(marker.kwargs if marker else {}),
+    }
+    for name, value in settings.items():
+        monkeypatch.setattr(Config, name, value, raising=False)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def make_user(username='alice'):
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.commit()
+    create_default_categories(user.id)
+    return user.id
+
+
+@pytest.fixture
+def user_id(app):
+    return make_user()
+
+
+@pytest.fixture
+def client(app, user_id):
+    client = app.test_client()
+    client.post('/login', data={'username': 'alice', 'password': 'secret'})
+    return client
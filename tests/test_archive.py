@@ -0,0 +1,117 @@
+import os
+from datetime import date, datetime
+from app import archive, db, rollups
+from app.models import Transaction
+
+
+def add_rows(user_id, rows):
+    for row in rows:
+        db.session.add(Transaction(user_id=user_id, **row))
+    db.session.flush()
+    rollups.record_added(Transaction.query.all())
+    db.session.commit()
+
+
+def table_rows():
+    columns = ('id', 'date', 'amount', 'amount_minor', 'currency', 'category_id', 'transaction_type',
+               'description', 'source', 'fingerprint')
+    return sorted(tuple(getattr(t, column) for column in columns) for t in Transaction.query.all())
+
+
+def test_archive_round_trip_keeps_every_column(app, user_id):
+    year = date.today().year - 5
+    add_rows(user_id, [
+        dict(date=datetime(year, 3, 1, 12, 30, 15, 123456), amount=12.5, amount_minor=1250, currency='USD',
+             category_id=1, transaction_type='expense', description='Coffee', source='manual', fingerprint='a' * 32),
+        dict(date=datetime(year, 4, 2, 8, 0, 0, 1), amount=100.0, amount_minor=10000, currency='EUR',
+             category_id=None, transaction_type='transfer', description=None, source=None, fingerprint=None),
+        dict(date=datetime(year, 5, 3), amount=7.25, amount_minor=725, currency='USD',
+             category_id=8, transaction_type='income', description='', source='pdf', fingerprint='b' * 32),
+    ])
+    before = table_rows()
+
+    assert archive.archive_year(user_id, year) == 3
+    assert Transaction.query.count() == 0
+    assert rollups.find_drift() == []
+    assert archive.restore_year(user_id, year) == 3
+
+    assert table_rows() == before
+    assert rollups.find_drift() == []
+
+
+def test_archived_rows_keep_their_summary(app, user_id):
+    from app.summary import build_summary
+    year = date.today().year - 5
+    add_rows(user_id, [
+        dict(date=datetime(year, 1, day), amount=day, amount_minor=day * 100, currency='USD', category_id=1,
+             transaction_type='expense', description=f'Shop {day}', source='pdf')
+        for day in range(1, 11)
+    ] + [dict(date=datetime(year, 1, 15), amount=3.0, amount_minor=300, currency='USD', category_id=None,
+              transaction_type='expense', description='Uncategorized', source='pdf')])
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    before = {granularity: build_summary(user_id, start, end, granularity, 'USD') for granularity in ('day', 'month')}
+
+    archive.archive_year(user_id, year)
+
+    for granularity, summary in before.items():
+        assert build_summary(user_id, start, end, granularity, 'USD') == summary
+
+
+def archive_some(user_id):
+    old, recent = date.today().year - 5, date.today().year
+    add_rows(user_id, [
+        dict(date=datetime(year, month, 10), amount=month, amount_minor=month * 100, currency='USD', category_id=1,
+             transaction_type='expense', description=f'Biedronka {year}-{month}', source='pdf')
+        for year in (old, old + 1, recent) for month in (1, 2, 3)
+    ])
+    archive.archive_old_transactions(after_days=(date.today() - date(old + 2, 1, 1)).days)
+    assert Transaction.query.count() == 3
+
+
+def page_ids(client, url):
+    ids = []
+    while url:
+        body = client.get(url).get_json()
+        ids.extend(t['id'] for t in body['transactions'])
+        url = f"/transactions/list?limit=2&cursor={body['next_cursor']}" if body.get('next_cursor') else None
+    return ids
+
+
+def test_listing_pages_into_archived_years(client, user_id):
+    archive_some(user_id)
+    ids = page_ids(client, '/transactions/list?limit=2')
+    assert ids == list(range(9, 0, -1))
+    body = client.get('/transactions/dashboard?recent=5').get_json()
+    assert [t['id'] for t in body['recent_transactions']] == [9, 8, 7, 6, 5]
+
+
+def test_listing_filters_archived_rows(client, user_id):
+    archive_some(user_id)
+    old = date.today().year - 5
+    body = client.get(f'/transactions/list?from={old}-02-01&to={old}-12-31&min_amount=3').get_json()
+    assert [t['description'] for t in body['transactions']] == [f'Biedronka {old}-3']
+    assert client.get('/transactions/list?type=income').get_json()['transactions'] == []
+
+
+def test_search_finds_archived_rows_after_table_matches(client, user_id):
+    archive_some(user_id)
+    body = client.get('/transactions/search?q=bied&limit=4').get_json()
+    assert body['totals']['count'] == 9
+    assert body['totals']['expenses'] == {'USD': 18.0}
+    assert [t['id'] for t in body['transactions']][3:] == [6]
+    rest = client.get(f"/transactions/search?q=bied&limit=4&offset={body['next_offset']}").get_json()
+    assert [t['id'] for t in rest['transactions']] == [5, 4, 3, 2]
+
+
+def test_delete_archived_transaction(client, user_id):
+    archive_some(user_id)
+    assert client.delete('/transactions/delete_transaction/2').status_code == 200
+    assert client.delete('/transactions/delete_transaction/2').status_code == 404
+    assert 2 not in page_ids(client, '/transactions/list?limit=50')
+    response = client.post('/transactions/batch', json=[{'op': 'delete', 'id': 1}, {'op': 'update', 'id': 3, 'amount': 5}])
+    assert [result['status'] for result in response.get_json()['results']] == ['deleted', 'error']
+    assert archive.archived_ids(user_id, range(1, 7)) == {date.today().year - 5: {3}, date.today().year - 4: {4, 5, 6}}
+    client.post('/transactions/batch', json=[{'op': 'delete', 'id': id} for id in (4, 5, 6)])
+    assert list(archive.user_archives(user_id)) == [date.today().year - 5]
+    assert rollups.find_drift() == []
+    assert len(os.listdir(os.path.join(archive.archive_root(), str(user_id)))) == 1
@@ -0,0 +1,62 @@
+from app import rollups
+from app.models import Transaction
+
+
+def batch(client, operations, **query):
+    response = client.post('/transactions/batch', json=operations, query_string=query)
+    assert response.status_code == 200
+    return response.get_json()['results']
+
+
+def create(client, amount=10, description='Lunch'):
+    [result] = batch(client, [{'op': 'create', 'amount': amount, 'category_id': 1, 'transaction_type': 'expense',
+                               'description': description, 'date': '2024-03-01'}])
+    return result['id']
+
+
+def test_update_after_delete_fails(client, user_id):
+    id = create(client)
+    results = batch(client, [{'op': 'delete', 'id': id}, {'op': 'update', 'id': id, 'amount': 5}])
+    assert [result['status'] for result in results] == ['deleted', 'error']
+    assert Transaction.query.count() == 0
+    assert rollups.find_drift() == []
+
+
+def test_delete_after_update_deletes(client, user_id):
+    id = create(client)
+    results = batch(client, [{'op': 'update', 'id': id, 'amount': 5}, {'op': 'delete', 'id': id}])
+    assert [result['status'] for result in results] == ['updated', 'deleted']
+    assert Transaction.query.count() == 0
+    assert rollups.find_drift() == []
+
+
+def test_create_after_deleting_an_identical_row_creates_it(client, user_id):
+    id = create(client)
+    results = batch(client, [{'op': 'delete', 'id': id}, {'op': 'create', 'amount': 10, 'category_id': 1,
+                                                           'transaction_type': 'expense', 'description': 'Lunch', 'date': '2024-03-01'}])
+    assert [result['status'] for result in results] == ['deleted', 'created']
+    assert Transaction.query.count() == 1
+
+
+def test_repeated_updates_are_merged_in_order(client, user_id):
+    id = create(client)
+    results = batch(client, [{'op': 'update', 'id': id, 'amount': 20}, {'op': 'update', 'id': id, 'description': 'Dinner'},
+                             {'op': 'update', 'id': id, 'amount': 30}])
+    assert [result['status'] for result in results] == ['updated'] * 3
+    transaction = Transaction.query.one()
+    assert (transaction.amount, transaction.amount_minor, transaction.description) == (30, 3000, 'Dinner')
+    assert rollups.find_drift() == []
+
+
+def test_invalid_items_are_reported_per_item(client, user_id):
+    id = create(client)
+    results = batch(client, [
+        {'op': 'create', 'amount': 'NaN', 'category_id': 1, 'transaction_type': 'expense'},
+        {'op': 'create', 'amount': 1e400, 'category_id': 1, 'transaction_type': 'expense'},
+        {'op': 'create', 'amount': 1, 'category_id': 1, 'transaction_type': 'expense', 'description': ['x']},
+        {'op': 'update', 'id': id, 'description': {'a': 1}},
+        {'op': 'update', 'id': True, 'amount': 1},
+        {'op': 'update', 'id': id, 'amount': 11},
+    ])
+    assert [result['status'] for result in results] == ['error'] * 5 + ['updated']
+    assert Transaction.query.one().amount == 11
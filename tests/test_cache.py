@@ -0,0 +1,64 @@
+import gzip
+import pytest
+from app import compression
+from app.cache import SqliteCache
+
+
+@pytest.fixture
+def compressions(monkeypatch):
+    calls = []
+    compress = compression.compress
+
+    def counted(body, encoding, level):
+        calls.append(encoding)
+        return compress(body, encoding, level)
+
+    monkeypatch.setattr(compression, 'compress', counted)
+    return calls
+
+
+def test_unchanged_data_answers_304(client):
+    first = client.get('/transactions/list')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert client.get('/transactions/list', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/transactions/add_transaction', json={'amount': 3, 'category_id': 1, 'transaction_type': 'expense'})
+    changed = client.get('/transactions/list', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+@pytest.mark.config(COMPRESS_MIN_SIZE=1)
+def test_compressed_variant_is_cached(client, compressions):
+    plain = client.get('/categories', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+
+    first = client.get('/categories', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/categories', headers={'Accept-Encoding': 'gzip'})
+    assert compressions == ['gzip']
+    assert first.headers['Content-Encoding'] == second.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in second.headers['Vary']
+    assert gzip.decompress(second.get_data()) == plain.get_data()
+    assert second.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+    revalidated = client.get('/categories', headers={'Accept-Encoding': 'gzip', 'If-None-Match': second.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_small_bodies_are_not_compressed(client, compressions):
+    response = client.get('/categories', headers={'Accept-Encoding': 'gzip'})
+    client.get('/categories', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert compressions == []
+
+
+def test_sqlite_tier_starts_over_on_an_old_file(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    old = SqliteCache(path, 1024)
+    old.connection().execute('DROP TABLE response_cache')
+    old.connection().execute('CREATE TABLE response_cache (key TEXT PRIMARY KEY, body BLOB NOT NULL, mimetype TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)')
+
+    cache = SqliteCache(path, 1024)
+    cache.set('key', (b'body', 'application/json', 'gzip'))
+    assert cache.get('key') == (b'body', 'application/json', 'gzip')
@@ -0,0 +1,41 @@
+from datetime import datetime
+from app import db, schema
+from app.models import Category, Transaction
+from app.transactions.readmodel import transaction_dicts
+
+
+def test_upgrade_moves_category_names_to_ids(app, user_id):
+    # A database from before categories were normalized: names in a text column, no ids
+    db.session.execute(db.text('ALTER TABLE "transaction" ADD COLUMN category VARCHAR(64)'))
+    db.session.execute(db.text(
+        'INSERT INTO "transaction" (user_id, date, amount, amount_minor, currency, transaction_type, description, source, category) '
+        'VALUES (:user_id, :date, 1, 100, \'USD\', \'expense\', :description, \'manual\', :category)'
+    ), [{'user_id': user_id, 'date': datetime(2024, 1, n + 1), 'description': f'Row {n}', 'category': category}
+        for n, category in enumerate(['Food & Dining', 'Groceries', None, 'Groceries', 'Transportation'])])
+    db.session.commit()
+
+    report = schema.upgrade()
+    assert report['categories'] == 5
+    assert 'transaction.category' in report['dropped']
+    assert [row['category'] for row in sorted(transaction_dicts(user_id), key=lambda row: row['date'])] == \
+        ['Food & Dining', 'Groceries', 'Other', 'Groceries', 'Transportation']
+    assert Category.query.filter_by(user_id=user_id, name='Groceries').count() == 1
+    assert Transaction.query.filter(Transaction.category_id.is_(None)).count() == 0
+
+
+def test_deleted_categories_fold_into_the_replacement(client, user_id):
+    pets = client.post('/categories', json={'name': 'Pets'}).get_json()['id']
+    cats = client.post('/categories', json={'name': 'Cats'}).get_json()['id']
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': 1, 'category_id': pets, 'transaction_type': 'expense', 'date': '2024-01-01'},
+        {'op': 'create', 'amount': 2, 'category_id': cats, 'transaction_type': 'expense', 'date': '2024-01-02'},
+    ]})
+    db.session.get(Category, cats).replaced_by_id = pets
+    db.session.commit()
+    assert client.delete(f'/categories/{pets}').status_code == 200
+
+    # Both rows, including the one already folded into Pets, now read as the first default category
+    rows = client.get('/transactions/list').get_json()['transactions']
+    assert {(row['category_id'], row['category']) for row in rows} == {(1, 'Food & Dining')}
+    assert [row['amount'] for row in client.get('/transactions/list?category_id=1').get_json()['transactions']] == [2, 1]
+    assert pets not in [category['id'] for category in client.get('/categories').get_json()]
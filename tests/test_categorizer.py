@@ -0,0 +1,39 @@
+from app.categorizer import categorize, category_index, merchant_tokens
+
+FOOD, TRANSPORT, SHOPPING = 1, 2, 5
+
+
+def create(client, rows):
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': n + 1, 'category_id': category_id, 'transaction_type': 'expense', 'date': f'2024-01-{n + 1:02d}',
+         'description': description} for n, (description, category_id) in enumerate(rows)
+    ]})
+
+
+def predicted(user_id, *descriptions):
+    rows = [{'description': description, 'category_id': None} for description in descriptions]
+    categorize(user_id, rows)
+    return [row['category_id'] for row in rows]
+
+
+def test_tokens_are_folded_and_drop_numbers():
+    assert merchant_tokens('ŻABKA Z1234 Łódź 12.01') == ('zabka', 'lodz')
+
+
+def test_history_predicts_the_merchant_category(client, user_id):
+    create(client, [('Biedronka Kraków', FOOD), ('Biedronka Warszawa', FOOD), ('Orlen Kraków', TRANSPORT),
+                    ('Orlen Gdańsk', TRANSPORT), ('Rossmann Kraków', SHOPPING)])
+    # "krakow" is spread over three categories, so it predicts nothing on its own
+    assert predicted(user_id, 'BIEDRONKA 1234 Poznań', 'Orlen Stacja 77', 'Kraków', 'Unknown shop') == [FOOD, TRANSPORT, None, None]
+
+
+def test_new_transactions_teach_the_loaded_index(client, user_id):
+    create(client, [('Biedronka', FOOD)])
+    assert category_index(user_id).lookup('Lidl') is None
+    create(client, [('Lidl', SHOPPING)])
+    assert predicted(user_id, 'Lidl Sp. z o.o.') == [SHOPPING]
+
+    # The fallback category teaches nothing
+    other = client.post('/categories', json={'name': 'Other'}).get_json()['id']
+    create(client, [('Apteka', other)])
+    assert predicted(user_id, 'Apteka') == [None]
@@ -0,0 +1,47 @@
+import decimal
+import gzip
+import json
+from datetime import date, datetime
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+
+def seed(client, count):
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': n + 1, 'category_id': 1, 'transaction_type': 'expense', 'date': f'2024-01-{n + 1:02d}',
+         'description': f'Shop {n}'} for n in range(count)
+    ]})
+
+
+def test_dashboard_sends_the_aggregates_and_newest_rows(client):
+    seed(client, 12)
+    body = client.get('/transactions/dashboard?recent=5').get_json()
+    summary = client.get('/transactions/get_summary').get_json()
+    assert {key: body[key] for key in ('total_expenses', 'by_category', 'by_period')} == \
+        {key: summary[key] for key in ('total_expenses', 'by_category', 'by_period')}
+    assert 'transactions' not in body
+    assert [t['amount'] for t in body['recent_transactions']] == [12, 11, 10, 9, 8]
+
+    rest = client.get(f"/transactions/list?cursor={body['recent_cursor']}").get_json()
+    assert [t['amount'] for t in rest['transactions']] == list(range(7, 0, -1))
+
+    empty = client.get('/transactions/dashboard?recent=0').get_json()
+    assert (empty['recent_transactions'], empty['recent_cursor']) == ([], None)
+    for query in ('recent=-1', 'recent=x', 'granularity=hour'):
+        assert client.get(f'/transactions/dashboard?{query}').status_code == 400, query
+
+
+def test_large_responses_are_compressed(client):
+    seed(client, 28)
+    response = client.get('/transactions/get_summary', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.get_data()))['transactions']) == 28
+
+
+def test_fast_provider_matches_the_default_one(app):
+    if type(app.json) is DefaultJSONProvider:
+        pytest.skip('orjson is not installed')
+    value = {'date': date(2024, 1, 2), 'at': datetime(2024, 1, 2, 3, 4, 5), 'price': decimal.Decimal('1.10'),
+             'text': 'Żabka', 'list': [1.5, None, True]}
+    assert json.loads(app.json.dumps(value)) == json.loads(DefaultJSONProvider(app).dumps(value))
+    assert json.loads(app.json.response(value).get_data()) == json.loads(DefaultJSONProvider(app).dumps(value))
@@ -0,0 +1,50 @@
+import pytest
+from config import Config
+from app import db
+from app.database import REPLICA_BIND, engine_options, resolve_profile
+
+
+def test_sqlite_connections_get_the_profile_pragmas(app):
+    with db.engine.connect() as connection:
+        pragma = lambda name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT_MS']
+
+
+def test_profiles():
+    config = {'DATABASE_PROFILE': 'auto', 'DB_POOL_SIZE': 5, 'DB_MAX_OVERFLOW': 10, 'DB_POOL_TIMEOUT': 30,
+              'DB_POOL_RECYCLE': 1800, 'SQLITE_BUSY_TIMEOUT_MS': 5000}
+    assert resolve_profile(config, 'postgresql+psycopg://db/app') == 'postgresql'
+    assert resolve_profile(config, 'mysql://db/app') == 'none'
+    assert engine_options(config, 'postgresql://db/app')['pool_pre_ping'] is True
+    assert engine_options(config, 'sqlite:///app.db') == {'connect_args': {'timeout': 5.0}}
+    with pytest.raises(ValueError):
+        resolve_profile({**config, 'DATABASE_PROFILE': 'oracle'}, 'sqlite://')
+
+
+@pytest.fixture
+def replica(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATABASE_REPLICA_URL', 'sqlite:///' + str(tmp_path / 'replica.db'))
+    request.getfixturevalue('app')
+    engine = db.engines[REPLICA_BIND]
+    db.metadata.create_all(engine)
+    yield engine
+    # Flask-SQLAlchemy keeps a metadata per bind key on the shared db object, and the next app
+    # would try to create the replica's tables without a replica configured
+    db.metadatas.pop(REPLICA_BIND, None)
+
+
+def test_read_only_views_use_the_replica(replica, app, client):
+    def call(method, url, **kwargs):
+        # One app context per request as in production, so the read-only flag ends with the request
+        with app.app_context():
+            return client.open(url, method=method, **kwargs)
+
+    added = call('POST', '/transactions/add_transaction', json={'amount': 5, 'category_id': 1, 'transaction_type': 'expense'})
+    assert added.status_code == 200
+    # The replica has not caught up: the listing reads it, writes and other reads use the primary
+    assert call('GET', '/transactions/list').get_json()['transactions'] == []
+    assert call('GET', '/transactions/import_jobs').status_code == 200
+    with replica.connect() as connection:
+        assert connection.exec_driver_sql('SELECT COUNT(*) FROM "transaction"').scalar() == 0
+    assert call('DELETE', f"/transactions/delete_transaction/{added.get_json()['id']}").status_code == 200
@@ -0,0 +1,67 @@
+import os
+from datetime import date
+import pytest
+from app.fx import FxError, RateTable
+
+RATES = 'date,currency,rate\n2024-01-01,EUR,1.10\n2024-01-31,EUR,1.20\n2024-01-01,JPY,0.007\n'
+
+
+@pytest.fixture
+def rates_file(app):
+    path = app.config['FX_RATES_PATH']
+    with open(path, 'w') as file:
+        file.write(RATES)
+    return path
+
+
+def test_rates_carry_forward_and_convert_between_exponents(rates_file):
+    table = RateTable()
+    table.configure(rates_file, 'USD')
+    assert table.rate('EUR', date(2024, 1, 15)) == 1.10
+    assert table.rate('EUR', date(2024, 3, 1)) == 1.20
+    assert table.rate('USD', date(1990, 1, 1)) == 1.0
+    with pytest.raises(FxError):
+        table.rate('EUR', date(2023, 12, 31))
+    # 1000 yen (no minor unit) is 700 cents; 10 dollars is 833 euro cents at 1.20
+    assert round(1000 * table.factor('JPY', 'USD', date(2024, 1, 2))) == 700
+    assert round(1000 * table.factor('USD', 'EUR', date(2024, 2, 1))) == 833
+
+
+def seed(client):
+    operations = [
+        ('10', 'EUR', '2024-01-10'), ('10', 'EUR', '2024-01-31'), ('5', 'USD', '2024-01-15'),
+        ('1000', 'JPY', '2024-01-20'), ('50', 'PLN', '2024-01-20'),
+    ]
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': amount, 'currency': currency, 'date': day, 'category_id': 1, 'transaction_type': 'expense'}
+        for amount, currency, day in operations
+    ]})
+
+
+def test_summaries_convert_per_day_or_at_month_end(client, rates_file):
+    seed(client)
+    daily = client.get('/transactions/get_summary?currency=USD&granularity=day').get_json()
+    monthly = client.get('/transactions/get_summary?currency=USD&granularity=month').get_json()
+    # EUR is converted at 1.10 and 1.20 on the days it was spent, or at the month-end 1.20
+    assert daily['total_expenses'] == 11 + 12 + 5 + 7
+    assert monthly['total_expenses'] == 24 + 5 + 7
+    # PLN has no rates: it is left out of the totals and reported on its own
+    for summary in (daily, monthly):
+        assert summary['unconverted'] == {'PLN': {'total_income': 0, 'total_expenses': 50}}
+
+    partial = client.get('/transactions/get_summary?currency=EUR&from=2024-01-10&to=2024-01-20').get_json()
+    assert partial['currency'] == 'EUR'
+    assert partial['total_expenses'] == pytest.approx(10 + 5 / 1.10 + 7 / 1.10, abs=0.01)
+
+
+def test_a_replaced_rates_file_changes_cached_summaries(client, rates_file):
+    seed(client)
+    before = client.get('/transactions/get_summary?currency=USD&granularity=day')
+    with open(rates_file, 'w') as file:
+        file.write(RATES.replace('1.10', '1.50'))
+    stat = os.stat(rates_file)
+    os.utime(rates_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    after = client.get('/transactions/get_summary?currency=USD&granularity=day', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.get_json()['total_expenses'] == 15 + 12 + 5 + 7
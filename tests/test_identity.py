@@ -0,0 +1,47 @@
+from app import db
+from app.cache import bump_data_version
+from app.identity import cached_user, category_cache, user_categories, user_category
+from app.models import Category, User
+
+
+def insert_elsewhere(user_id, name):
+    # As another worker process would: no ORM events reach this process's caches
+    result = db.session.execute(Category.__table__.insert().values(name=name, user_id=user_id, is_default=False))
+    bump_data_version(user_id)
+    db.session.commit()
+    return result.inserted_primary_key[0]
+
+
+def test_categories_are_invalidated_on_commit_only(app, user_id):
+    assert len(user_categories(user_id)) == 10
+    db.session.add(Category(name='Pets', user_id=user_id))
+    db.session.flush()
+    assert category_cache.peek(user_id) is not None
+    db.session.rollback()
+    assert category_cache.peek(user_id) is not None
+
+    db.session.add(Category(name='Pets', user_id=user_id))
+    db.session.commit()
+    assert category_cache.peek(user_id) is None
+    assert 'Pets' in {category.name for category in user_categories(user_id).values()}
+
+
+def test_categories_added_by_another_process_are_found(client, user_id):
+    assert len(client.get('/categories').get_json()) == 10
+    id = insert_elsewhere(user_id, 'Pets')
+    # The new data version reloads the cached list for the versioned response
+    assert 'Pets' in [category['name'] for category in client.get('/categories').get_json()]
+
+    id = insert_elsewhere(user_id, 'Garden')
+    assert user_category(user_id, id).name == 'Garden'
+
+
+def test_cached_user_is_a_detached_copy(app, user_id):
+    user = cached_user(user_id)
+    assert cached_user(user_id) is user
+    assert user not in db.session
+
+    db.session.get(User, user_id).email = 'new@example.com'
+    db.session.commit()
+    assert cached_user(user_id).email == 'new@example.com'
+    assert cached_user(12345) is None
@@ -0,0 +1,58 @@
+import io
+import pytest
+from app import db, rollups
+from app.models import Transaction
+from app.transactions import importer
+from benchmarks.statements import statement_lines, statement_pdf
+
+
+@pytest.fixture
+def parse_pool(monkeypatch):
+    monkeypatch.setattr(importer, '_parse_pool', None)
+    yield
+    if importer._parse_pool is not None:
+        importer._parse_pool.shutdown()
+
+
+def test_parse_pool_does_not_fork_the_server_worker(parse_pool):
+    pool = importer.get_parse_pool(2)
+    assert pool._max_workers == 2
+    assert pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+
+
+@pytest.mark.config(IMPORT_PROCESSES=2)
+def test_upload_batch_parses_in_the_pool(client, parse_pool):
+    lines = statement_lines(40)
+    files = [(io.BytesIO(statement_pdf(lines)), 'first.pdf'), (io.BytesIO(b'not a pdf'), 'broken.pdf')]
+    response = client.post('/transactions/upload_batch', data={'files': files}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    first, broken = response.get_json()['files']
+    assert first['status'] == 'done' and first['rows'] == first['rows_inserted'] > 0
+    assert broken['status'] == 'failed'
+    assert importer._parse_pool._max_workers == 2
+
+
+def test_statements_are_parsed_and_committed_batch_by_batch(app, user_id, tmp_path, monkeypatch):
+    path = tmp_path / 'statement.pdf'
+    path.write_bytes(statement_pdf(statement_lines(200), lines_per_page=40))
+    pages = []
+    iter_pages = importer.iter_pages
+
+    def tracked(filepath):
+        for text in iter_pages(filepath):
+            pages.append(text)
+            yield text
+
+    monkeypatch.setattr(importer, 'iter_pages', tracked)
+    progress = []
+
+    def on_batch(extracted, inserted):
+        progress.append((len(pages), extracted, inserted))
+        db.session.commit()
+
+    extracted, inserted = importer.import_statement(user_id, str(path), batch_size=10, on_batch=on_batch)
+    assert extracted == inserted == Transaction.query.count() > 20
+    # The first batch is handed over before the later pages are read
+    assert progress[0][1] == 10 and progress[0][0] < len(pages) == 5
+    assert [batch[1] for batch in progress] == list(range(10, extracted, 10)) + [extracted]
+    assert rollups.find_drift() == []
@@ -0,0 +1,71 @@
+from datetime import date, datetime
+import pytest
+from app import archive, db, rollups
+from app.ingest import Fingerprinter, ingest_rows
+from app.models import Transaction
+
+
+@pytest.mark.parametrize('amount', ['abc', None, 'nan', 'inf', -5, 0, [1]])
+def test_add_transaction_rejects_bad_amounts(client, amount):
+    response = client.post('/transactions/add_transaction', json={'amount': amount, 'category': 'Food', 'category_id': 1, 'transaction_type': 'expense'})
+    assert response.status_code == 400
+    assert Transaction.query.count() == 0
+
+
+def test_add_transaction_rejects_unknown_types(client):
+    response = client.post('/transactions/add_transaction', json={'amount': 5, 'category': 'Food', 'category_id': 1, 'transaction_type': 'gift'})
+    assert response.status_code == 400
+
+
+def test_add_transaction_stores_the_row(client, user_id):
+    response = client.post('/transactions/add_transaction', json={'amount': '12.50', 'category_id': 1, 'transaction_type': 'expense'})
+    assert response.status_code == 200
+    assert response.get_json()['amount'] == 12.5
+    assert rollups.find_drift() == []
+
+
+def statement_rows(year):
+    return [{'date': datetime(year, 1, day), 'amount': day, 'category': 'Other', 'transaction_type': 'expense',
+             'description': f'Shop {day}'} for day in range(1, 6)]
+
+
+def test_reimport_is_idempotent(app, user_id):
+    inserted, skipped = ingest_rows(user_id, statement_rows(2024), 'pdf')
+    db.session.commit()
+    assert (len(inserted), skipped) == (5, 0)
+    inserted, skipped = ingest_rows(user_id, statement_rows(2024) + statement_rows(2024)[:1], 'pdf')
+    db.session.commit()
+    # The repeated first row is a second occurrence within the statement, so it is new
+    assert (len(inserted), skipped) == (1, 5)
+    assert rollups.find_drift() == []
+
+
+def test_rows_inserted_concurrently_are_skipped(app, user_id, monkeypatch):
+    rows = Fingerprinter(user_id, 'pdf').assign(statement_rows(2024))
+    raced = []
+
+    def insert_between_lookup_and_insert(user_id, chunk):
+        # Stands in for another session inserting the first two rows after the lookup
+        if not raced:
+            raced.append(True)
+            ingest_rows(user_id, [dict(row) for row in rows[:2]], 'pdf')
+        return set()
+
+    monkeypatch.setattr(archive, 'archived_fingerprints', insert_between_lookup_and_insert)
+    inserted, skipped = ingest_rows(user_id, [dict(row) for row in rows], 'pdf')
+    db.session.commit()
+    assert (len(inserted), skipped) == (3, 2)
+    assert Transaction.query.count() == 5
+    assert rollups.find_drift() == []
+
+
+def test_adding_an_archived_duplicate_is_a_conflict(client, user_id, monkeypatch):
+    year = date.today().year - 5
+    moment = datetime(year, 6, 1, 12, 0)
+    monkeypatch.setattr('app.main.routes.datetime', type('frozen', (), {'utcnow': staticmethod(lambda: moment)}))
+    body = {'amount': 5, 'category_id': 1, 'transaction_type': 'expense', 'description': 'Coffee'}
+    assert client.post('/transactions/add_transaction', json=body).status_code == 200
+    archive.archive_year(user_id, year)
+    response = client.post('/transactions/add_transaction', json=body)
+    assert response.status_code == 409
+    assert Transaction.query.count() == 0
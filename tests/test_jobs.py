@@ -0,0 +1,87 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta
+from app import db
+from app.jobs import import_queue, worker_id
+from app.models import ImportJob, Transaction
+from benchmarks.statements import statement_lines, statement_pdf
+
+
+def add_job(user_id, path, **fields):
+    job = ImportJob(user_id=user_id, filename=os.path.basename(path), filepath=str(path), **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_only_expired_leases_are_requeued(app, user_id, tmp_path, monkeypatch):
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=app.config['IMPORT_LEASE_SECONDS'] + 1)
+    live = add_job(user_id, tmp_path / 'live.pdf', status='running', owner='other:1', heartbeat_at=now)
+    expired = add_job(user_id, tmp_path / 'expired.pdf', status='running', owner='other:2', heartbeat_at=stale)
+    unleased = add_job(user_id, tmp_path / 'unleased.pdf', status='running')
+    queued = add_job(user_id, tmp_path / 'queued.pdf')
+    submitted = []
+    monkeypatch.setattr(import_queue, 'submit', submitted.append)
+
+    assert import_queue.resume() == [expired, unleased, queued]
+    assert submitted == [expired, unleased, queued]
+    job = db.session.get(ImportJob, live)
+    db.session.refresh(job)
+    assert (job.status, job.owner) == ('running', 'other:1')
+    assert db.session.get(ImportJob, expired).owner is None
+
+
+def test_a_job_is_run_once(app, user_id, tmp_path):
+    path = tmp_path / 'statement.pdf'
+    path.write_bytes(statement_pdf(statement_lines(30)))
+    job_id = add_job(user_id, path)
+
+    import_queue.run(job_id)
+    job = db.session.get(ImportJob, job_id)
+    db.session.refresh(job)
+    assert job.status == 'done' and job.rows_inserted == Transaction.query.count() > 0
+    assert job.owner == worker_id() and job.heartbeat_at is not None
+    assert not path.exists()
+
+    # A second submission of the same job (an upload racing a resume) finds it claimed
+    path.write_bytes(b'')
+    db.session.get(ImportJob, job_id).status = 'running'
+    db.session.commit()
+    import_queue.run(job_id)
+    assert path.exists()
+    assert Transaction.query.count() == job.rows_inserted
+
+
+def test_a_failed_import_is_marked_failed(app, user_id, tmp_path):
+    path = tmp_path / 'broken.pdf'
+    path.write_bytes(b'not a pdf')
+    job_id = add_job(user_id, path)
+
+    import_queue.run(job_id)
+    job = db.session.get(ImportJob, job_id)
+    db.session.refresh(job)
+    assert job.status == 'failed' and job.error and job.finished_at
+    assert Transaction.query.count() == 0
+
+
+def test_uploaded_statement_is_imported_in_the_background(app, client, tmp_path):
+    pdf = statement_pdf(statement_lines(30))
+    response = client.post('/transactions/upload_pdf', data={'file': (io.BytesIO(pdf), 'statement.pdf')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+
+    deadline = time.monotonic() + 30
+    while True:
+        # A fresh app context per poll, so the session does not hold on to an earlier snapshot
+        with app.app_context():
+            job = client.get(f'/transactions/import_jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed') or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'done' and job['rows_inserted'] > 0
+    assert [job['id'] for job in client.get('/transactions/import_jobs').get_json()] == [job_id]
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+    assert client.get('/transactions/import_jobs/999').status_code == 404
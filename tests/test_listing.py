@@ -0,0 +1,49 @@
+from app.transactions import listing
+
+
+def create(client, operations):
+    response = client.post('/transactions/batch', json={'operations': operations})
+    return [result['id'] for result in response.get_json()['results']]
+
+
+def page_ids(client, url):
+    ids = []
+    while url:
+        body = client.get(url).get_json()
+        ids += [t['id'] for t in body['transactions']]
+        url = f"/transactions/list?limit=3&cursor={body['next_cursor']}" if body['next_cursor'] else None
+    return ids
+
+
+def test_pages_follow_date_then_id_through_ties(client, user_id):
+    # Five rows share one timestamp, so the cursor has to break the tie on id
+    ids = create(client, [{'op': 'create', 'amount': n + 1, 'category_id': 1, 'transaction_type': 'expense',
+                           'date': '2024-03-01 10:00:00' if n < 5 else f'2024-02-{n:02d}', 'description': f'Row {n}'}
+                          for n in range(8)])
+    assert page_ids(client, '/transactions/list?limit=3') == ids[4::-1] + ids[:4:-1]
+
+
+def test_rows_added_while_paging_do_not_shift_the_pages(client, user_id):
+    ids = create(client, [{'op': 'create', 'amount': n + 1, 'category_id': 1, 'transaction_type': 'expense',
+                           'date': f'2024-01-{n + 1:02d}'} for n in range(5)])
+    first = client.get('/transactions/list?limit=2').get_json()
+    create(client, [{'op': 'create', 'amount': 99, 'category_id': 1, 'transaction_type': 'expense', 'date': '2024-06-01'}])
+    rest = page_ids(client, f"/transactions/list?limit=3&cursor={first['next_cursor']}")
+    assert [t['id'] for t in first['transactions']] + rest == ids[::-1]
+
+
+def test_filters_apply_to_every_page(client, user_id):
+    create(client, [{'op': 'create', 'amount': n + 1, 'category_id': 1 if n % 2 else 8,
+                     'transaction_type': 'expense' if n % 2 else 'income', 'date': f'2024-01-{n + 1:02d}'}
+                    for n in range(10)])
+    body = client.get('/transactions/list?type=expense&min_amount=3&max_amount=8&from=2024-01-01&to=2024-01-31').get_json()
+    assert [t['amount'] for t in body['transactions']] == [8, 6, 4]
+    assert body['next_cursor'] is None
+    assert [t['amount'] for t in client.get('/transactions/list?category_id=8').get_json()['transactions']] == [9, 7, 5, 3, 1]
+
+
+def test_bad_arguments_get_400(client):
+    for query in ('cursor=garbage', 'limit=0', 'limit=x', 'min_amount=x', 'category_id=x'):
+        response = client.get(f'/transactions/list?{query}')
+        assert response.status_code == 400, query
+    assert client.get('/transactions/list?limit=100000').get_json()['limit'] == listing.MAX_PAGE_SIZE
@@ -0,0 +1,42 @@
+import io
+import json
+import logging
+import pytest
+from app import log
+
+
+@pytest.fixture
+def output(app):
+    # The production profile writes from the queue listener's handler
+    stream = io.StringIO()
+    log._listener.handlers[0].setStream(stream)
+    yield lambda: [json.loads(line) for line in stream.getvalue().splitlines()]
+    log.stop_listener()
+
+
+@pytest.mark.config(LOG_PROFILE='production')
+def test_production_records_are_json_lines_written_off_thread(app, output):
+    values = ['first']
+    with app.test_request_context('/transactions/list', method='GET'):
+        logging.getLogger('app.test').info('Imported %s', values, extra={'rows': 3})
+    values[0] = 'changed'
+    log.stop_listener()
+
+    records = output()
+    info = next(record for record in records if record['logger'] == 'app.test' and record['level'] == 'INFO')
+    assert info['message'] == "Imported ['first']"
+    assert (info['rows'], info['method'], info['path']) == (3, 'GET', '/transactions/list')
+
+
+@pytest.mark.config(LOG_PROFILE='production', LOG_LEVEL='debug', LOG_DEBUG_SAMPLE_RATE=0.0)
+def test_overrides_and_sampling(app, output):
+    logging.getLogger('app.test').debug('dropped')
+    logging.getLogger('app.test').warning('kept')
+    log.stop_listener()
+    assert [record['message'] for record in output()] == ['kept']
+    assert logging.getLogger().level == logging.DEBUG
+
+
+def test_unknown_profiles_are_rejected():
+    with pytest.raises(ValueError):
+        log.profile_settings({'LOG_PROFILE': 'verbose'})
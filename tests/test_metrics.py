@@ -0,0 +1,35 @@
+import time
+import pytest
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.metrics import metrics
+
+OUTSIDE_REQUESTS = (('endpoint', '-'), ('method', '-'))
+
+
+def test_metrics_are_not_served_without_a_token(client):
+    assert client.get('/metrics').status_code == 404
+
+
+@pytest.mark.config(METRICS_TOKEN='s3cret')
+def test_metrics_require_the_token(client):
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert 'financeapp_request_duration_seconds' in response.get_data(as_text=True)
+
+
+@pytest.mark.config(METRICS_PUBLIC=True)
+def test_metrics_can_be_served_without_a_token(client):
+    assert client.get('/metrics').status_code == 200
+
+
+def test_failed_statement_does_not_skew_later_timings(app):
+    with pytest.raises(OperationalError):
+        db.session.execute(db.text('SELECT * FROM no_such_table'))
+    db.session.rollback()
+    time.sleep(0.2)
+    before = metrics.counters.get(('sql_seconds_total', OUTSIDE_REQUESTS), 0)
+    db.session.execute(db.text('SELECT 1'))
+    assert metrics.counters[('sql_seconds_total', OUTSIDE_REQUESTS)] - before < 0.1
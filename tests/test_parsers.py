@@ -0,0 +1,38 @@
+from datetime import datetime
+import pytest
+from app.transactions.importer import extract_transactions_from_text
+from app.transactions.parsers import detect_format, get_parser
+
+STATEMENT = '\n'.join([
+    'Wyciag z rachunku',
+    '01.02.2024',
+    '"Pizzeria Roma"',
+    'Restauracje i kawiarnie',
+    '-1 234,56 PLN',
+    '03.02.2024',
+    '"Pracodawca"',
+    '+5 000,00 PLN',
+    '04.02.2024',
+    '"Orange"',
+    '-12,00 EUR',
+    'Telefon',
+    '31.02.2024',
+    '-1,00 PLN',
+])
+
+
+def test_statement_rows_take_date_merchant_and_category():
+    rows = extract_transactions_from_text(STATEMENT)
+    assert [(row['date'], row['description'], row['amount'], row['currency'], row['transaction_type'], row['category'])
+            for row in rows] == [
+        (datetime(2024, 2, 1), 'Pizzeria Roma', 1234.56, 'PLN', 'expense', 'Food & Dining'),
+        (datetime(2024, 2, 3), 'Pracodawca', 5000.0, 'PLN', 'income', 'Other'),
+        # The keyword two lines after the amount still counts; the invalid date yields no row
+        (datetime(2024, 2, 4), 'Orange', 12.0, 'EUR', 'expense', 'Utilities'),
+    ]
+
+
+def test_format_detection():
+    assert detect_format(STATEMENT) == 'dmy_pln_eur'
+    with pytest.raises(ValueError):
+        get_parser('no_such_bank')
@@ -0,0 +1,18 @@
+from app.models import Transaction
+from app.transactions.readmodel import transaction_dicts
+
+
+def test_projected_rows_match_the_orm_dicts(client, user_id):
+    category = client.post('/categories', json={'name': 'Pets'}).get_json()['id']
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': 1.5, 'category_id': 1, 'transaction_type': 'expense', 'date': '2024-01-02 03:04:05', 'description': 'Coffee'},
+        {'op': 'create', 'amount': 900, 'category_id': 8, 'transaction_type': 'income', 'date': '2024-01-03', 'currency': 'EUR'},
+        {'op': 'create', 'amount': 30, 'category_id': category, 'transaction_type': 'expense', 'date': '2024-01-04'},
+    ]})
+    # Rows of a deleted category are read as belonging to its replacement
+    client.delete(f'/categories/{category}')
+
+    expected = [t.to_dict() for t in Transaction.query.order_by(Transaction.date.desc(), Transaction.id.desc())]
+    assert transaction_dicts(user_id) == expected
+    assert expected[0]['category'] == 'Food & Dining'
+    assert client.get('/transactions/list').get_json()['transactions'] == expected
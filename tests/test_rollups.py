@@ -0,0 +1,62 @@
+from app import db, rollups
+from app.cache import current_data_version
+from app.models import SummaryRollup
+
+
+def write(client, operations):
+    response = client.post('/transactions/batch', json={'operations': operations})
+    assert response.status_code == 200
+    return [result.get('id') for result in response.get_json()['results']]
+
+
+def seed(client):
+    return write(client, [
+        {'op': 'create', 'amount': 10, 'category_id': 1, 'transaction_type': 'expense', 'date': '2024-01-05'},
+        {'op': 'create', 'amount': 25.5, 'category_id': 2, 'transaction_type': 'expense', 'date': '2024-01-20 12:30:00'},
+        {'op': 'create', 'amount': 1000, 'category_id': 8, 'transaction_type': 'income', 'date': '2024-02-01'},
+        {'op': 'create', 'amount': 7, 'category_id': 1, 'transaction_type': 'expense', 'date': '2024-02-14', 'currency': 'EUR'},
+    ])
+
+
+def test_every_write_path_keeps_the_rollups_in_step(client, user_id):
+    first, second, income, euros = seed(client)
+    client.post('/transactions/add_transaction', json={'amount': 3, 'category_id': 3, 'transaction_type': 'expense'})
+    write(client, [
+        {'op': 'update', 'id': first, 'amount': 12, 'category_id': 3},
+        {'op': 'update', 'id': second, 'date': '2024-03-01', 'transaction_type': 'income'},
+        {'op': 'update', 'id': euros, 'currency': 'USD'},
+        {'op': 'delete', 'id': income},
+    ])
+    assert client.delete(f'/transactions/delete_transaction/{first}').status_code == 200
+    category = client.post('/categories', json={'name': 'Hobbies'}).get_json()['id']
+    write(client, [{'op': 'create', 'amount': 4, 'category_id': category, 'transaction_type': 'expense', 'date': '2024-04-01'}])
+    assert client.delete(f'/categories/{category}').status_code == 200
+
+    assert rollups.find_drift() == []
+
+
+def test_summary_from_rollups_matches_the_transaction_table(client, user_id):
+    seed(client)
+    monthly = client.get('/transactions/get_summary?currency=USD&granularity=month').get_json()
+    daily = client.get('/transactions/get_summary?currency=USD&granularity=day').get_json()
+    for field in ('total_income', 'total_expenses', 'balance', 'by_category'):
+        assert monthly[field] == daily[field]
+    assert sum(daily['by_period'].values()) == sum(monthly['by_period'].values())
+
+
+def test_drift_is_reported_and_rebuilt(app, client, user_id):
+    seed(client)
+    table = SummaryRollup.__table__
+    db.session.execute(table.update().where(table.c.transaction_type == 'income').values(total_minor=1))
+    db.session.commit()
+    version = current_data_version(user_id)
+
+    drift = rollups.find_drift(user_id)
+    assert [(item['expected_total'], item['actual_total']) for item in drift] == [(100000, 1)]
+    result = app.test_cli_runner().invoke(args=['rollups', 'verify'])
+    assert result.exit_code == 1 and '1 rollup rows drifted' in result.output
+
+    assert app.test_cli_runner().invoke(args=['rollups', 'rebuild']).exit_code == 0
+    assert rollups.find_drift() == []
+    # Summaries cached from the drifted rollups are invalidated
+    assert current_data_version(user_id) > version
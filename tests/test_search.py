@@ -0,0 +1,56 @@
+from app import db
+from app.models import Transaction
+from app.transactions.search import create_search_index
+from tests.conftest import make_user
+
+
+def create(client, descriptions):
+    response = client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': n + 1, 'category_id': 1, 'transaction_type': 'expense', 'date': f'2024-01-{n + 1:02d}',
+         'description': description} for n, description in enumerate(descriptions)
+    ]})
+    return [result['id'] for result in response.get_json()['results']]
+
+
+def found(client, query):
+    response = client.get(f'/transactions/search?{query}')
+    assert response.status_code == 200
+    return sorted(t['description'] for t in response.get_json()['transactions'])
+
+
+def test_terms_match_word_prefixes_without_diacritics(client, user_id):
+    create(client, ['Żabka Warszawa', 'Biedronka Kraków', 'Zabawki Kraków', 'Orlen'])
+    assert found(client, 'q=zab') == ['Zabawki Kraków', 'Żabka Warszawa']
+    assert found(client, 'q=krak+bied') == ['Biedronka Kraków']
+    assert found(client, 'q=krakow&min_amount=3') == ['Zabawki Kraków']
+    assert found(client, 'q=lidl') == []
+
+
+def test_index_follows_updates_deletes_and_owners(client, user_id):
+    first, second = create(client, ['Biedronka', 'Lidl'])
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'update', 'id': first, 'description': 'Carrefour'}, {'op': 'delete', 'id': second},
+    ]})
+    assert found(client, 'q=bied') == []
+    assert found(client, 'q=lidl') == []
+    assert found(client, 'q=carre') == ['Carrefour']
+
+    other = make_user('bob')
+    db.session.add(Transaction(user_id=other, amount=1, amount_minor=100, currency='USD', category_id=11,
+                               transaction_type='expense', description='Carrefour Express'))
+    db.session.commit()
+    assert found(client, 'q=carre') == ['Carrefour']
+
+
+def test_index_is_built_for_an_existing_database(client, user_id):
+    create(client, ['Biedronka'])
+    db.session.execute(db.text('DROP TABLE transaction_fts'))
+    db.session.commit()
+    assert create_search_index() is True
+    assert create_search_index() is False
+    assert found(client, 'q=bied') == ['Biedronka']
+
+
+def test_bad_arguments_get_400(client):
+    for query in ('', 'q=%20', 'q=a&offset=-1', 'q=a&offset=x', 'q=a&cursor=abc'):
+        assert client.get(f'/transactions/search?{query}').status_code == 400, query
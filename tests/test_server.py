@@ -0,0 +1,29 @@
+import gc
+import sys
+import pytest
+from config import Config
+from app import server
+
+
+@pytest.fixture
+def served(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, 'serve_prefork', lambda app, bind, workers: calls.append((app, bind, workers)))
+    monkeypatch.setattr(server, 'available_cpus', lambda: 8)
+    yield calls
+    gc.unfreeze()
+
+
+@pytest.mark.parametrize('argv, processes, expected', [
+    (['--workers', '4'], None, 2),
+    (['--workers', '3'], 12, 4),
+    (['--workers', '16'], None, 1),
+    ([], None, 1),
+])
+def test_workers_share_the_parse_processes(served, monkeypatch, argv, processes, expected):
+    monkeypatch.setattr(Config, 'IMPORT_PROCESSES', processes)
+    monkeypatch.setattr(sys, 'argv', ['server', '--backend', 'werkzeug', '--no-warmup', '--bind', '127.0.0.1:0', *argv])
+    server.main()
+    (app, bind, workers), = served
+    assert bind == '127.0.0.1:0'
+    assert app.config['IMPORT_PROCESSES'] == expected
@@ -0,0 +1,62 @@
+import io
+import json
+import pytest
+from app import rollups
+from app.models import Transaction
+from tests.conftest import make_user
+
+COMPARED = ('date', 'amount', 'currency', 'category', 'transaction_type', 'description', 'source')
+
+
+def seed(client):
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': 12.5, 'category_id': 1, 'transaction_type': 'expense', 'date': '2024-01-02 08:15:00', 'description': 'Café, "Zebra"'},
+        {'op': 'create', 'amount': 1000, 'category_id': 8, 'transaction_type': 'income', 'date': '2024-01-31', 'currency': 'EUR'},
+        {'op': 'create', 'amount': 300, 'category_id': 2, 'transaction_type': 'expense', 'date': '2024-02-03', 'currency': 'JPY'},
+    ]})
+
+
+def login(app, username):
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': 'secret'})
+    return client
+
+
+@pytest.mark.parametrize('format', ['csv', 'ndjson'])
+def test_export_imports_back_unchanged(app, client, format):
+    seed(client)
+    exported = client.get(f'/transactions/export?format={format}')
+    assert exported.status_code == 200
+
+    # Reimporting into the same account finds every row already there
+    report = client.post(f'/transactions/import?format={format}', data=exported.get_data()).get_json()
+    assert (report['rows_read'], report['rows_inserted'], report['rows_skipped'], report['error_count']) == (3, 0, 3, 0)
+
+    def rows(client):
+        body = client.get('/transactions/export?format=ndjson').get_data(as_text=True)
+        return [{field: record[field] for field in COMPARED} for record in map(json.loads, body.splitlines())]
+
+    expected = rows(client)
+    make_user('bob')
+    # A fresh app context, so the logged in user is not the one remembered in the fixture's g
+    with app.app_context():
+        other = login(app, 'bob')
+        files = {'file': (io.BytesIO(exported.get_data()), f'transactions.{format}')}
+        report = other.post('/transactions/import', data=files, content_type='multipart/form-data').get_json()
+        assert report['rows_inserted'] == 3
+        assert rows(other) == expected
+    assert rollups.find_drift() == []
+
+
+def test_bad_records_are_reported_by_line(client):
+    body = '\n'.join([
+        json.dumps({'date': '2024-01-01', 'amount': 5, 'category': 'Shopping', 'transaction_type': 'expense'}),
+        'not json',
+        json.dumps({'date': '2024-01-02', 'amount': 'NaN', 'category': 'Shopping', 'transaction_type': 'expense'}),
+        json.dumps({'date': '2024-01-03', 'amount': 5, 'category': 'Shopping', 'transaction_type': 'gift'}),
+        json.dumps({'date': '2024-01-04', 'amount': 5, 'transaction_type': 'expense'}),
+    ])
+    report = client.post('/transactions/import?format=ndjson', data=body).get_json()
+    assert report['rows_inserted'] == 1
+    assert [error['line'] for error in report['errors']] == [2, 3, 4, 5]
+    assert Transaction.query.count() == 1
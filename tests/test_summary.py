@@ -0,0 +1,47 @@
+import pytest
+
+
+def seed(client):
+    client.post('/transactions/batch', json={'operations': [
+        {'op': 'create', 'amount': amount, 'category_id': category_id, 'transaction_type': transaction_type, 'date': day}
+        for amount, category_id, transaction_type, day in [
+            (100, 8, 'income', '2024-01-01'),
+            (10, 1, 'expense', '2024-01-06 23:59:00'),
+            (20, 2, 'expense', '2024-01-07'),
+            (5.25, 1, 'expense', '2024-02-29'),
+            (40, 1, 'expense', '2025-03-01'),
+        ]
+    ]})
+
+
+def summary(client, query):
+    response = client.get(f'/transactions/get_summary?{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+@pytest.mark.parametrize('granularity, by_period', [
+    ('day', {'2024-01-01': 100, '2024-01-06': -10, '2024-01-07': -20, '2024-02-29': -5.25, '2025-03-01': -40}),
+    # Weeks start on Monday: the 6th and 7th of January 2024 were a Saturday and a Sunday
+    ('week', {'2024-01-01': 70, '2024-02-26': -5.25, '2025-02-24': -40}),
+    ('month', {'2024-01': 70, '2024-02': -5.25, '2025-03': -40}),
+    ('year', {'2024': 64.75, '2025': -40}),
+])
+def test_buckets(client, granularity, by_period):
+    seed(client)
+    body = summary(client, f'granularity={granularity}')
+    assert body['by_period'] == by_period
+    assert (body['total_income'], body['total_expenses'], body['balance']) == (100, 75.25, 24.75)
+    assert body['by_category'] == {'Food & Dining': 55.25, 'Transportation': 20}
+
+
+def test_date_ranges_include_the_last_day(client):
+    seed(client)
+    assert summary(client, 'from=2024-01-06&to=2024-01-06')['total_expenses'] == 10
+    assert summary(client, 'from=2024-01-01&to=2024-02-29')['by_period'] == {'2024-01': 70, '2024-02': -5.25}
+    assert summary(client, 'from=2024-02-01')['monthly_summary'] == {'2024-02': -5.25, '2025-03': -40}
+
+
+def test_bad_arguments_get_400(client):
+    for query in ('granularity=hour', 'from=2024-13-01', 'from=2024-02-01&to=2024-01-01', 'currency=XX'):
+        assert client.get(f'/transactions/get_summary?{query}').status_code == 400, query